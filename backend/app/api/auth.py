@@ -4,8 +4,11 @@ from datetime import datetime, timedelta
 import jwt
 import logging
 
+from app import bulkheads
+from app.bulkheads import BulkheadFull
 from app.config import settings
-from app.db.utils import create_user, get_user_by_email, verify_password
+from app.db.async_utils import create_user_with_hash, get_user_by_email, update_password_hash
+from app.password_hashing import hash_pool, HashPoolBusy
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -41,18 +44,33 @@ def _create_jwt_token(user_id: int, email: str) -> str:
     return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
+def get_current_user_id(token: str) -> int:
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        return int(payload.get("sub"))
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+def _busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Authentication is busy, please retry.", headers={"Retry-After": "1"})
+
+
 @router.post("/signup", response_model=AuthResponse)
-def signup(req: SignupRequest):
+async def signup(req: SignupRequest):
     try:
-        existing = get_user_by_email(req.email)
+        existing = await bulkheads.postgres.run(get_user_by_email, req.email)
         if existing:
             return AuthResponse(success=False, message="Email already registered")
 
         # Trim possible trailing spaces that may come from UI copy/paste
         password = req.password.strip()
-        user = create_user(req.name, req.email, password)
+        password_hash = await hash_pool.hash(password)
+        user = await bulkheads.postgres.run(create_user_with_hash, req.name, req.email, password_hash)
         token = _create_jwt_token(user_id=user["id"], email=user["email"])  # RealDictCursor
         return AuthResponse(success=True, message="Signup successful", token=token, user={"id": user["id"], "name": user["name"], "email": user["email"]})
+    except (HashPoolBusy, BulkheadFull):
+        raise _busy()
     except Exception as e:
         logger.exception("Signup failed: %s", e)
         detail = str(e) if getattr(settings, "DEBUG", False) else None
@@ -60,14 +78,23 @@ def signup(req: SignupRequest):
 
 
 @router.post("/login", response_model=AuthResponse)
-def login(req: LoginRequest):
+async def login(req: LoginRequest):
     try:
-        user = get_user_by_email(req.email)
-        if not user or not verify_password(req.password, user["password_hash"]):
+        user = await bulkheads.postgres.run(get_user_by_email, req.email)
+        if not user:
+            return AuthResponse(success=False, message="Invalid credentials")
+
+        valid, new_hash = await hash_pool.verify(req.password, user["password_hash"])
+        if not valid:
             return AuthResponse(success=False, message="Invalid credentials")
+        if new_hash:
+            # Hash parameters changed since this password was stored: upgrade it transparently
+            await bulkheads.postgres.run(update_password_hash, user["id"], new_hash)
 
         token = _create_jwt_token(user_id=user["id"], email=user["email"])  # RealDictCursor
         return AuthResponse(success=True, message="Login successful", token=token, user={"id": user["id"], "name": user["name"], "email": user["email"]})
+    except (HashPoolBusy, BulkheadFull):
+        raise _busy()
     except Exception as e:
         logger.exception("Login failed: %s", e)
         detail = str(e) if getattr(settings, "DEBUG", False) else None
@@ -0,0 +1,157 @@
+# backend/app/api/export.py
+"""
+Bulk export / import of a user's chat history and tasks as NDJSON.
+
+GET /api/export streams one JSON object per line:
+    {"type": "export", "version": 1, "user_id": ..., "exported_at": ...}
+    {"type": "task", "id": ..., "title": ..., "datetime": ..., ...}
+    {"type": "chat", "id": ..., "chat_id": ..., "user_query": ..., "ai_response": ..., "created_at": ...}
+
+POST /api/import takes the same format (the header line is optional) and
+loads it into the caller's account in one transaction.
+"""
+from fastapi import APIRouter, HTTPException, File, Form, UploadFile
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime
+from typing import IO, AsyncIterator, Dict, Iterator, Tuple
+import json
+import logging
+import psycopg2
+import psycopg2.errors
+
+from app import bulkheads
+from app.api.auth import get_current_user_id
+from app.bulkheads import BulkheadFull
+from app.config import settings
+from app.db import utils as db_utils
+from app.services import ingestion
+
+
+router = APIRouter(prefix="/api", tags=["export"])
+logger = logging.getLogger(__name__)
+
+EXPORT_VERSION = 1
+_FLUSH_BYTES = 64 * 1024  # stream in chunks this size rather than line by line
+_REQUIRED = {"task": "title", "chat": "user_query"}
+# Imported fields and the JSON types they may have (null is allowed for all but _REQUIRED)
+_FIELD_TYPES = {
+    "task": {"title": str, "datetime": str, "priority": str, "category": str, "notes": str, "notified": bool},
+    "chat": {"chat_id": str, "user_query": str, "ai_response": str, "created_at": str},
+}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _line(record: Dict) -> str:
+    return json.dumps(record, default=_json_default, ensure_ascii=False) + "\n"
+
+
+def _export_lines(user_id: int) -> Iterator[bytes]:
+    buf = [_line({"type": "export", "version": EXPORT_VERSION, "user_id": user_id,
+                  "exported_at": datetime.utcnow().isoformat() + "Z"})]
+    size = len(buf[0])
+    for kind, row in db_utils.iter_user_rows(user_id, settings.EXPORT_BATCH_ROWS):
+        line = _line({"type": kind, **row})
+        buf.append(line)
+        size += len(line)
+        if size >= _FLUSH_BYTES:
+            yield "".join(buf).encode("utf-8")
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+async def _export_stream(user_id: int) -> AsyncIterator[bytes]:
+    # The whole download (and its connection) holds one slot of the bulk lane, not the shared
+    # Postgres one: a stalled client can only block other exports and imports
+    async with bulkheads.bulk.slot():
+        lines = _export_lines(user_id)
+        try:
+            while (chunk := await bulkheads.bulk.in_thread(next, lines, None)) is not None:
+                yield chunk
+        finally:
+            lines.close()
+
+
+def _parse_records(stream: IO[bytes]) -> Iterator[Tuple[str, Dict]]:
+    for lineno, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            raise InvalidImport(f"line {lineno}: invalid JSON ({e.msg})")
+        kind = record.pop("type", None) if isinstance(record, dict) else None
+        if kind == "export":
+            continue
+        if kind not in _REQUIRED:
+            raise InvalidImport(f"line {lineno}: unknown record type {kind!r}")
+        if not record.get(_REQUIRED[kind]):
+            raise InvalidImport(f"line {lineno}: {kind} record needs '{_REQUIRED[kind]}'")
+        for field, expected in _FIELD_TYPES[kind].items():
+            value = record.get(field)
+            if value is not None and not isinstance(value, expected):
+                raise InvalidImport(f"line {lineno}: '{field}' must be a {expected.__name__}")
+        if kind == "chat" and record.get("created_at") is not None:
+            try:
+                datetime.fromisoformat(record["created_at"])  # its month is needed before the insert
+            except ValueError:
+                raise InvalidImport(f"line {lineno}: 'created_at' is not an ISO timestamp")
+        yield kind, record
+
+
+@router.get("/export")
+async def export_user_data(token: str):
+    """
+    Stream all of the user's tasks and chat turns as NDJSON (constant memory on the server).
+    """
+    user_id = get_current_user_id(token)
+    filename = f"export-{user_id}-{datetime.utcnow():%Y%m%d}.ndjson"
+    return StreamingResponse(
+        _export_stream(user_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import")
+async def import_user_data(token: str = Form(...), file: UploadFile = File(...)):
+    """
+    Load an NDJSON export into the user's account. Nothing is written unless every line is valid.
+    """
+    user_id = get_current_user_id(token)
+    try:
+        spool = await ingestion.spool_upload(file, settings.IMPORT_MAX_BYTES)
+    except ingestion.IngestionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    try:
+        # First pass over the spooled file: validates every line and creates missing chat months
+        await bulkheads.bulk.run(db_utils.prepare_import, _parse_records(spool))
+        spool.seek(0)
+        counts = await bulkheads.bulk.run(
+            db_utils.bulk_import, user_id, _parse_records(spool), settings.EXPORT_BATCH_ROWS
+        )
+    except BulkheadFull:
+        raise
+    except InvalidImport as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except psycopg2.errors.LockNotAvailable:
+        # Creating a chat month timed out waiting for chat_history; nothing was imported
+        raise HTTPException(status_code=503, detail="Chat history is busy, please retry", headers={"Retry-After": "5"})
+    except psycopg2.DataError as e:
+        # e.g. an unparseable datetime; the whole import was rolled back
+        raise HTTPException(status_code=422, detail=f"Invalid value: {e.pgerror or e}".strip())
+    except Exception as e:
+        logger.exception(f"Import failed: {e}")
+        raise HTTPException(status_code=500, detail="Import failed")
+    finally:
+        spool.close()
+    return {"success": True, "imported": {"tasks": counts["task"], "chats": counts["chat"]}}
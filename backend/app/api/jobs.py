@@ -0,0 +1,92 @@
+# backend/app/api/jobs.py
+from fastapi import APIRouter, HTTPException, File, Form, UploadFile
+from fastapi.concurrency import run_in_threadpool
+import json
+import logging
+import os
+import uuid
+
+from app import bulkheads
+from app.api.auth import get_current_user_id
+from app.bulkheads import BulkheadFull
+from app.services import ingestion, jobs
+from app.worker import run_job
+
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+logger = logging.getLogger(__name__)
+
+
+def _prompt_text(prompt: str) -> str:
+    # Same prompt format as /chat-with-upload/: JSON {"sender": ..., "text": ...} or plain text
+    try:
+        obj = json.loads(prompt)
+        return obj.get("text") if isinstance(obj, dict) else str(prompt)
+    except Exception:
+        return str(prompt)
+
+
+@router.post("", status_code=202)
+async def submit_job(
+    token: str = Form(...),
+    kind: str = Form(...),
+    prompt: str = Form(...),
+    chat_id: str | None = Form(default=None),
+    file: UploadFile | None = File(default=None),
+):
+    """
+    Queue a chat turn (kind=chat) or a document upload + question (kind=upload, with file).
+    Returns the job id to poll at GET /jobs/{job_id}.
+    """
+    user_id = get_current_user_id(token)
+    if kind not in jobs.KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(jobs.KINDS)}")
+    if kind == "upload" and file is None:
+        raise HTTPException(status_code=400, detail="kind=upload needs a file")
+
+    job_id = uuid.uuid4().hex
+    text = _prompt_text(prompt)
+    if kind == "chat":
+        params = {"message": text, "chat_id": chat_id}
+    else:
+        path = jobs.upload_path(job_id, file.filename)
+        try:
+            await ingestion.save_upload(file, path)
+        except ingestion.IngestionError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        params = {"prompt": text, "chat_id": chat_id, "path": path,
+                  "filename": file.filename, "content_type": file.content_type}
+
+    try:
+        await bulkheads.redis.run(jobs.create_job, user_id, kind, params, job_id)
+        await bulkheads.redis.run(run_job.apply_async, args=[job_id])
+    except Exception as e:
+        logger.exception(f"Job submit failed: {e}")
+        await run_in_threadpool(_abandon, job_id, params)
+        raise HTTPException(status_code=503, detail="Job queue unavailable, please retry", headers={"Retry-After": "5"})
+    return {"success": True, "job_id": job_id, "status": jobs.QUEUED}
+
+
+def _abandon(job_id: str, params: dict):
+    try:
+        jobs.update_job(job_id, status=jobs.FAILED, stage="failed", error="could not be queued")
+    except Exception:
+        pass
+    path = params.get("path")
+    if path and os.path.exists(path):
+        os.unlink(path)
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, token: str):
+    user_id = get_current_user_id(token)
+    try:
+        job = await bulkheads.redis.run(jobs.get_job, job_id)
+    except BulkheadFull:
+        raise
+    except Exception as e:
+        logger.exception(f"Job lookup failed: {e}")
+        raise HTTPException(status_code=503, detail="Job status unavailable")
+    if job is None or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, **jobs.public_view(job)}
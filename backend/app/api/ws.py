@@ -0,0 +1,48 @@
+# backend/app/api/ws.py
+from fastapi import APIRouter, HTTPException, WebSocket
+import asyncio
+import logging
+
+from app.api.auth import get_current_user_id
+from app.events import event_hub
+from app.metrics import WS_CONNECTIONS
+
+
+router = APIRouter(tags=["events"])
+logger = logging.getLogger(__name__)
+
+
+@router.websocket("/ws")
+async def ws_events(websocket: WebSocket, token: str):
+    """
+    Push channel for the user's events (see app/events.py), one JSON object per message.
+    Authenticated like the REST endpoints, with the JWT in ?token=.
+    """
+    try:
+        user_id = get_current_user_id(token)
+    except HTTPException:
+        await websocket.close(code=1008)  # policy violation: bad or expired token
+        return
+
+    await websocket.accept()
+    queue = event_hub.subscribe(user_id)
+    WS_CONNECTIONS.inc()
+
+    async def pump():
+        while True:
+            await websocket.send_text(await queue.get())
+
+    async def drain():
+        # Client → server messages are ignored; this only notices the disconnect
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(pump()), asyncio.create_task(drain())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        event_hub.unsubscribe(user_id, queue)
+        WS_CONNECTIONS.dec()
@@ -0,0 +1,144 @@
+# backend/app/bulkheads.py
+"""
+Bulkheads: separately sized lanes per backend dependency.
+
+Every call to Postgres, Neo4j, Redis, the embedder or an LLM goes through the
+bulkhead of that dependency instead of Starlette's one shared threadpool.
+Each bulkhead admits `size` calls at a time and lets `queue_limit` more wait;
+beyond that it rejects at once (BulkheadFull → 503), so a dependency that
+hangs only fills its own lane and e.g. /api/tasks keeps working while Neo4j
+or Gemini is slow.
+
+Blocking functions run on the bulkhead's own threads; coroutine functions
+(the async data layer) just hold one of its slots while they run.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from app.config import settings
+from app.metrics import BULKHEAD_CALLS, BULKHEAD_CAPACITY, BULKHEAD_IN_FLIGHT, BULKHEAD_RUNNING, BULKHEAD_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class BulkheadFull(RuntimeError):
+    def __init__(self, name: str):
+        super().__init__(f"{name} bulkhead is saturated")
+        self.name = name
+
+
+class Bulkhead:
+    def __init__(self, name: str, size: int, queue_limit: int):
+        self.name = name
+        self.size = size
+        self.queue_limit = queue_limit
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self._in_flight = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "max_in_flight": 0}
+        BULKHEAD_CAPACITY.labels(name).set(size)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=f"bulkhead-{self.name}")
+            return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # One per event loop (a semaphore cannot be shared across loops, e.g. between test clients)
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore, self._semaphore_loop = asyncio.Semaphore(self.size), loop
+        return self._semaphore
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold one of the `size` slots for the duration of the block, waiting in the queue if
+        needed. Raises BulkheadFull straight away when the queue is full as well.
+        """
+        with self._lock:
+            if self._in_flight >= self.size + self.queue_limit:
+                self._stats["rejected"] += 1
+                BULKHEAD_CALLS.labels(self.name, "rejected").inc()
+                raise BulkheadFull(self.name)
+            self._in_flight += 1
+            self._stats["submitted"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._in_flight)
+        BULKHEAD_IN_FLIGHT.labels(self.name).inc()
+
+        queued = time.perf_counter()
+        ok = False
+        try:
+            async with self._get_semaphore():
+                BULKHEAD_WAIT.labels(self.name).observe(time.perf_counter() - queued)
+                BULKHEAD_RUNNING.labels(self.name).inc()
+                try:
+                    yield
+                    ok = True
+                finally:
+                    BULKHEAD_RUNNING.labels(self.name).dec()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._stats["completed" if ok else "failed"] += 1
+            BULKHEAD_IN_FLIGHT.labels(self.name).dec()
+            BULKHEAD_CALLS.labels(self.name, "completed" if ok else "failed").inc()
+
+    async def in_thread(self, fn, *args, **kwargs):
+        """
+        Run a blocking call on this bulkhead's threads; the caller must already hold a slot().
+        """
+        ctx = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(ctx.run, fn, *args, **kwargs))
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Await fn(*args, **kwargs) inside one slot: coroutine functions directly, blocking ones
+        on this bulkhead's threads (the replacement for run_in_threadpool).
+        """
+        async with self.slot():
+            if asyncio.iscoroutinefunction(fn):
+                return await fn(*args, **kwargs)
+            return await self.in_thread(fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "in_flight": self._in_flight, "size": self.size, "queue_limit": self.queue_limit}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+postgres = Bulkhead("postgres", settings.BULKHEAD_POSTGRES_SIZE, settings.BULKHEAD_POSTGRES_QUEUE)
+neo4j = Bulkhead("neo4j", settings.BULKHEAD_NEO4J_SIZE, settings.BULKHEAD_NEO4J_QUEUE)
+redis = Bulkhead("redis", settings.BULKHEAD_REDIS_SIZE, settings.BULKHEAD_REDIS_QUEUE)
+embeddings = Bulkhead("embeddings", settings.BULKHEAD_EMBEDDINGS_SIZE, settings.BULKHEAD_EMBEDDINGS_QUEUE)
+llm = Bulkhead("llm", settings.BULKHEAD_LLM_SIZE, settings.BULKHEAD_LLM_QUEUE)
+# Export downloads are paced by the client: they get their own lane so slow readers never starve `postgres`
+bulk = Bulkhead("bulk", settings.BULKHEAD_BULK_SIZE, settings.BULKHEAD_BULK_QUEUE)
+
+ALL: Dict[str, Bulkhead] = {b.name: b for b in (postgres, neo4j, redis, embeddings, llm, bulk)}
+
+
+def stats() -> Dict[str, dict]:
+    return {name: b.stats() for name, b in ALL.items()}
+
+
+def shutdown():
+    for b in ALL.values():
+        b.shutdown()
@@ -17,6 +17,9 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = Field("personal_ai", env="POSTGRES_DB")
     POSTGRES_HOST: str = Field("db", env="POSTGRES_HOST")
     POSTGRES_PORT: int = Field(5432, env="POSTGRES_PORT")
+    # Async pool used by the API handlers (the Celery worker keeps one connection per call)
+    POSTGRES_POOL_MIN: int = Field(2, env="POSTGRES_POOL_MIN")
+    POSTGRES_POOL_MAX: int = Field(20, env="POSTGRES_POOL_MAX")  # per API process
 
     # ====== Redis ======
     # Main Redis connection (some services use this default variable)
@@ -31,6 +34,7 @@ class Settings(BaseSettings):
     NEO4J_URI: str = Field("bolt://neo4j:7687", env="NEO4J_URI")
     NEO4J_USER: str = Field("neo4j", env="NEO4J_USER")
     NEO4J_PASSWORD: str = Field(..., env="NEO4J_PASSWORD")
+    NEO4J_BULK_CHUNK_ROWS: int = Field(1000, env="NEO4J_BULK_CHUNK_ROWS")  # facts per UNWIND transaction in save_facts_bulk
 
     # ====== Email Settings ======
     EMAIL_USER: Optional[str] = Field(None, env="EMAIL_USER")
@@ -45,14 +49,79 @@ class Settings(BaseSettings):
     DEBUG: bool = Field(True, env="DEBUG")
     # Optional: comma-separated CORS origins for production (e.g., https://myapp.onrender.com)
     CORS_ALLOW_ORIGINS: Optional[str] = Field(None, env="CORS_ALLOW_ORIGINS")
+    TASK_BATCH_MAX: int = Field(1000, env="TASK_BATCH_MAX")  # tasks accepted per POST /api/tasks/batch
+    TASK_TOMBSTONE_DAYS: int = Field(30, env="TASK_TOMBSTONE_DAYS")  # deleted tasks kept for delta sync; older cursors get 410
 
     # ====== AI Settings ======
     AI_PROVIDER_FAILURE_TIMEOUT: int = Field(30, env="AI_PROVIDER_FAILURE_TIMEOUT")
+    # Hedged requests: fire the secondary provider if the primary is slow
+    AI_HEDGING_ENABLED: bool = Field(False, env="AI_HEDGING_ENABLED")
+    AI_HEDGE_DELAY_SECONDS: float = Field(0.0, env="AI_HEDGE_DELAY_SECONDS")  # 0 = use observed p90
+    AI_HEDGE_FALLBACK_DELAY_SECONDS: float = Field(3.0, env="AI_HEDGE_FALLBACK_DELAY_SECONDS")  # until enough samples
+    AI_HEDGE_BUDGET_RATIO: float = Field(0.1, env="AI_HEDGE_BUDGET_RATIO")  # max share of requests that may hedge
+    # Shared provider/key health (circuit breakers in Redis); open time is AI_PROVIDER_FAILURE_TIMEOUT
+    AI_HEALTH_EWMA_ALPHA: float = Field(0.3, env="AI_HEALTH_EWMA_ALPHA")
+    AI_HEALTH_ERROR_THRESHOLD: float = Field(0.5, env="AI_HEALTH_ERROR_THRESHOLD")  # error-rate EWMA that opens the breaker
+    AI_HEALTH_MIN_SAMPLES: int = Field(3, env="AI_HEALTH_MIN_SAMPLES")
+    AI_HEALTH_PROBE_TIMEOUT: int = Field(15, env="AI_HEALTH_PROBE_TIMEOUT")  # seconds one half-open probe may take
+    # Per-key Gemini quotas (token buckets shared through Redis)
+    GEMINI_KEY_RPM: int = Field(10, env="GEMINI_KEY_RPM")  # requests per minute per key
+    GEMINI_KEY_TPM: int = Field(250000, env="GEMINI_KEY_TPM")  # tokens per minute per key
+    GEMINI_KEY_QUEUE_SECONDS: float = Field(5.0, env="GEMINI_KEY_QUEUE_SECONDS")  # max wait when every key is saturated
+    GEMINI_EXPECTED_OUTPUT_TOKENS: int = Field(512, env="GEMINI_EXPECTED_OUTPUT_TOKENS")
+
+    # ====== Bulkheads (concurrent calls per dependency, and how many more may wait) ======
+    BULKHEAD_POSTGRES_SIZE: int = Field(20, env="BULKHEAD_POSTGRES_SIZE")  # keep <= POSTGRES_POOL_MAX
+    BULKHEAD_POSTGRES_QUEUE: int = Field(100, env="BULKHEAD_POSTGRES_QUEUE")
+    BULKHEAD_NEO4J_SIZE: int = Field(10, env="BULKHEAD_NEO4J_SIZE")
+    BULKHEAD_NEO4J_QUEUE: int = Field(20, env="BULKHEAD_NEO4J_QUEUE")
+    BULKHEAD_REDIS_SIZE: int = Field(20, env="BULKHEAD_REDIS_SIZE")
+    BULKHEAD_REDIS_QUEUE: int = Field(100, env="BULKHEAD_REDIS_QUEUE")
+    BULKHEAD_EMBEDDINGS_SIZE: int = Field(4, env="BULKHEAD_EMBEDDINGS_SIZE")  # document ingestion
+    BULKHEAD_EMBEDDINGS_QUEUE: int = Field(8, env="BULKHEAD_EMBEDDINGS_QUEUE")
+    BULKHEAD_LLM_SIZE: int = Field(32, env="BULKHEAD_LLM_SIZE")  # threads blocked on a provider reply
+    BULKHEAD_LLM_QUEUE: int = Field(64, env="BULKHEAD_LLM_QUEUE")
+    BULKHEAD_BULK_SIZE: int = Field(4, env="BULKHEAD_BULK_SIZE")  # exports / imports, each on its own connection
+    BULKHEAD_BULK_QUEUE: int = Field(4, env="BULKHEAD_BULK_QUEUE")
 
     # ====== Auth/JWT ======
     JWT_SECRET_KEY: str = Field("change_me_in_env", env="JWT_SECRET_KEY")
     JWT_ALGORITHM: str = Field("HS256", env="JWT_ALGORITHM")
     JWT_EXPIRES_MINUTES: int = Field(60 * 24 * 7, env="JWT_EXPIRES_MINUTES")  # default 7 days
+    # Password hashing runs on its own process pool, not the request threadpool
+    AUTH_HASH_POOL_SIZE: int = Field(2, env="AUTH_HASH_POOL_SIZE")
+    AUTH_HASH_QUEUE_LIMIT: int = Field(32, env="AUTH_HASH_QUEUE_LIMIT")  # waiting jobs before fast rejection
+
+    # ====== Document Uploads ======
+    UPLOAD_MAX_BYTES: int = Field(20 * 1024 * 1024, env="UPLOAD_MAX_BYTES")  # larger uploads get 413
+    UPLOAD_SPOOL_BYTES: int = Field(1024 * 1024, env="UPLOAD_SPOOL_BYTES")  # kept in memory before spilling to disk
+    UPLOAD_CHUNK_CHARS: int = Field(1000, env="UPLOAD_CHUNK_CHARS")
+    UPLOAD_CHUNK_OVERLAP: int = Field(150, env="UPLOAD_CHUNK_OVERLAP")
+    UPLOAD_EMBED_BATCH: int = Field(32, env="UPLOAD_EMBED_BATCH")  # chunks embedded + stored per batch
+    UPLOAD_MAX_CHUNKS: int = Field(5000, env="UPLOAD_MAX_CHUNKS")  # chunks beyond this are not ingested
+
+    # ====== Background Jobs (POST /jobs, run by the Celery worker) ======
+    JOB_TTL_SECONDS: int = Field(24 * 3600, env="JOB_TTL_SECONDS")  # status/result kept in Redis this long
+    JOB_UPLOAD_DIR: str = Field("/app/job_uploads", env="JOB_UPLOAD_DIR")  # a volume mounted by both API and worker
+
+    # ====== Export / Import (GET /api/export, POST /api/import) ======
+    EXPORT_BATCH_ROWS: int = Field(1000, env="EXPORT_BATCH_ROWS")  # rows fetched / inserted per round trip
+    IMPORT_MAX_BYTES: int = Field(500 * 1024 * 1024, env="IMPORT_MAX_BYTES")  # larger NDJSON uploads get 413
+
+    # ====== Chat History Partitions ======
+    CHAT_PARTITION_MONTHS_AHEAD: int = Field(3, env="CHAT_PARTITION_MONTHS_AHEAD")  # monthly partitions created in advance
+    CHAT_ARCHIVE_AFTER_MONTHS: int = Field(12, env="CHAT_ARCHIVE_AFTER_MONTHS")  # older months move to CHAT_ARCHIVE_DIR; 0 = never
+    CHAT_ARCHIVE_DIR: str = Field("/app/chat_archive", env="CHAT_ARCHIVE_DIR")  # must be shared by API and worker
+
+    # ====== Knowledge Graph Extraction (Celery worker; scan interval and rate limit are set in app/worker.py) ======
+    KG_MIN_TURNS: int = Field(3, env="KG_MIN_TURNS")  # new turns that make a user due for extraction...
+    KG_IDLE_SECONDS: int = Field(600, env="KG_IDLE_SECONDS")  # ...or fewer, once the user has been quiet this long
+    KG_BATCH_MAX_TURNS: int = Field(20, env="KG_BATCH_MAX_TURNS")  # turns sent in one extraction LLM call
+    KG_LOOKBACK_HOURS: int = Field(24, env="KG_LOOKBACK_HOURS")  # older unprocessed turns are never extracted
+    KG_LOCK_SECONDS: int = Field(900, env="KG_LOCK_SECONDS")  # a user queued or in progress is not queued again for this long
+
+    # ====== Push Events (/ws) ======
+    EVENTS_QUEUE_SIZE: int = Field(100, env="EVENTS_QUEUE_SIZE")  # undelivered events per socket before it is told to resync
 
     class Config:
         env_file = ".env"
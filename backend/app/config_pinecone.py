@@ -7,6 +7,12 @@ class PineconeSettings(BaseSettings):
     PINECONE_ENVIRONMENT: str = Field(..., env="PINECONE_ENVIRONMENT")  # e.g., "us-east1"
     PINECONE_INDEX_NAME: str = Field("semantic-memory", env="PINECONE_INDEX_NAME")
     EMBEDDING_DIM: int = Field(384, env="EMBEDDING_DIM")  # match your embedding model
+    PINECONE_USER_NAMESPACES: bool = Field(False, env="PINECONE_USER_NAMESPACES")  # one namespace per user; turn on only after app.tools.semantic_namespace_migrate has run
+    SEMANTIC_DEDUP_THRESHOLD: float = Field(0.0, env="SEMANTIC_DEDUP_THRESHOLD")  # e.g. 0.95; 0 = exact-match dedup only
+    SEMANTIC_MIN_SCORE: float = Field(0.3, env="SEMANTIC_MIN_SCORE")  # cosine floor for a memory to reach the prompt
+    SEMANTIC_MMR_LAMBDA: float = Field(0.7, env="SEMANTIC_MMR_LAMBDA")  # 1 = pure relevance, lower = more diverse
+    SEMANTIC_RECENCY_WEIGHT: float = Field(0.0, env="SEMANTIC_RECENCY_WEIGHT")  # 0..1 share of relevance that decays with age
+    SEMANTIC_RECENCY_HALF_LIFE_DAYS: float = Field(30.0, env="SEMANTIC_RECENCY_HALF_LIFE_DAYS")
 
     class Config:
         extra = "ignore"  # ✅ ignore unrelated keys from .env
@@ -0,0 +1,126 @@
+# backend/app/db/async_neo4j_utils.py
+"""
+Async twins of the request-path functions in app.db.neo4j_utils.
+
+One AsyncGraphDatabase driver (and its connection pool) is shared by the process instead
+of a driver per call; errors are logged and swallowed exactly like the sync versions.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from neo4j import AsyncGraphDatabase, AsyncDriver
+
+from app.config import settings
+from app.db.neo4j_utils import ALL_FACTS_QUERY, BULK_FACTS_QUERY, chunked, facts_dict, prepare_fact_rows
+from app.singleflight import singleflight
+
+logger = logging.getLogger(__name__)
+
+_driver: Optional[AsyncDriver] = None
+
+
+# ======================================================
+# 🔹 Neo4j Connection
+# ======================================================
+def get_driver() -> AsyncDriver:
+    global _driver
+    if _driver is None:
+        _driver = AsyncGraphDatabase.driver(
+            settings.NEO4J_URI,
+            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+        )
+    return _driver
+
+
+async def close():
+    global _driver
+    if _driver is not None:
+        await _driver.close()
+        _driver = None
+
+
+# ======================================================
+# 🔹 FACTS
+# ======================================================
+async def save_fact_neo4j(key: str, value: str):
+    """
+    Save or update a general fact (not tied to user).
+    """
+    query = """
+    MERGE (f:Fact {owner: '', key: $key})
+    SET f.value = $value,
+        f.updated_at = timestamp()
+    RETURN f
+    """
+    try:
+        async with get_driver().session() as session:
+            result = await session.run(query, key=key, value=value)
+            await result.consume()
+        logger.info(f"✅ Saved fact: {key} → {value}")
+    except Exception as e:
+        logger.error(f"❌ Failed to save fact in Neo4j: {e}")
+
+
+async def save_user_fact_neo4j(user_id: str, key: str, value: str):
+    """
+    Save a personalized user fact; creates (User)-[:OWNS]->(Fact).
+    """
+    query = """
+    MERGE (u:User {id: $user_id})
+    MERGE (f:Fact {owner: $user_id, key: $key})
+    SET f.value = $value,
+        f.updated_at = timestamp()
+    MERGE (u)-[:OWNS]->(f)
+    RETURN f
+    """
+    try:
+        async with get_driver().session() as session:
+            result = await session.run(query, user_id=user_id, key=key, value=value)
+            await result.consume()
+        logger.info(f"✅ Saved user fact: {user_id} → {key}: {value}")
+    except Exception as e:
+        logger.error(f"❌ Failed to save user fact in Neo4j: {e}")
+
+
+async def _write_fact_chunk(tx, rows: List[Dict[str, Any]]) -> List[int]:
+    result = await tx.run(BULK_FACTS_QUERY, rows=rows)
+    return [r["row_index"] async for r in result]
+
+
+async def save_facts_bulk(facts: Iterable[Dict[str, Any]], chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    See app.db.neo4j_utils.save_facts_bulk: one UNWIND transaction per chunk, per-row results.
+    """
+    rows, results = prepare_fact_rows(facts)
+    if not rows:
+        return results
+    size = chunk_size or settings.NEO4J_BULK_CHUNK_ROWS
+    async with get_driver().session() as session:
+        for chunk in chunked(rows, size):
+            try:
+                written = set(await session.execute_write(_write_fact_chunk, chunk))
+                for r in chunk:
+                    results[r["index"]]["status"] = "saved" if r["index"] in written else "failed"
+            except Exception as e:
+                logger.error(f"❌ Failed to save {len(chunk)} facts in Neo4j: {e}")
+                for r in chunk:
+                    results[r["index"]].update(status="failed", error=str(e))
+    return results
+
+
+@singleflight
+async def get_all_facts_for_user(user_id: str) -> Dict[str, str]:
+    """
+    Retrieve all facts linked to a user as {key: value} (extracted relations included).
+    """
+    try:
+        async with get_driver().session() as session:
+            result = await session.run(ALL_FACTS_QUERY, user_id=user_id)
+            return facts_dict([r async for r in result])
+    except Exception as e:
+        logger.error(f"❌ Failed to fetch all facts for user: {e}")
+        return {}
+
+
+# Same alias as the sync module
+get_facts_neo4j = get_all_facts_for_user
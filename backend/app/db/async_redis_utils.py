@@ -0,0 +1,41 @@
+# backend/app/db/async_redis_utils.py
+"""
+Async twins of the chat-history functions in app.db.redis_utils (same keys, same format).
+"""
+import json
+
+import redis.asyncio as aioredis
+
+from app.config import settings
+from app.db.redis_utils import _user_key
+from app.metrics import record_cache
+
+# Connections are made lazily, on the event loop that first uses them
+client = aioredis.Redis.from_url(settings.REDIS_URL_CHAT, decode_responses=True)
+
+
+async def ping():
+    await client.ping()
+
+
+async def close():
+    await client.aclose()
+
+
+async def save_chat_redis(user_id: int, user_message: str, bot_reply: str, chat_id: str | None = None):
+    chat_entry = {"chat_id": chat_id, "user": user_message, "bot": bot_reply}
+    key = _user_key(user_id)
+    # One round trip for both commands
+    pipe = client.pipeline(transaction=False)
+    pipe.lpush(key, json.dumps(chat_entry))
+    pipe.ltrim(key, 0, 9)  # keep only last 10 messages
+    await pipe.execute()
+
+
+async def get_last_chats(user_id: int, limit: int = 10):
+    """
+    Fetch last N chats from Redis (default 10) as [{"user": ..., "bot": ...}, ...]
+    """
+    chats = await client.lrange(_user_key(user_id), 0, limit - 1)
+    record_cache("redis_chat_history", bool(chats))
+    return [json.loads(c) for c in chats]
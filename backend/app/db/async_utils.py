@@ -0,0 +1,211 @@
+# backend/app/db/async_utils.py
+"""
+Async twins of the request-path functions in app.db.utils, for FastAPI handlers to await.
+
+Same SQL, same return shapes (plain dicts): the statements and row shaping live in
+app.db.utils and are only executed differently here, on a psycopg 3 AsyncConnectionPool
+instead of a fresh psycopg2 connection per call. The sync module stays the one the Celery
+worker, migrations and export/import use.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from psycopg.conninfo import make_conninfo
+from psycopg.errors import CheckViolation
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from app.config import settings
+from app.db import chat_archive
+from app.db import utils as db_utils
+from app.singleflight import singleflight
+
+_pool: Optional[AsyncConnectionPool] = None
+
+
+# ---------------- CONNECTION POOL ----------------
+async def get_pool() -> AsyncConnectionPool:
+    """The process-wide pool, opened on first use (connections are filled in the background)."""
+    global _pool
+    if _pool is None:
+        conninfo = make_conninfo(
+            dbname=settings.POSTGRES_DB,
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            host=settings.POSTGRES_HOST,
+            port=settings.POSTGRES_PORT,
+        )
+        _pool = AsyncConnectionPool(
+            conninfo,
+            min_size=settings.POSTGRES_POOL_MIN,
+            max_size=settings.POSTGRES_POOL_MAX,
+            kwargs={"row_factory": dict_row},
+            open=False,
+        )
+    if _pool.closed:
+        await _pool.open()  # safe to call concurrently
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def _fetchall(query: str, params: tuple) -> List[Dict]:
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(query, params)
+        return await cur.fetchall()
+
+
+async def _fetchone(query: str, params: tuple) -> Optional[Dict]:
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(query, params)
+        return await cur.fetchone()
+
+
+async def _archived_rows(conn, user_id: int, chat_id: Optional[str] = None) -> List[Dict]:
+    # Catalog lookup on the connection; the (rare) gzip reads of matching months go to a thread
+    cur = await conn.execute(chat_archive.ARCHIVE_LOOKUP_SQL, chat_archive.lookup_params(user_id, chat_id))
+    paths = [r["path"] for r in await cur.fetchall()]
+    if not paths:
+        return []
+    return await asyncio.to_thread(chat_archive.read_archived, paths, user_id)
+
+
+# ---------------- TASK FUNCTIONS ----------------
+async def save_task(task_data: dict) -> int:
+    row = await _fetchone(db_utils.SAVE_TASK_SQL, db_utils.save_task_params(task_data))
+    print(f"✅ Task saved: {task_data.get('title')}")
+    return row["id"]
+
+
+async def save_tasks_bulk(user_id: int, tasks: List[Dict]) -> List[Dict]:
+    """See app.db.utils.save_tasks_bulk: paged multi-row upserts in one transaction, results in input order."""
+    if not tasks:
+        return []
+    rows = db_utils.task_upsert_rows(user_id, tasks)
+    # psycopg 3 has no execute_values: expand the VALUES list here, a page at a time, in one transaction
+    result = []
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        for start in range(0, len(rows), db_utils.UPSERT_TASKS_PAGE):
+            page = rows[start:start + db_utils.UPSERT_TASKS_PAGE]
+            values = ", ".join([db_utils.UPSERT_TASK_TEMPLATE] * len(page))
+            cur = await conn.execute(db_utils.UPSERT_TASKS_SQL.replace("VALUES %s", f"VALUES {values}"),
+                                     [v for row in page for v in row])
+            result.extend(await cur.fetchall())
+    print(f"✅ {len(result)} task(s) saved in one batch for user {user_id}")
+    return result
+
+
+async def get_tasks(user_id: int) -> List[Dict]:
+    return await _fetchall(db_utils.GET_TASKS_SQL, (user_id,))
+
+
+async def get_task_version(user_id: int) -> int:
+    row = await _fetchone(db_utils.TASK_VERSION_SQL, {"user_id": user_id})
+    return row["version"]
+
+
+async def get_task_changes(user_id: int, since: int, limit: int = 1000):
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(db_utils.TASK_HORIZON_SQL, (user_id,))
+        horizon = await cur.fetchone()
+        cur = await conn.execute(db_utils.TASK_CHANGES_SQL, (user_id, since, limit + 1))
+        rows = await cur.fetchall()
+    return db_utils.task_changes_page(rows, since, horizon, limit)
+
+
+async def delete_task(user_id: int, task_id: int) -> bool:
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(db_utils.DELETE_TASK_SQL, (task_id, user_id))
+        deleted_count = cur.rowcount
+    if deleted_count > 0:
+        print(f"✅ Task {task_id} deleted for user {user_id}")
+        return True
+    print(f"❌ Task {task_id} not found or doesn't belong to user {user_id}")
+    return False
+
+
+# ---------------- CHAT FUNCTIONS ----------------
+async def save_chat(user_id: int, user_query: str, ai_response: str, chat_id: Optional[str] = None):
+    pool = await get_pool()
+    params = (user_id, chat_id, user_query, ai_response)
+    try:
+        async with pool.connection() as conn:
+            await conn.execute(db_utils.SAVE_CHAT_SQL, params)
+    except CheckViolation:
+        # No partition for this month yet: create it and retry once
+        await asyncio.to_thread(chat_archive.ensure_upcoming_partitions)
+        async with pool.connection() as conn:
+            await conn.execute(db_utils.SAVE_CHAT_SQL, params)
+    print(f"💬 Chat saved: {user_query[:40]}...")
+
+
+@singleflight
+async def get_chat_history(user_id: int, limit: int = 10) -> List[Dict]:
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(db_utils.CHAT_HISTORY_SQL, (user_id, limit))
+        rows = await cur.fetchall()
+        if len(rows) < limit:
+            # Short on recent turns: the rest may be in archived months
+            rows = db_utils.top_up_history(rows, await _archived_rows(conn, user_id), limit)
+    return rows
+
+
+async def get_conversations(user_id: int, limit: int = 50) -> List[Dict]:
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(db_utils.CONVERSATIONS_SQL, (user_id, user_id, limit))
+        rows_with_chat_id = await cur.fetchall()
+        cur = await conn.execute(db_utils.LOOSE_TURNS_SQL, (user_id, limit))
+        rows_without_chat_id = await cur.fetchall()
+        if len(rows_with_chat_id) + len(rows_without_chat_id) < limit:
+            db_utils.add_archived_conversations(
+                await _archived_rows(conn, user_id), rows_with_chat_id, rows_without_chat_id
+            )
+    return db_utils.format_conversations(rows_with_chat_id, rows_without_chat_id, limit)
+
+
+@singleflight
+async def get_messages_by_chat(user_id: int, chat_id: str, limit: int = 200) -> List[Dict]:
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(db_utils.CHAT_MESSAGES_SQL, (user_id, chat_id, limit))
+        rows = await cur.fetchall()
+        if chat_archive.may_continue_archive(rows[0]["created_at"] if rows else None):
+            in_chat = [r for r in await _archived_rows(conn, user_id, chat_id) if r["chat_id"] == chat_id]
+            if in_chat:
+                rows = (in_chat + rows)[:limit]
+        # Backward compatibility: a chat without chat_id is addressed by its row id
+        if not rows and chat_id.isdigit():
+            db_id = int(chat_id)
+            cur = await conn.execute(db_utils.TURN_BY_ID_SQL, (user_id, db_id, limit))
+            rows = await cur.fetchall()
+            if not rows:
+                rows = [r for r in await _archived_rows(conn, user_id) if r["id"] == db_id]
+    return db_utils.format_messages(rows)
+
+
+# ---------------- AUTH HELPERS ----------------
+async def create_user_with_hash(name: str, email: str, password_hash: str) -> Dict:
+    return await _fetchone(db_utils.CREATE_USER_SQL, (name, email, password_hash))
+
+
+async def update_password_hash(user_id: int, password_hash: str):
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        await conn.execute(db_utils.UPDATE_PASSWORD_SQL, (password_hash, user_id))
+
+
+async def get_user_by_email(email: str) -> Optional[Dict]:
+    return await _fetchone(db_utils.USER_BY_EMAIL_SQL, (email,))
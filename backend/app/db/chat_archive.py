@@ -0,0 +1,447 @@
+# backend/app/db/chat_archive.py
+"""
+Monthly partitions of chat_history and archival of the old ones.
+
+chat_history is range-partitioned on created_at, one partition per month
+(chat_history_pYYYY_MM). Partitions are created CHAT_PARTITION_MONTHS_AHEAD
+months in advance by create_tables() and the daily maintenance task.
+
+Months older than CHAT_ARCHIVE_AFTER_MONTHS leave Postgres: each user's rows
+are written to <CHAT_ARCHIVE_DIR>/<partition>-<when>/user_<id>.ndjson.gz, the month
+is recorded in chat_history_archive (with the users and chat_ids it holds in
+chat_history_archive_chats), and the partition is detached and dropped. The
+readers in app.db.utils merge archived rows back in through archived_rows(),
+so callers never see the difference; only the months that hold the user (or
+the chat) asked for are opened.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import psycopg2.errors
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_RE = re.compile(r"^chat_history_p(\d{4})_(\d{2})$")
+_USER_FILE_RE = re.compile(r"^user_(\d+)\.ndjson\.gz$")
+_COLUMNS = ("id", "user_id", "chat_id", "user_query", "ai_response", "created_at")
+_DDL_LOCK_TIMEOUT = "5s"  # partition DDL waits this long for chat_history, then fails instead of queueing everyone
+
+
+# ---------------- MONTH HELPERS ----------------
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"chat_history_p{month.year:04d}_{month.month:02d}"
+
+
+def _partition_month(name: str) -> Optional[date]:
+    m = _PARTITION_RE.match(name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+# ---------------- SCHEMA ----------------
+_CREATE_PARENT = """
+    CREATE TABLE chat_history (
+        id BIGINT NOT NULL DEFAULT nextval('chat_history_id_seq'),
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        chat_id TEXT,
+        user_query TEXT NOT NULL,
+        ai_response TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        -- Full-text search over chat history (kept up to date by Postgres itself)
+        search_tsv tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(user_query, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(ai_response, '')), 'B')
+        ) STORED,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+"""
+
+
+def _relkind(cur, name: str) -> Optional[str]:
+    cur.execute("SELECT relkind FROM pg_class WHERE relname = %s AND relnamespace = 'public'::regnamespace;", (name,))
+    row = cur.fetchone()
+    return row["relkind"] if row else None
+
+
+def setup(cur):
+    """
+    Bring chat_history to the partitioned layout (called by create_tables, inside its transaction):
+    create it on a fresh database, convert a plain table from an older release, then make sure
+    the current and upcoming months have partitions.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_history_archive (
+            path TEXT PRIMARY KEY,
+            partition_name TEXT NOT NULL,
+            range_start TIMESTAMP NOT NULL,
+            range_end TIMESTAMP NOT NULL,
+            row_count BIGINT NOT NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    # Which (user, chat) pairs each archived month holds; months archived before this existed are
+    # 'indexed = FALSE' until run_maintenance() catalogs their files
+    cur.execute("ALTER TABLE chat_history_archive ADD COLUMN IF NOT EXISTS indexed BOOLEAN NOT NULL DEFAULT FALSE;")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_history_archive_chats (
+            path TEXT NOT NULL REFERENCES chat_history_archive(path) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL,
+            chat_id TEXT
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_archive_chats_user ON chat_history_archive_chats (user_id, chat_id);")
+    kind = _relkind(cur, "chat_history")
+    if kind == "r":
+        _migrate_plain_table(cur)
+    elif kind is None:
+        cur.execute("CREATE SEQUENCE IF NOT EXISTS chat_history_id_seq AS BIGINT;")
+        cur.execute(_CREATE_PARENT)
+        cur.execute("ALTER SEQUENCE chat_history_id_seq OWNED BY chat_history.id;")
+    ensure_partitions(cur, month_start(date.today()), settings.CHAT_PARTITION_MONTHS_AHEAD)
+
+
+def _migrate_plain_table(cur):
+    """
+    One-off conversion of the old heap table: rename it out of the way, create the partitioned
+    table with partitions for every month it has rows in, copy the rows over (ids kept), drop it.
+    Runs in the caller's transaction, so a failure leaves the old table untouched.
+    """
+    # Columns added by earlier lightweight migrations may be missing on very old databases
+    cur.execute("ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES users(id) ON DELETE CASCADE;")
+    cur.execute("ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS chat_id TEXT;")
+
+    cur.execute("ALTER TABLE chat_history RENAME TO chat_history_legacy;")
+    # Index names share the schema namespace with the new table's
+    cur.execute("ALTER INDEX IF EXISTS chat_history_pkey RENAME TO chat_history_legacy_pkey;")
+    cur.execute("DROP INDEX IF EXISTS idx_chat_history_search_tsv;")
+    # Keep the SERIAL sequence so new rows continue after the old ids
+    cur.execute("ALTER SEQUENCE chat_history_id_seq OWNED BY NONE;")
+    cur.execute("ALTER SEQUENCE chat_history_id_seq AS BIGINT;")
+    cur.execute(_CREATE_PARENT)
+    cur.execute("ALTER SEQUENCE chat_history_id_seq OWNED BY chat_history.id;")
+
+    cur.execute("SELECT MIN(created_at) AS first FROM chat_history_legacy;")
+    first = cur.fetchone()["first"]
+    if first is not None:
+        first_month = month_start(first.date())
+        this_month = month_start(date.today())
+        months = (this_month.year - first_month.year) * 12 + this_month.month - first_month.month
+        ensure_partitions(cur, first_month, months)
+
+    cur.execute("""
+        INSERT INTO chat_history (id, user_id, chat_id, user_query, ai_response, created_at)
+        SELECT id, user_id, chat_id, user_query, ai_response, COALESCE(created_at, CURRENT_TIMESTAMP)
+        FROM chat_history_legacy;
+    """)
+    moved = cur.rowcount
+    cur.execute("DROP TABLE chat_history_legacy;")
+    logger.info(f"🗂️ chat_history converted to monthly partitions ({moved} rows moved)")
+
+
+def ensure_partitions(cur, first_month: date, months_ahead: int):
+    """
+    Create the partitions for first_month .. first_month + months_ahead (existing ones are left alone).
+    """
+    for i in range(months_ahead + 1):
+        month = add_months(first_month, i)
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF chat_history "
+            "FOR VALUES FROM (%s) TO (%s);",
+            (month.isoformat(), add_months(month, 1).isoformat()),
+        )
+
+
+def ensure_partitions_for(timestamps: Iterable) -> None:
+    """
+    Make sure every month that the given created_at values fall in has a partition (bulk imports).
+    Must run before the caller's own transaction touches chat_history: creating a partition takes
+    an exclusive lock on the parent, which would wait forever on that transaction's row lock.
+    Missing months are created on their own, immediately committed connection, under a lock_timeout.
+    """
+    from app.db.utils import get_connection
+
+    months = {month_start(ts.date() if isinstance(ts, datetime) else ts) for ts in timestamps if ts is not None}
+    if not months:
+        return
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SET lock_timeout = '{_DDL_LOCK_TIMEOUT}';")
+        for month in sorted(months):
+            cur.execute("SELECT to_regclass(%s) IS NULL AS missing;", (partition_name(month),))
+            if cur.fetchone()["missing"]:
+                ensure_partitions(cur, month, 0)
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
+def ensure_upcoming_partitions():
+    """
+    Create this month's partition, by the database clock, and the ones ahead. Called when an insert
+    finds no partition for its row (maintenance has not run for a while), on its own connection.
+    """
+    from app.db.utils import get_connection
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SET lock_timeout = '{_DDL_LOCK_TIMEOUT}';")
+        cur.execute("SELECT LOCALTIMESTAMP AS now;")
+        ensure_partitions(cur, month_start(cur.fetchone()["now"].date()), settings.CHAT_PARTITION_MONTHS_AHEAD)
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+    logger.warning("🗂️ chat_history had no partition for the current month; created it")
+
+
+def list_partitions(cur) -> List[Tuple[str, date]]:
+    cur.execute("""
+        SELECT c.relname AS name FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'chat_history'::regclass;
+    """)
+    found = [(r["name"], _partition_month(r["name"])) for r in cur.fetchall()]
+    return sorted((n, m) for n, m in found if m is not None)
+
+
+# ---------------- ARCHIVAL ----------------
+def _user_file(directory: str, user_id) -> str:
+    return os.path.join(directory, f"user_{user_id if user_id is not None else 'none'}.ndjson.gz")
+
+
+def _write_partition(cur, name: str, directory: str) -> int:
+    """
+    Stream one partition into per-user gzip NDJSON files (server-side cursor, one user file open at a time).
+    The directory only appears, via rename, once every file is complete.
+    """
+    tmp_dir = directory + ".tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    stream = cur.connection.cursor(name=f"archive_{name}")
+    stream.itersize = 5000
+    stream.execute(f"SELECT {', '.join(_COLUMNS)} FROM {name} ORDER BY user_id, created_at, id;")
+    count, current_user, out = 0, object(), None
+    try:
+        for row in stream:
+            if row["user_id"] != current_user:
+                if out is not None:
+                    out.close()
+                current_user = row["user_id"]
+                out = gzip.open(_user_file(tmp_dir, current_user), "wt", encoding="utf-8")
+            out.write(json.dumps({k: row[k] for k in _COLUMNS}, default=str, ensure_ascii=False) + "\n")
+            count += 1
+    finally:
+        if out is not None:
+            out.close()
+        stream.close()
+    os.rename(tmp_dir, directory)
+    return count
+
+
+def archive_old_partitions(after_months: Optional[int] = None, archive_dir: Optional[str] = None) -> List[str]:
+    """
+    Archive every monthly partition that ended more than after_months months ago.
+    Each month is locked against writes, written out, cataloged, detached and dropped in its own
+    transaction; if that transaction does not commit, its archive directory is removed again.
+    A month whose locks are not granted within the lock_timeout is left for the next run.
+    A month that gets rows again later (e.g. an import) is archived again into a new directory.
+    Returns the archived partition names.
+    """
+    from app.db.utils import get_connection
+
+    after_months = settings.CHAT_ARCHIVE_AFTER_MONTHS if after_months is None else after_months
+    archive_dir = archive_dir or settings.CHAT_ARCHIVE_DIR
+    if after_months <= 0:
+        return []
+    cutoff = add_months(month_start(date.today()), -after_months)
+
+    conn = get_connection()
+    archived = []
+    try:
+        cur = conn.cursor()
+        # DETACH locks the whole parent: never let it queue every chat query behind a long read
+        cur.execute(f"SET lock_timeout = '{_DDL_LOCK_TIMEOUT}';")
+        conn.commit()
+        for name, month in list_partitions(cur):
+            if add_months(month, 1) > cutoff:
+                continue
+            # Serialise with other maintenance runs; a second worker skips this month
+            cur.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked;", (name,))
+            if not cur.fetchone()["locked"] or _relkind(cur, name) is None:
+                conn.rollback()
+                continue
+            directory = os.path.join(archive_dir, f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S}")
+            committed = False
+            try:
+                # No rows may land in the month between writing it out and dropping it
+                cur.execute(f"LOCK TABLE {name} IN SHARE MODE;")
+                rows = _write_partition(cur, name, directory)
+                cur.execute("""
+                    INSERT INTO chat_history_archive (path, partition_name, range_start, range_end, row_count, indexed)
+                    VALUES (%s, %s, %s, %s, %s, TRUE);
+                """, (directory, name, month, add_months(month, 1), rows))
+                cur.execute(f"""
+                    INSERT INTO chat_history_archive_chats (path, user_id, chat_id)
+                    SELECT DISTINCT %s, user_id, chat_id FROM {name} WHERE user_id IS NOT NULL;
+                """, (directory,))
+                cur.execute(f"ALTER TABLE chat_history DETACH PARTITION {name};")
+                cur.execute(f"DROP TABLE {name};")
+                conn.commit()
+                committed = True
+            except psycopg2.errors.LockNotAvailable:
+                logger.warning(f"⏳ {name} is busy, leaving it for the next maintenance run")
+                continue
+            finally:
+                if not committed:
+                    conn.rollback()
+                    # Nothing catalogs this copy: remove it so the next run does not leave a second one
+                    shutil.rmtree(directory, ignore_errors=True)
+                    shutil.rmtree(directory + ".tmp", ignore_errors=True)
+            archived.append(name)
+            logger.info(f"🧊 Archived {name}: {rows} rows → {directory}")
+        cur.close()
+    finally:
+        conn.close()
+    return archived
+
+
+def _index_archived_month(cur, path: str):
+    """Catalog the users and chat_ids of a month archived before chat_history_archive_chats existed."""
+    pairs = set()
+    for filename in os.listdir(path):
+        m = _USER_FILE_RE.match(filename)
+        if m:
+            pairs.update((path, int(m.group(1)), row["chat_id"]) for row in _iter_user_file(os.path.join(path, filename)))
+    if pairs:
+        cur.executemany("INSERT INTO chat_history_archive_chats (path, user_id, chat_id) VALUES (%s, %s, %s);", list(pairs))
+    cur.execute("UPDATE chat_history_archive SET indexed = TRUE WHERE path = %s;", (path,))
+
+
+def run_maintenance() -> List[str]:
+    """
+    Daily job (worker.maintain_chat_partitions): keep upcoming months ready, catalog months archived
+    by older releases, then archive old ones.
+    """
+    from app.db.utils import get_connection
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        ensure_partitions(cur, month_start(date.today()), settings.CHAT_PARTITION_MONTHS_AHEAD)
+        conn.commit()
+        cur.execute("SELECT path FROM chat_history_archive WHERE NOT indexed;")
+        for entry in cur.fetchall():
+            _index_archived_month(cur, entry["path"])
+            conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+    return archive_old_partitions()
+
+
+# ---------------- ARCHIVE READS ----------------
+def may_continue_archive(first_at: Optional[datetime]) -> bool:
+    """
+    Whether a conversation whose oldest live turn is at first_at (None: no live turns) can have
+    older turns in archived months, i.e. it was already going in the oldest month still in Postgres.
+    Lets the chat read skip the catalog for the (usual) conversations that started later.
+    """
+    if first_at is None:
+        return True
+    if settings.CHAT_ARCHIVE_AFTER_MONTHS <= 0:
+        return False
+    oldest_live = add_months(month_start(date.today()), -settings.CHAT_ARCHIVE_AFTER_MONTHS)
+    return first_at < datetime.combine(add_months(oldest_live, 1), datetime.min.time())
+
+
+def _iter_user_file(path: str) -> Iterator[Dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+            yield row
+
+
+@lru_cache(maxsize=256)
+def _read_user_file(path: str, mtime: float) -> Tuple[Dict, ...]:
+    # Archive files never change once written; mtime in the key covers a re-archived month
+    return tuple(_iter_user_file(path))
+
+
+# Archived months that hold the user's turns (or one chat of theirs) within the range
+ARCHIVE_LOOKUP_SQL = """
+    SELECT a.path FROM chat_history_archive a
+    WHERE (%(start)s::timestamp IS NULL OR a.range_end > %(start)s::timestamp)
+      AND (%(end)s::timestamp IS NULL OR a.range_start < %(end)s::timestamp)
+      AND (NOT a.indexed OR EXISTS (
+          SELECT 1 FROM chat_history_archive_chats c
+          WHERE c.path = a.path AND c.user_id = %(user_id)s
+            AND (%(chat_id)s::text IS NULL OR c.chat_id = %(chat_id)s::text)
+      ))
+    ORDER BY a.range_start;
+"""
+
+
+def lookup_params(user_id: int, chat_id: Optional[str] = None, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> Dict:
+    return {"user_id": user_id, "chat_id": chat_id, "start": start, "end": end}
+
+
+def read_archived(paths: List[str], user_id: int, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> List[Dict]:
+    """
+    The user's turns with start <= created_at < end from the archived months at `paths`
+    (as listed by ARCHIVE_LOOKUP_SQL), oldest first. Pure file I/O: async callers run it on a thread.
+    """
+    rows = []
+    for archive_path in paths:
+        path = _user_file(archive_path, user_id)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue  # the user had no turns that month
+        for row in _read_user_file(path, mtime):
+            if (start is None or row["created_at"] >= start) and (end is None or row["created_at"] < end):
+                rows.append(dict(row))
+    return rows
+
+
+def iter_archived(paths: List[str], user_id: int) -> Iterator[Dict]:
+    """
+    Like read_archived, but streamed one row at a time and not cached (exports of a whole history).
+    """
+    for archive_path in paths:
+        path = _user_file(archive_path, user_id)
+        if os.path.exists(path):
+            yield from _iter_user_file(path)
+
+
+def archived_rows(cur, user_id: int, chat_id: Optional[str] = None, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> List[Dict]:
+    """
+    A user's archived turns with start <= created_at < end (either bound optional), oldest first,
+    from the archived months that hold any of their turns, or only those holding chat_id if given.
+    """
+    cur.execute(ARCHIVE_LOOKUP_SQL, lookup_params(user_id, chat_id, start, end))
+    paths = [entry["path"] for entry in cur.fetchall()]
+    return read_archived(paths, user_id, start, end) if paths else []
@@ -1,5 +1,6 @@
 # backend/app/db/neo4j_utils.py
 import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from neo4j import GraphDatabase
 from app.config import settings
 
@@ -23,12 +24,13 @@ def get_driver():
 # ======================================================
 # 🔹 FACT STORAGE
 # ======================================================
+# Facts are keyed by (owner, key): a user's facts have owner = their id, general facts owner = ''
 def save_fact_neo4j(key: str, value: str):
     """
     Save or update a general fact (not tied to user).
     """
     query = """
-    MERGE (f:Fact {key: $key})
+    MERGE (f:Fact {owner: '', key: $key})
     SET f.value = $value,
         f.updated_at = timestamp()
     RETURN f
@@ -47,7 +49,7 @@ def get_fact_neo4j(key: str):
     """
     Retrieve a fact by key.
     """
-    query = "MATCH (f:Fact {key: $key}) RETURN f.value AS value"
+    query = "MATCH (f:Fact {owner: '', key: $key}) RETURN f.value AS value"
     try:
         driver = get_driver()
         with driver.session() as session:
@@ -72,7 +74,7 @@ def save_user_fact_neo4j(user_id: str, key: str, value: str):
     """
     query = """
     MERGE (u:User {id: $user_id})
-    MERGE (f:Fact {key: $key})
+    MERGE (f:Fact {owner: $user_id, key: $key})
     SET f.value = $value,
         f.updated_at = timestamp()
     MERGE (u)-[:OWNS]->(f)
@@ -110,19 +112,33 @@ def get_user_fact_neo4j(user_id: str, key: str):
         return None
 
 
+# Saved facts first, then what extraction learned about the user (a saved fact wins on the same key)
+ALL_FACTS_QUERY = """
+MATCH (u:User {id: $user_id})-[:OWNS]->(f:Fact)
+RETURN f.key AS key, f.value AS value
+UNION ALL
+MATCH (u:User {id: $user_id})-[r:RELATES]->(e:Entity)
+WITH r.type AS key, collect(e.name) AS names
+RETURN key, reduce(s = head(names), n IN tail(names) | s + ', ' + n) AS value
+"""
+
+
+def facts_dict(records) -> Dict[str, Any]:
+    facts = {}
+    for r in records:
+        facts.setdefault(r["key"], r["value"])
+    return facts
+
+
 def get_all_facts_for_user(user_id: str):
     """
     Retrieve all facts linked to a user.
     """
-    query = """
-    MATCH (u:User {id: $user_id})-[:OWNS]->(f:Fact)
-    RETURN f.key AS key, f.value AS value
-    """
     try:
         driver = get_driver()
         with driver.session() as session:
-            results = session.run(query, user_id=user_id)
-            facts = {r["key"]: r["value"] for r in results}
+            results = session.run(ALL_FACTS_QUERY, user_id=user_id)
+            facts = facts_dict(results)
         driver.close()
         return facts
     except Exception as e:
@@ -130,28 +146,211 @@ def get_all_facts_for_user(user_id: str):
         return {}
 
 
+# ======================================================
+# 🔹 BULK FACTS
+# ======================================================
+# Same writes as save_fact_neo4j / save_user_fact_neo4j, for a whole list of rows at once
+BULK_FACTS_QUERY = """
+UNWIND $rows AS row
+MERGE (f:Fact {owner: coalesce(row.user_id, ''), key: row.key})
+SET f.value = row.value,
+    f.updated_at = timestamp()
+FOREACH (_ IN CASE WHEN row.user_id IS NULL THEN [] ELSE [1] END |
+    MERGE (u:User {id: row.user_id})
+    MERGE (u)-[:OWNS]->(f)
+)
+RETURN row.index AS row_index
+"""
+
+
+def prepare_fact_rows(facts: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Validate [{"key", "value", "user_id"?}, ...] (no user_id = general fact).
+    Returns (rows to write, per-row results in input order); invalid rows are already marked.
+    """
+    rows, results = [], []
+    for index, fact in enumerate(facts):
+        key = fact.get("key") if isinstance(fact, dict) else None
+        value = fact.get("value") if isinstance(fact, dict) else None
+        user_id = fact.get("user_id") if isinstance(fact, dict) else None
+        result = {"index": index, "user_id": user_id, "key": key, "status": "pending", "error": None}
+        results.append(result)
+        if not isinstance(key, str) or not key or value is None:
+            result.update(status="invalid", error="needs a non-empty 'key' and a 'value'")
+            continue
+        if not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        rows.append({"index": index, "user_id": user_id, "key": key, "value": value})
+    return rows, results
+
+
+def chunked(rows: List[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    for start in range(0, len(rows), max(size, 1)):
+        yield rows[start:start + size]
+
+
+def _write_fact_chunk(tx, rows: List[Dict[str, Any]]) -> List[int]:
+    return [r["row_index"] for r in tx.run(BULK_FACTS_QUERY, rows=rows)]
+
+
+def save_facts_bulk(facts: Iterable[Dict[str, Any]], chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Save many facts, for one or several users, with one UNWIND ... MERGE transaction per
+    chunk of chunk_size rows (NEO4J_BULK_CHUNK_ROWS by default) on a single session.
+    A failed chunk does not stop the others (chunks already written stay written).
+    Returns one {"index", "user_id", "key", "status": "saved"|"invalid"|"failed", "error"} per input row.
+    """
+    rows, results = prepare_fact_rows(facts)
+    if not rows:
+        return results
+    size = chunk_size or settings.NEO4J_BULK_CHUNK_ROWS
+    driver = get_driver()
+    try:
+        with driver.session() as session:
+            for chunk in chunked(rows, size):
+                try:
+                    written = set(session.execute_write(_write_fact_chunk, chunk))
+                    for r in chunk:
+                        results[r["index"]]["status"] = "saved" if r["index"] in written else "failed"
+                except Exception as e:
+                    logger.error(f"❌ Failed to save {len(chunk)} facts in Neo4j: {e}")
+                    for r in chunk:
+                        results[r["index"]].update(status="failed", error=str(e))
+    finally:
+        driver.close()
+    saved = sum(1 for r in results if r["status"] == "saved")
+    logger.info(f"✅ Saved {saved}/{len(results)} facts in {-(-len(rows) // size)} batch(es)")
+    return results
+
+
+# ======================================================
+# 🔹 EXTRACTED KNOWLEDGE (see app/services/knowledge_graph.py)
+# ======================================================
+# Entities are private to their owner: (:Entity {owner, key}) with key = casefolded name
+_KNOWLEDGE_QUERIES = (
+    ("entities", """
+    MERGE (u:User {id: $user_id})
+    WITH u
+    UNWIND $entities AS ent
+    MERGE (e:Entity {owner: $user_id, key: ent.key})
+    ON CREATE SET e.created_at = timestamp()
+    SET e.name = ent.name,
+        e.type = coalesce(ent.type, e.type),
+        e.updated_at = timestamp()
+    MERGE (u)-[:MENTIONED]->(e)
+    """),
+    ("user_relationships", """
+    MATCH (u:User {id: $user_id})
+    UNWIND $user_relationships AS rel
+    MERGE (t:Entity {owner: $user_id, key: rel.target_key})
+    ON CREATE SET t.name = rel.target, t.created_at = timestamp()
+    MERGE (u)-[r:RELATES {type: rel.relation}]->(t)
+    SET r.updated_at = timestamp()
+    """),
+    ("relationships", """
+    UNWIND $relationships AS rel
+    MERGE (s:Entity {owner: $user_id, key: rel.source_key})
+    ON CREATE SET s.name = rel.source, s.created_at = timestamp()
+    MERGE (t:Entity {owner: $user_id, key: rel.target_key})
+    ON CREATE SET t.name = rel.target, t.created_at = timestamp()
+    MERGE (s)-[r:RELATES {type: rel.relation}]->(t)
+    SET r.updated_at = timestamp()
+    """),
+)
+
+
+def _write_knowledge(tx, user_id, rows: Dict[str, List[Dict[str, Any]]]):
+    for param, query in _KNOWLEDGE_QUERIES:
+        if rows[param] or param == "entities":  # the first query also creates the User node
+            tx.run(query, user_id=user_id, **{param: rows[param]}).consume()
+
+
+def save_knowledge(user_id, entities: List[Dict[str, Any]], user_relationships: List[Dict[str, Any]],
+                   relationships: List[Dict[str, Any]]):
+    """
+    Write one extraction batch for a user in a single transaction (raises on failure).
+    entities: [{"key", "name", "type"}]; user_relationships: [{"relation", "target", "target_key"}];
+    relationships: [{"source", "source_key", "relation", "target", "target_key"}].
+    """
+    rows = {"entities": entities, "user_relationships": user_relationships, "relationships": relationships}
+    driver = get_driver()
+    try:
+        with driver.session() as session:
+            session.execute_write(_write_knowledge, user_id, rows)
+    finally:
+        driver.close()
+    logger.info(f"✅ Saved knowledge for user {user_id}: {len(entities)} entities, "
+                f"{len(user_relationships) + len(relationships)} relationships")
+
+
 # ======================================================
 # 🔹 INITIALIZATION UTILITIES
 # ======================================================
+# One-off, idempotent: split each pre-owner Fact into one copy per owning user (general if unowned)
+MIGRATE_FACT_OWNERS_QUERY = """
+MATCH (f:Fact) WHERE f.owner IS NULL
+OPTIONAL MATCH (u:User)-[:OWNS]->(f)
+WITH f, collect(u) AS owners
+FOREACH (u IN owners |
+    MERGE (c:Fact {owner: u.id, key: f.key})
+    ON CREATE SET c.value = f.value, c.updated_at = f.updated_at
+    MERGE (u)-[:OWNS]->(c)
+)
+FOREACH (_ IN CASE WHEN size(owners) = 0 THEN [1] ELSE [] END | SET f.owner = '')
+WITH f, owners WHERE size(owners) > 0
+DETACH DELETE f
+"""
+# One-time data migrations are recorded as (:SchemaMigration {id}) so startup skips them afterwards
+MIGRATION_DONE_QUERY = "MATCH (m:SchemaMigration {id: $id}) RETURN count(m) > 0 AS done"
+MIGRATION_RECORD_QUERY = "MERGE (m:SchemaMigration {id: $id}) SET m.applied_at = timestamp()"
+
+
+def _migrate_once(session, migration_id: str, query: str):
+    if session.run(MIGRATION_DONE_QUERY, id=migration_id).single()["done"]:
+        return
+    session.run(query).consume()
+    session.run(MIGRATION_RECORD_QUERY, id=migration_id).consume()
+    logger.info(f"✅ Neo4j migration applied: {migration_id}")
+
+
 def ensure_constraints():
     """
     Ensures Neo4j constraints for clean schema setup.
     """
-    queries = [
-        "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
-        "CREATE CONSTRAINT fact_key_unique IF NOT EXISTS FOR (f:Fact) REQUIRE f.key IS UNIQUE"
-    ]
     try:
         driver = get_driver()
         with driver.session() as session:
-            for q in queries:
-                session.run(q)
+            session.run("CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE")
+            # Fact.key used to be globally unique, which made every user share one node per key
+            session.run("DROP CONSTRAINT fact_key_unique IF EXISTS")
+            _migrate_once(session, "fact_owners", MIGRATE_FACT_OWNERS_QUERY)
+            session.run("CREATE CONSTRAINT fact_owner_key_unique IF NOT EXISTS FOR (f:Fact) REQUIRE (f.owner, f.key) IS UNIQUE")
+            session.run("CREATE INDEX entity_owner_key IF NOT EXISTS FOR (e:Entity) ON (e.owner, e.key)")
         driver.close()
-        logger.info("✅ Neo4j constraints ensured (User.id, Fact.key)")
+        logger.info("✅ Neo4j constraints ensured (User.id, Fact.owner + Fact.key)")
     except Exception as e:
         logger.error(f"❌ Failed to ensure Neo4j constraints: {e}")
 
 
+def verify_connectivity():
+    """
+    Raise if Neo4j is unreachable (used by the startup readiness checks).
+    """
+    driver = get_driver()
+    try:
+        driver.verify_connectivity()
+    finally:
+        driver.close()
+
+
+def setup():
+    """
+    Startup warm-up: check connectivity, then bring constraints and the fact layout up to date.
+    """
+    verify_connectivity()
+    ensure_constraints()
+
+
 # ======================================================
 # 🔹 BACKWARD COMPATIBILITY ALIAS
 # ======================================================
@@ -2,14 +2,12 @@
 import logging
 import uuid
 from typing import List, Dict
-from app.db.pinecone_utils import upsert_vectors, query_vectors, init_pinecone
+from app.db.pinecone_utils import upsert_vectors, query_vectors, init_pinecone, user_namespace
+from app.config_pinecone import pinecone_settings
 import traceback
 
 logger = logging.getLogger(__name__)
 
-# Ensure Pinecone client is initialized
-init_pinecone()
-
 
 def store_message_in_pinecone(user_id: str, message_text: str, embedding: List[float]) -> bool:
     """
@@ -23,7 +21,8 @@ def store_message_in_pinecone(user_id: str, message_text: str, embedding: List[f
             "metadata": {"user_id": user_id, "text": message_text},
         }
 
-        success = upsert_vectors([item])
+        namespace = user_namespace(user_id) if pinecone_settings.PINECONE_USER_NAMESPACES else None
+        success = upsert_vectors([item], namespace=namespace)
         if not success:
             logger.error("Failed to upsert message into Pinecone")
             return False
@@ -43,12 +42,16 @@ def retrieve_context(user_id: str, embedding: List[float], top_k: int = 5) -> Li
     try:
         init_pinecone()  # Ensure Pinecone is initialized
 
-        filter_metadata = {"user_id": user_id}
+        if pinecone_settings.PINECONE_USER_NAMESPACES:
+            namespace, filter_metadata = user_namespace(user_id), None
+        else:
+            namespace, filter_metadata = None, {"user_id": user_id}
         result = query_vectors(
             vector=embedding,
             top_k=top_k,
             filter=filter_metadata,
             include_metadata=True,
+            namespace=namespace,
         )
 
         if not result or "matches" not in result:
@@ -1,15 +1,17 @@
 # backend/app/db/pinecone_utils.py
 import logging
 import traceback
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from pinecone import Pinecone, ServerlessSpec
 from app.config_pinecone import pinecone_settings
 
 logger = logging.getLogger(__name__)
 
 _pc: Optional[Pinecone] = None
+_index = None
 _index_name: str = pinecone_settings.PINECONE_INDEX_NAME
 _region = "us-east-1"  # compatible free-tier region
+_FETCH_BATCH = 100  # ids per fetch request (they travel in the URL)
 
 
 def init_pinecone() -> Pinecone:
@@ -47,15 +49,29 @@ def init_pinecone() -> Pinecone:
 
 def get_index():
     """
-    Return a live handle to the Pinecone index.
+    Return a live handle to the Pinecone index (created once, then reused).
     """
-    global _pc
-    if not _pc:
-        init_pinecone()
-    return _pc.Index(_index_name)
+    global _index
+    if _index is None:
+        if not _pc:
+            init_pinecone()
+        _index = _pc.Index(_index_name)
+    return _index
+
+
+def user_namespace(user_id: str) -> str:
+    """
+    Namespace holding one user's vectors, so their queries never scan anyone else's.
+    """
+    return f"user-{user_id}"
 
 
-def upsert_vectors(items: List[Dict[str, Any]]) -> bool:
+def _ns(namespace: Optional[str]) -> Dict[str, str]:
+    # None means the index's default namespace
+    return {"namespace": namespace} if namespace else {}
+
+
+def upsert_vectors(items: List[Dict[str, Any]], namespace: Optional[str] = None) -> bool:
     """
     Upsert a batch of embeddings.
     Each item: {'id': str, 'values': [...], 'metadata': {...}}
@@ -63,7 +79,7 @@ def upsert_vectors(items: List[Dict[str, Any]]) -> bool:
     try:
         idx = get_index()
         vectors = [(i["id"], i["values"], i.get("metadata", {})) for i in items]
-        idx.upsert(vectors=vectors)
+        idx.upsert(vectors=vectors, **_ns(namespace))
         return True
     except Exception as e:
         logger.error("Upsert failed: %s\n%s", e, traceback.format_exc())
@@ -75,6 +91,8 @@ def query_vectors(
     top_k: int = 5,
     filter: Optional[Dict] = None,
     include_metadata: bool = True,
+    namespace: Optional[str] = None,
+    include_values: bool = False,
 ):
     """
     Query Pinecone for similar vectors.
@@ -86,8 +104,95 @@ def query_vectors(
             top_k=top_k,
             filter=filter,
             include_metadata=include_metadata,
+            include_values=include_values,
+            **_ns(namespace),
         )
         return res
     except Exception as e:
         logger.error("Query failed: %s\n%s", e, traceback.format_exc())
         return None
+
+
+def fetch_vectors(
+    ids: List[str], namespace: Optional[str] = None, include_values: bool = False
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch vectors by id. Returns {id: {'id':..., 'metadata': {...}}} for the ids that exist
+    ('values' too with include_values=True).
+    """
+    if not ids:
+        return {}
+    try:
+        idx = get_index()
+        found = {}
+        for start in range(0, len(ids), _FETCH_BATCH):
+            res = idx.fetch(ids=ids[start:start + _FETCH_BATCH], **_ns(namespace))
+            raw = getattr(res, "vectors", None)
+            if raw is None:
+                raw = res.get("vectors", {})
+            for vid, v in raw.items():
+                if isinstance(v, dict):
+                    meta, values = v.get("metadata"), v.get("values")
+                else:
+                    meta, values = getattr(v, "metadata", None), getattr(v, "values", None)
+                found[vid] = {"id": vid, "metadata": dict(meta or {})}
+                if include_values:
+                    found[vid]["values"] = list(values or [])
+        return found
+    except Exception as e:
+        logger.error("Fetch failed: %s\n%s", e, traceback.format_exc())
+        return {}
+
+
+def update_metadata(vector_id: str, metadata: Dict[str, Any], namespace: Optional[str] = None) -> bool:
+    """
+    Set metadata fields on an existing vector without touching its values.
+    """
+    try:
+        idx = get_index()
+        idx.update(id=vector_id, set_metadata=metadata, **_ns(namespace))
+        return True
+    except Exception as e:
+        logger.error("Metadata update failed: %s\n%s", e, traceback.format_exc())
+        return False
+
+
+def delete_vectors(ids: List[str], namespace: Optional[str] = None) -> bool:
+    """
+    Delete vectors by id.
+    """
+    try:
+        idx = get_index()
+        for start in range(0, len(ids), _FETCH_BATCH):
+            idx.delete(ids=ids[start:start + _FETCH_BATCH], **_ns(namespace))
+        return True
+    except Exception as e:
+        logger.error("Delete failed: %s\n%s", e, traceback.format_exc())
+        return False
+
+
+def list_ids(namespace: Optional[str] = None, prefix: Optional[str] = None) -> Iterator[List[str]]:
+    """
+    Yield pages of vector ids in a namespace (serverless indexes only).
+    """
+    idx = get_index()
+    kwargs = _ns(namespace)
+    if prefix:
+        kwargs["prefix"] = prefix
+    for page in idx.list(**kwargs):
+        yield list(page)
+
+
+def list_namespaces() -> Dict[str, int]:
+    """
+    {namespace: vector_count} from the index stats ('' is the default namespace).
+    """
+    stats = get_index().describe_index_stats()
+    namespaces = getattr(stats, "namespaces", None)
+    if namespaces is None:
+        namespaces = stats.get("namespaces", {})
+    out = {}
+    for name, ns in namespaces.items():
+        count = getattr(ns, "vector_count", None)
+        out[name] = count if count is not None else ns.get("vector_count", 0)
+    return out
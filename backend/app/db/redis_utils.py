@@ -1,10 +1,23 @@
 # redis_utils.py
 from app.config import settings
+from app.metrics import record_cache
 import redis, json
 
 # Use Redis DB for chat history explicitly
 client = redis.Redis.from_url(settings.REDIS_URL_CHAT, decode_responses=True)
 
+# Shared cross-worker coordination state (provider health, rate limits).
+# Short timeouts: callers fall back to process-local state rather than wait on Redis.
+state_client = redis.Redis.from_url(
+    settings.REDIS_URL,
+    decode_responses=True,
+    socket_timeout=0.25,
+    socket_connect_timeout=0.25,
+)
+
+def ping():
+    client.ping()
+
 def _user_key(user_id: int) -> str:
     return f"{settings.REDIS_CHAT_HISTORY_KEY}:{user_id}"
 
@@ -21,4 +34,5 @@ def get_last_chats(user_id: int, limit: int = 10):
     """
     key = _user_key(user_id)
     chats = client.lrange(key, 0, limit-1)
+    record_cache("redis_chat_history", bool(chats))
     return [json.loads(c) for c in chats]
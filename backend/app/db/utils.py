@@ -1,8 +1,11 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor  # ✅ Added to get dicts instead of tuples
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor, execute_values  # ✅ Added to get dicts instead of tuples
 from app.config import settings
+from app.db import chat_archive
 from passlib.context import CryptContext
-from typing import Optional, Dict
+from datetime import datetime
+from typing import Optional, Dict, Iterable, Iterator, List, Tuple
 
 
 # ---------------- DATABASE CONNECTION ----------------
@@ -21,6 +24,8 @@ def get_connection():
 def create_tables():
     conn = get_connection()
     cur = conn.cursor()
+    # Every worker runs this at startup; let one of them do the migrations at a time
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('create_tables'));")
 
     # Users table for authentication
     cur.execute("""
@@ -46,21 +51,49 @@ def create_tables():
         );
     """)
 
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-            chat_id TEXT,
-            user_query TEXT NOT NULL,
-            ai_response TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
+    # chat_history is partitioned by month (converted in place on older databases)
+    chat_archive.setup(cur)
 
     # Lightweight migrations for existing databases
     cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES users(id) ON DELETE CASCADE;")
-    cur.execute("ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES users(id) ON DELETE CASCADE;")
-    cur.execute("ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS chat_id TEXT;")
+
+    # Indexes on the partitioned parent are created on every partition, present and future
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_search_tsv ON chat_history USING GIN (search_tsv);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_user_created ON chat_history (user_id, created_at);")
+
+    # Tasks pushed by integrations are upserted by their own id (NULLs never conflict)
+    cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS external_id TEXT;")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_user_external_id ON tasks (user_id, external_id);")
+    # The reminder worker scans for due, un-notified tasks every minute
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_notified_datetime ON tasks (notified, datetime);")
+
+    # Change tracking for delta sync: every insert/update (soft deletes included) takes the next change_seq
+    cur.execute("CREATE SEQUENCE IF NOT EXISTS tasks_change_seq;")
+    cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;")
+    cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;")
+    cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS change_seq BIGINT DEFAULT nextval('tasks_change_seq');")
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION tasks_touch() RETURNS trigger AS $$
+        BEGIN
+            -- One writer per user at a time, so a user's change_seq order is also commit order
+            -- and a delta cursor can never skip a change that commits late
+            PERFORM pg_advisory_xact_lock(hashtext('tasks_change_seq'), COALESCE(NEW.user_id, 0));
+            NEW.updated_at := CURRENT_TIMESTAMP;
+            NEW.change_seq := nextval('tasks_change_seq');
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    cur.execute("CREATE OR REPLACE TRIGGER trg_tasks_touch BEFORE INSERT OR UPDATE ON tasks "
+                "FOR EACH ROW EXECUTE FUNCTION tasks_touch();")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_change_seq ON tasks (user_id, change_seq);")
+    # Highest change_seq of each user's purged tombstones: a delta cursor below it has missed deletions
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS task_tombstone_horizon (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            change_seq BIGINT NOT NULL
+        );
+    """)
 
     conn.commit()
     cur.close()
@@ -69,15 +102,17 @@ def create_tables():
 
 
 # ---------------- TASK FUNCTIONS ----------------
-def save_task(task_data: dict):
-    conn = get_connection()
-    cur = conn.cursor()
+# SQL and row shaping below are shared with app.db.async_utils, so both layers stay identical
+SAVE_TASK_SQL = """
+    INSERT INTO tasks (user_id, title, datetime, priority, category, notes, notified)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    RETURNING id;
+"""
 
+
+def save_task_params(task_data: dict) -> tuple:
     # ✅ Fixed VALUES to match all 6 columns (notified added)
-    cur.execute("""
-        INSERT INTO tasks (user_id, title, datetime, priority, category, notes, notified)
-        VALUES (%s, %s, %s, %s, %s, %s, %s);
-    """, (
+    return (
         task_data.get("user_id"),
         task_data.get("title"),
         task_data.get("datetime"),
@@ -85,31 +120,209 @@ def save_task(task_data: dict):
         task_data.get("category"),
         task_data.get("notes", ""),
         False
-    ))
+    )
+
+
+def save_task(task_data: dict):
+    conn = get_connection()
+    cur = conn.cursor()
+
+    cur.execute(SAVE_TASK_SQL, save_task_params(task_data))
+    task_id = cur.fetchone()["id"]
 
     conn.commit()
     cur.close()
     conn.close()
     print(f"✅ Task saved: {task_data.get('title')}")
+    return task_id
+
+
+# RETURNING order is not guaranteed, so each row carries its ordinal and results are joined back
+# to it: by external_id, or for tasks without one by an id drawn from the sequence up front.
+UPSERT_TASKS_SQL = """
+    WITH input AS (
+        SELECT v.*, CASE WHEN v.external_id IS NULL THEN nextval(pg_get_serial_sequence('tasks', 'id')) END AS new_id
+        FROM (VALUES %s) AS v(ord, user_id, external_id, title, datetime, priority, category, notes)
+    ), saved AS (
+        INSERT INTO tasks (id, user_id, external_id, title, datetime, priority, category, notes, notified)
+        SELECT COALESCE(new_id, nextval(pg_get_serial_sequence('tasks', 'id'))),
+               user_id, external_id, title, datetime, priority, category, notes, FALSE
+        FROM input
+        ON CONFLICT (user_id, external_id) DO UPDATE SET
+        title = EXCLUDED.title,
+        datetime = EXCLUDED.datetime,
+        priority = EXCLUDED.priority,
+        category = EXCLUDED.category,
+        notes = EXCLUDED.notes,
+        deleted_at = NULL,
+        notified = CASE WHEN tasks.datetime IS DISTINCT FROM EXCLUDED.datetime
+                        THEN FALSE ELSE tasks.notified END
+        RETURNING id, external_id, (xmax = 0) AS created
+    )
+    SELECT s.id, s.external_id, s.created
+    FROM saved s
+    JOIN input i ON s.id = i.new_id OR s.external_id = i.external_id
+    ORDER BY i.ord;
+"""
+UPSERT_TASK_TEMPLATE = "(%s, %s::int, %s::text, %s::text, %s::timestamp, %s::text, %s::text, %s::text)"
+UPSERT_TASKS_PAGE = 1000  # rows per statement: 8 params each stays well under PostgreSQL's 65535
+
+
+def task_upsert_rows(user_id: int, tasks: List[Dict]) -> List[tuple]:
+    """
+    One UPSERT_TASK_TEMPLATE row per task, prefixed with its ordinal;
+    a repeated external_id keeps its last version (at its first position).
+    """
+    rows, positions = [], {}
+    for t in tasks:
+        ext = t.get("external_id")
+        row = (user_id, ext, t["title"], t.get("datetime"), t.get("priority"), t.get("category"), t.get("notes") or "")
+        if ext is not None and ext in positions:
+            rows[positions[ext]] = row
+            continue
+        if ext is not None:
+            positions[ext] = len(rows)
+        rows.append(row)
+    return [(i,) + row for i, row in enumerate(rows)]
+
+
+def save_tasks_bulk(user_id: int, tasks: List[Dict]) -> List[Dict]:
+    """
+    Insert or update many tasks with multi-row statements in one transaction.
+    Tasks with an external_id replace the user's existing task with that id; the rest are inserted.
+    When an upsert moves a task's datetime its reminder is re-armed (notified = FALSE).
+    Returns [{"id", "external_id", "created"}] in input order; a repeated external_id keeps its last version.
+    """
+    if not tasks:
+        return []
+    rows = task_upsert_rows(user_id, tasks)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        result = execute_values(cur, UPSERT_TASKS_SQL, rows, template=UPSERT_TASK_TEMPLATE,
+                                page_size=UPSERT_TASKS_PAGE, fetch=True)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    print(f"✅ {len(result)} task(s) saved in one batch for user {user_id}")
+    return [dict(r) for r in result]  # pages run in order and each is sorted by ordinal
+
+
+TASK_COLUMNS = "id, external_id, title, datetime, priority, category, notes, notified, updated_at, change_seq"
+GET_TASKS_SQL = f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = %s AND deleted_at IS NULL ORDER BY datetime;"
+# Never below the purge horizon, so a cursor taken from the full list is always accepted
+TASK_VERSION_SQL = """
+    SELECT GREATEST(COALESCE(MAX(change_seq), 0),
+                    (SELECT COALESCE(MAX(change_seq), 0) FROM task_tombstone_horizon WHERE user_id = %(user_id)s)) AS version
+    FROM tasks WHERE user_id = %(user_id)s;
+"""
+TASK_CHANGES_SQL = f"""
+    SELECT {TASK_COLUMNS}, deleted_at FROM tasks
+    WHERE user_id = %s AND change_seq > %s
+    ORDER BY change_seq
+    LIMIT %s;
+"""
+TASK_HORIZON_SQL = "SELECT change_seq FROM task_tombstone_horizon WHERE user_id = %s;"
+PURGE_TOMBSTONES_SQL = """
+    WITH purged AS (
+        DELETE FROM tasks WHERE deleted_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+        RETURNING user_id, change_seq
+    ), horizon AS (
+        INSERT INTO task_tombstone_horizon (user_id, change_seq)
+        SELECT user_id, MAX(change_seq) FROM purged WHERE user_id IS NOT NULL GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE
+            SET change_seq = GREATEST(task_tombstone_horizon.change_seq, EXCLUDED.change_seq)
+    )
+    SELECT COUNT(*) AS purged FROM purged;
+"""
+DELETE_TASK_SQL = "UPDATE tasks SET deleted_at = CURRENT_TIMESTAMP WHERE id = %s AND user_id = %s AND deleted_at IS NULL;"
 
 
 def get_tasks(user_id: int):
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM tasks WHERE user_id = %s ORDER BY datetime;", (user_id,))
+    cur.execute(GET_TASKS_SQL, (user_id,))
     rows = cur.fetchall()
     cur.close()
     conn.close()
     return rows
 
 
+def get_task_version(user_id: int) -> int:
+    """
+    Highest change_seq among the user's tasks, tombstones included: it moves on every
+    insert, update and delete, so it identifies the current state of the task list.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(TASK_VERSION_SQL, {"user_id": user_id})
+    version = cur.fetchone()["version"]
+    cur.close()
+    conn.close()
+    return version
+
+
+class TaskCursorExpired(LookupError):
+    """The delta cursor predates purged tombstones: the client has to fetch the full list again."""
+
+
+def task_changes_page(rows: List[Dict], since: int, horizon: Optional[Dict], limit: int):
+    """(rows, cursor, has_more) from TASK_CHANGES_SQL run with limit + 1; shared with async_utils."""
+    if horizon and since < horizon["change_seq"]:
+        raise TaskCursorExpired(f"cursor {since} is older than purged deletions ({horizon['change_seq']})")
+    rows, has_more = rows[:limit], len(rows) > limit
+    return rows, (rows[-1]["change_seq"] if rows else since), has_more
+
+
+def get_task_changes(user_id: int, since: int, limit: int = 1000):
+    """
+    Tasks changed after change_seq `since`, oldest change first (deleted ones have deleted_at set).
+    Returns (rows, cursor, has_more); pass the cursor back as `since` to continue.
+    Raises TaskCursorExpired when tombstones newer than `since` have been purged.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(TASK_HORIZON_SQL, (user_id,))
+    horizon = cur.fetchone()
+    cur.execute(TASK_CHANGES_SQL, (user_id, since, limit + 1))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return task_changes_page(rows, since, horizon, limit)
+
+
+def purge_task_tombstones() -> int:
+    """
+    Delete tombstones older than TASK_TOMBSTONE_DAYS, moving each user's horizon past them.
+    Returns the number of tasks removed.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(PURGE_TOMBSTONES_SQL, (settings.TASK_TOMBSTONE_DAYS,))
+        purged = cur.fetchone()["purged"]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    return purged
+
+
 def delete_task(user_id: int, task_id: int):
-    """Delete a task for a specific user"""
+    """Delete a task for a specific user (kept as a tombstone so delta sync can report it)"""
     conn = get_connection()
     cur = conn.cursor()
     
     # Delete task only if it belongs to the user
-    cur.execute("DELETE FROM tasks WHERE id = %s AND user_id = %s;", (task_id, user_id))
+    cur.execute(DELETE_TASK_SQL, (task_id, user_id))
     deleted_count = cur.rowcount
     
     conn.commit()
@@ -125,16 +338,62 @@ def delete_task(user_id: int, task_id: int):
 
 
 # ---------------- CHAT FUNCTIONS ----------------
+SAVE_CHAT_SQL = """
+    INSERT INTO chat_history (user_id, chat_id, user_query, ai_response)
+    VALUES (%s, %s, %s, %s);
+"""
+CHAT_HISTORY_SQL = "SELECT chat_id, user_query, ai_response FROM chat_history WHERE user_id = %s ORDER BY created_at DESC LIMIT %s;"
+# Conversations with a chat_id, plus single turns without one (for backward compatibility)
+CONVERSATIONS_SQL = """
+    SELECT chat_id,
+           MIN(created_at) AS first_at,
+           MAX(created_at) AS last_at,
+           (SELECT ch2.user_query FROM chat_history ch2 WHERE ch2.user_id = %s AND ch2.chat_id = ch.chat_id ORDER BY ch2.created_at ASC LIMIT 1) AS first_msg
+    FROM chat_history ch
+    WHERE user_id = %s AND chat_id IS NOT NULL
+    GROUP BY chat_id
+    ORDER BY last_at DESC
+    LIMIT %s;
+"""
+LOOSE_TURNS_SQL = """
+    SELECT id as chat_id,
+           created_at AS first_at,
+           created_at AS last_at,
+           user_query AS first_msg
+    FROM chat_history
+    WHERE user_id = %s AND chat_id IS NULL
+    ORDER BY created_at DESC
+    LIMIT %s;
+"""
+CHAT_MESSAGES_SQL = """
+    SELECT user_query, ai_response, created_at
+    FROM chat_history
+    WHERE user_id = %s AND chat_id = %s
+    ORDER BY created_at ASC
+    LIMIT %s;
+"""
+TURN_BY_ID_SQL = """
+    SELECT user_query, ai_response
+    FROM chat_history
+    WHERE user_id = %s AND id = %s
+    ORDER BY created_at ASC
+    LIMIT %s;
+"""
+
+
 def save_chat(user_id: int, user_query: str, ai_response: str, chat_id: Optional[str] = None):
     conn = get_connection()
     cur = conn.cursor()
 
     print(f"💾 Saving chat - user_id: {user_id}, chat_id: {chat_id}, query: {user_query[:40]}...")
 
-    cur.execute("""
-        INSERT INTO chat_history (user_id, chat_id, user_query, ai_response)
-        VALUES (%s, %s, %s, %s);
-    """, (user_id, chat_id, user_query, ai_response))
+    try:
+        cur.execute(SAVE_CHAT_SQL, (user_id, chat_id, user_query, ai_response))
+    except psycopg2.errors.CheckViolation:
+        # No partition for this month yet: create it and retry once
+        conn.rollback()
+        chat_archive.ensure_upcoming_partitions()
+        cur.execute(SAVE_CHAT_SQL, (user_id, chat_id, user_query, ai_response))
 
     conn.commit()
     cur.close()
@@ -142,6 +401,12 @@ def save_chat(user_id: int, user_query: str, ai_response: str, chat_id: Optional
     print(f"💬 Chat saved: {user_query[:40]}...")
 
 
+def top_up_history(rows: List[Dict], archived: List[Dict], limit: int) -> List[Dict]:
+    """Append the newest archived turns (oldest first in `archived`) to a short newest-first history."""
+    older = archived[-(limit - len(rows)):] if len(rows) < limit else []
+    return rows + [{k: r[k] for k in ("chat_id", "user_query", "ai_response")} for r in reversed(older)]
+
+
 # ✅ Corrected to return dicts compatible with main.py
 def get_chat_history(user_id: int, limit: int = 10):
     """
@@ -151,15 +416,17 @@ def get_chat_history(user_id: int, limit: int = 10):
     conn = get_connection()
     try:
         cur = conn.cursor()
-        cur.execute(
-            "SELECT chat_id, user_query, ai_response FROM chat_history WHERE user_id = %s ORDER BY created_at DESC LIMIT %s;",
-            (user_id, limit)
-        )
+        cur.execute(CHAT_HISTORY_SQL, (user_id, limit))
         rows = cur.fetchall()
+        if len(rows) < limit:
+            # Short on recent turns: the rest may be in archived months
+            rows = top_up_history(rows, chat_archive.archived_rows(cur, user_id), limit)
         return rows
     finally:
         cur.close()
         conn.close()
+
+
 def get_conversations(user_id: int, limit: int = 50):
     """
     Returns latest conversations grouped by chat_id with a title inferred from first user message.
@@ -168,42 +435,20 @@ def get_conversations(user_id: int, limit: int = 50):
     conn = get_connection()
     cur = conn.cursor()
     
-    # First, get conversations with chat_id
-    cur.execute(
-        """
-        SELECT chat_id,
-               MIN(created_at) AS first_at,
-               MAX(created_at) AS last_at,
-               (SELECT ch2.user_query FROM chat_history ch2 WHERE ch2.user_id = %s AND ch2.chat_id = ch.chat_id ORDER BY ch2.created_at ASC LIMIT 1) AS first_msg
-        FROM chat_history ch
-        WHERE user_id = %s AND chat_id IS NOT NULL
-        GROUP BY chat_id
-        ORDER BY last_at DESC
-        LIMIT %s;
-        """,
-        (user_id, user_id, limit)
-    )
+    cur.execute(CONVERSATIONS_SQL, (user_id, user_id, limit))
     rows_with_chat_id = cur.fetchall()
-    
-    # Also get individual messages without chat_id (for backward compatibility)
-    cur.execute(
-        """
-        SELECT id as chat_id,
-               created_at AS first_at,
-               created_at AS last_at,
-               user_query AS first_msg
-        FROM chat_history
-        WHERE user_id = %s AND chat_id IS NULL
-        ORDER BY created_at DESC
-        LIMIT %s;
-        """,
-        (user_id, limit)
-    )
+    cur.execute(LOOSE_TURNS_SQL, (user_id, limit))
     rows_without_chat_id = cur.fetchall()
+
+    if len(rows_with_chat_id) + len(rows_without_chat_id) < limit:
+        add_archived_conversations(chat_archive.archived_rows(cur, user_id), rows_with_chat_id, rows_without_chat_id)
     
     cur.close()
     conn.close()
-    
+    return format_conversations(rows_with_chat_id, rows_without_chat_id, limit)
+
+
+def format_conversations(rows_with_chat_id: list, rows_without_chat_id: list, limit: int) -> List[Dict]:
     # Combine and map to desired structure
     results = []
     
@@ -230,45 +475,58 @@ def get_conversations(user_id: int, limit: int = 50):
     return results[:limit]
 
 
+def add_archived_conversations(archived: List[Dict], with_chat_id: list, without_chat_id: list):
+    """Fold archived turns (oldest first) into the conversation rows (same shape as CONVERSATIONS_SQL)."""
+    convs = {r["chat_id"]: r for r in with_chat_id}
+    archived_only, titled = set(), set()
+    for r in archived:
+        cid = r["chat_id"]
+        if cid is None:
+            without_chat_id.append({"chat_id": r["id"], "last_at": r["created_at"], "first_msg": r["user_query"]})
+        elif cid not in convs:
+            convs[cid] = {"chat_id": cid, "last_at": r["created_at"], "first_msg": r["user_query"]}
+            with_chat_id.append(convs[cid])
+            archived_only.add(cid)
+        elif cid in archived_only:
+            convs[cid]["last_at"] = r["created_at"]
+        elif cid not in titled:
+            # Live conversation that began in an archived month: its first message is archived
+            convs[cid]["first_msg"] = r["user_query"]
+            titled.add(cid)
+
+
 def get_messages_by_chat(user_id: int, chat_id: str, limit: int = 200):
     """Return ordered messages for a chat_id as list of dicts with role & content."""
     conn = get_connection()
     cur = conn.cursor()
     
     # Try to get messages with the chat_id first
-    cur.execute(
-        """
-        SELECT user_query, ai_response
-        FROM chat_history
-        WHERE user_id = %s AND chat_id = %s
-        ORDER BY created_at ASC
-        LIMIT %s;
-        """,
-        (user_id, chat_id, limit)
-    )
+    cur.execute(CHAT_MESSAGES_SQL, (user_id, chat_id, limit))
     rows = cur.fetchall()
+    # The conversation's oldest turns may sit in archived months (only the months holding this chat are read)
+    if chat_archive.may_continue_archive(rows[0]["created_at"] if rows else None):
+        archived = [r for r in chat_archive.archived_rows(cur, user_id, chat_id) if r["chat_id"] == chat_id]
+        if archived:
+            rows = (archived + rows)[:limit]
     
     # If no messages found with chat_id, check if it's a database ID (for backward compatibility)
     if not rows:
         try:
             db_id = int(chat_id)
-            cur.execute(
-                """
-                SELECT user_query, ai_response
-                FROM chat_history
-                WHERE user_id = %s AND id = %s
-                ORDER BY created_at ASC
-                LIMIT %s;
-                """,
-                (user_id, db_id, limit)
-            )
+            cur.execute(TURN_BY_ID_SQL, (user_id, db_id, limit))
             rows = cur.fetchall()
+            if not rows:
+                rows = [r for r in chat_archive.archived_rows(cur, user_id) if r["id"] == db_id]
         except ValueError:
             # chat_id is not a number, so it's a proper UUID chat_id with no messages
             pass
     
     cur.close()
     conn.close()
+    return format_messages(rows)
+
+
+def format_messages(rows: List[Dict]) -> List[Dict]:
     messages = []
     for r in rows:
         messages.append({"type": "text", "sender": "user", "content": r["user_query"]})
@@ -277,9 +535,151 @@ def get_messages_by_chat(user_id: int, chat_id: str, limit: int = 200):
     return messages
 
 
+def search_chat_history(user_id: int, query: str, limit: int = 10):
+    """
+    Full-text search over a user's past turns, best matches first.
+    Any query word may match (OR), so natural questions still find exact names, dates and ids.
+    Only turns still in Postgres are searched; archived months are covered by semantic memory.
+    Returns list of dicts: [{"id", "chat_id", "user_query", "ai_response", "created_at", "rank"}, ...]
+    """
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            WITH q AS (
+                SELECT NULLIF(replace(plainto_tsquery('english', %s)::text, ' & ', ' | '), '')::tsquery AS tsq
+            )
+            SELECT ch.id, ch.chat_id, ch.user_query, ch.ai_response, ch.created_at,
+                   ts_rank_cd(ch.search_tsv, q.tsq) AS rank
+            FROM chat_history ch, q
+            WHERE ch.user_id = %s AND q.tsq IS NOT NULL AND ch.search_tsv @@ q.tsq
+            ORDER BY rank DESC, ch.created_at DESC
+            LIMIT %s;
+            """,
+            (query, user_id, limit)
+        )
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ---------------- BULK EXPORT / IMPORT ----------------
+# record type -> (table, exported columns)
+EXPORT_TABLES = {
+    "task": ("tasks", "id, title, datetime, priority, category, notes, notified"),
+    "chat": ("chat_history", "id, chat_id, user_query, ai_response, created_at"),
+}
+_EXPORT_FILTERS = {"task": " AND deleted_at IS NULL"}
+
+_IMPORT_SQL = {
+    "task": "INSERT INTO tasks (user_id, title, datetime, priority, category, notes, notified) VALUES %s",
+    "chat": "INSERT INTO chat_history (user_id, chat_id, user_query, ai_response, created_at) VALUES %s",
+}
+_IMPORT_TEMPLATES = {
+    "task": "(%s, %s, %s::timestamp, %s, %s, %s, COALESCE(%s, FALSE))",
+    "chat": "(%s, %s, %s, %s, COALESCE(%s::timestamp, CURRENT_TIMESTAMP))",
+}
+
+
+def iter_user_rows(user_id: int, batch_size: int = 1000) -> Iterator[Tuple[str, Dict]]:
+    """
+    Yield ("task" | "chat", row) for everything a user owns, oldest first (archived chat months included).
+    Rows come from server-side (named) cursors batch_size at a time and archive files are streamed,
+    so memory stays flat however large the history is; both tables are read from one consistent snapshot.
+    """
+    conn = get_connection()
+    try:
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        for kind, (table, columns) in EXPORT_TABLES.items():
+            if kind == "chat":
+                lookup = conn.cursor()
+                lookup.execute(chat_archive.ARCHIVE_LOOKUP_SQL, chat_archive.lookup_params(user_id))
+                paths = [entry["path"] for entry in lookup.fetchall()]
+                lookup.close()
+                for row in chat_archive.iter_archived(paths, user_id):
+                    yield kind, {k: row[k] for k in ("id", "chat_id", "user_query", "ai_response", "created_at")}
+            cur = conn.cursor(name=f"export_{table}")
+            cur.itersize = batch_size
+            cur.execute(
+                f"SELECT {columns} FROM {table} WHERE user_id = %s{_EXPORT_FILTERS.get(kind, '')} ORDER BY id;",
+                (user_id,)
+            )
+            for row in cur:
+                yield kind, row
+            cur.close()
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _import_values(kind: str, user_id: int, row: Dict) -> tuple:
+    if kind == "task":
+        return (user_id, row["title"], row.get("datetime"), row.get("priority"), row.get("category"),
+                row.get("notes", ""), row.get("notified"))
+    return (user_id, row.get("chat_id"), row["user_query"], row.get("ai_response"), row.get("created_at"))
+
+
+def _parse_timestamp(value):
+    # The month Postgres will file the row under: '::timestamp' ignores any UTC offset
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    return value
+
+
+def prepare_import(records: Iterable[Tuple[str, Dict]]):
+    """
+    Create the chat_history partitions an import's chat rows will need. Runs before bulk_import
+    opens its transaction, since partition DDL cannot run while that transaction holds chat_history.
+    """
+    chat_archive.ensure_partitions_for(_parse_timestamp(row.get("created_at")) for kind, row in records if kind == "chat")
+
+
+def bulk_import(user_id: int, records: Iterable[Tuple[str, Dict]], batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Insert ("task" | "chat", row) records for a user with multi-row INSERTs of batch_size rows,
+    all in one transaction: either the whole import lands or none of it does.
+    Rows always go to user_id, whatever the record says; ids are assigned fresh.
+    Chat months must already have partitions: run prepare_import() on the records first.
+    Returns {"task": n, "chat": m}.
+    """
+    pending = {kind: [] for kind in _IMPORT_SQL}
+    counts = {kind: 0 for kind in _IMPORT_SQL}
+    conn = get_connection()
+    cur = conn.cursor()
+
+    def flush(kind: str):
+        if pending[kind]:
+            execute_values(cur, _IMPORT_SQL[kind], pending[kind], template=_IMPORT_TEMPLATES[kind], page_size=batch_size)
+            counts[kind] += len(pending[kind])
+            pending[kind].clear()
+
+    try:
+        for kind, row in records:
+            pending[kind].append(_import_values(kind, user_id, row))
+            if len(pending[kind]) >= batch_size:
+                flush(kind)
+        for kind in pending:
+            flush(kind)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    print(f"📥 Imported {counts['chat']} chats and {counts['task']} tasks for user {user_id}")
+    return counts
+
+
 # ---------------- AUTH HELPERS ----------------
 pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
 
+CREATE_USER_SQL = "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s) RETURNING id, name, email;"
+UPDATE_PASSWORD_SQL = "UPDATE users SET password_hash = %s WHERE id = %s;"
+USER_BY_EMAIL_SQL = "SELECT id, name, email, password_hash FROM users WHERE email = %s;"
+
 def hash_password(plain_password: str) -> str:
     # Ensure password length compatibility for bcrypt; argon2 supports long inputs
     if isinstance(plain_password, str):
@@ -290,22 +690,31 @@ def verify_password(plain_password: str, password_hash: str) -> bool:
     return pwd_context.verify(plain_password, password_hash)
 
 def create_user(name: str, email: str, plain_password: str) -> Dict:
+    return create_user_with_hash(name, email, hash_password(plain_password))
+
+def create_user_with_hash(name: str, email: str, password_hash: str) -> Dict:
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s) RETURNING id, name, email;",
-        (name, email, hash_password(plain_password))
-    )
+    cur.execute(CREATE_USER_SQL, (name, email, password_hash))
     user = cur.fetchone()
     conn.commit()
     cur.close()
     conn.close()
     return user
 
+def update_password_hash(user_id: int, password_hash: str):
+    """Replace a user's stored hash (used to upgrade outdated hash parameters on login)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(UPDATE_PASSWORD_SQL, (password_hash, user_id))
+    conn.commit()
+    cur.close()
+    conn.close()
+
 def get_user_by_email(email: str) -> Optional[Dict]:
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute("SELECT id, name, email, password_hash FROM users WHERE email = %s;", (email,))
+    cur.execute(USER_BY_EMAIL_SQL, (email,))
     user = cur.fetchone()
     cur.close()
     conn.close()
@@ -0,0 +1,135 @@
+# backend/app/embedding_models.py
+"""
+Local embedding models, loaded in-process: sentence-transformers on PyTorch or
+the int8 ONNX export (EMBEDDING_BACKEND), plus the wire format of the shared
+embedding server.
+
+Kept outside app/services so the embedding server (app/embedding_server.py) can
+load a model without importing the services package and the whole AI stack with it.
+Workers use it through app.services.embeddings.
+"""
+
+import json
+import logging
+import os
+import struct
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_MODEL_NAME = os.getenv("SENTENCE_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = os.getenv(
+    "ONNX_MODEL_DIR", os.path.join("models", f"{_SENTENCE_MODEL_NAME.split('/')[-1]}-onnx-int8")
+)
+_EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = runtime default
+_ONNX_BATCH_SIZE = 32
+EMBEDDING_SOCKET_PATH = os.getenv("EMBEDDING_SOCKET_PATH")
+
+# Wire format shared with the embedding server: 4-byte big-endian length + JSON body
+FRAME_HEADER = struct.Struct(">I")
+
+
+# ---------------- LOCAL MODEL ----------------
+def _load_torch_encoder() -> Callable[[List[str]], List[List[float]]]:
+    from sentence_transformers import SentenceTransformer
+    if _EMBEDDING_THREADS:
+        import torch
+        torch.set_num_threads(_EMBEDDING_THREADS)
+    s_model = SentenceTransformer(_SENTENCE_MODEL_NAME)
+    logger.info("Loaded local SentenceTransformer model: %s", _SENTENCE_MODEL_NAME)
+
+    def encode(texts: List[str]) -> List[List[float]]:
+        vecs = s_model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
+        return [v.tolist() for v in vecs]
+    return encode
+
+
+def _load_onnx_encoder(model_dir: str = None) -> Callable[[List[str]], List[List[float]]]:
+    """
+    Tokenize with the exported tokenizer.json, run the quantized transformer on
+    onnxruntime, then apply the same pooling/normalization as the
+    SentenceTransformer pipeline (recorded at export time in embedder_config.json).
+    """
+    import numpy as np
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+
+    model_dir = model_dir or ONNX_MODEL_DIR
+    with open(os.path.join(model_dir, "embedder_config.json")) as f:
+        cfg = json.load(f)
+
+    tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+    tokenizer.enable_truncation(max_length=cfg.get("max_seq_length", 256))
+    tokenizer.enable_padding(pad_id=cfg.get("pad_token_id", 0), pad_token=cfg.get("pad_token", "[PAD]"))
+
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if _EMBEDDING_THREADS:
+        opts.intra_op_num_threads = _EMBEDDING_THREADS
+    session = ort.InferenceSession(
+        os.path.join(model_dir, cfg.get("onnx_file", "model-int8.onnx")), opts, providers=["CPUExecutionProvider"]
+    )
+    input_names = {i.name for i in session.get_inputs()}
+    logger.info("Loaded ONNX embedding model from %s (%s)", model_dir, cfg.get("model_name"))
+
+    def encode(texts: List[str]) -> List[List[float]]:
+        out: List[List[float]] = []
+        for start in range(0, len(texts), _ONNX_BATCH_SIZE):
+            batch = tokenizer.encode_batch(texts[start:start + _ONNX_BATCH_SIZE])
+            mask = np.array([e.attention_mask for e in batch], dtype=np.int64)
+            feeds = {"input_ids": np.array([e.ids for e in batch], dtype=np.int64), "attention_mask": mask}
+            if "token_type_ids" in input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in batch], dtype=np.int64)
+            hidden = session.run(None, feeds)[0]
+            if cfg.get("pooling") == "cls":
+                vecs = hidden[:, 0]
+            else:
+                m = mask[..., None].astype(np.float32)
+                vecs = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+            if cfg.get("normalize", True):
+                vecs = vecs / np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12, None)
+            out.extend(vecs.tolist())
+        return out
+    return encode
+
+
+_BACKENDS = {"torch": _load_torch_encoder, "onnx": _load_onnx_encoder}
+
+
+def load_backend(name: str) -> Callable[[List[str]], List[List[float]]]:
+    """
+    Build an encoder for a specific local backend ("torch" or "onnx"). Raises if unavailable.
+    """
+    return _BACKENDS[name]()
+
+
+def load_local_encoder() -> Callable[[List[str]], List[List[float]]]:
+    """
+    Load a model in this process (what the embedding server itself uses).
+    """
+    # Try the configured local backend first, then torch if ONNX was asked for but is unusable
+    for backend in dict.fromkeys([EMBEDDING_BACKEND, "torch"]):
+        try:
+            return load_backend(backend)
+        except Exception as e:
+            logger.warning("Embedding backend '%s' not available or failed to load: %s.", backend, e)
+
+    # fallback to Cohere if cohere client exists
+    try:
+        from app.services.ai_services import get_cohere_client
+        cohere_client = get_cohere_client()
+        if cohere_client is None:
+            raise RuntimeError("Cohere client not configured")
+
+        def encode(texts: List[str]) -> List[List[float]]:
+            resp = cohere_client.embed(texts=texts, model="embed-english-v2.0")
+            return resp.embeddings
+        logger.info("Using Cohere embeddings as fallback.")
+        return encode
+    except Exception as ex:
+        logger.error("No embedding provider available. Install sentence-transformers or configure Cohere. %s", ex)
+
+        def encode(texts: List[str]) -> List[List[float]]:
+            raise RuntimeError("No embedding provider available. Install sentence-transformers or configure Cohere.")
+        return encode
@@ -0,0 +1,155 @@
+# backend/app/embedding_server.py
+"""
+Shared embedding server
+-----------------------
+Owns the one embedding model on a host and serves encode requests from every
+uvicorn / Celery process over a Unix domain socket, so weights are loaded once
+and a single inference thread decides how many cores embedding may use
+(EMBEDDING_THREADS).
+
+Requests that arrive while the model is busy are merged into one batch (up to
+EMBEDDING_MAX_BATCH texts, waiting at most EMBEDDING_BATCH_WAIT_MS for more),
+which is far cheaper than encoding them one by one.
+
+Protocol: 4-byte big-endian length + JSON, one response per request.
+    {"texts": [...]}  → {"embeddings": [[...], ...]}
+    {"ping": true}    → {"ok": true, "batches": n, "texts": n, "max_batch_seen": n}
+    failures          → {"error": "..."}
+
+Usage:
+    EMBEDDING_SOCKET_PATH=/tmp/embeddings.sock python -m app.embedding_server
+Clients pick it up when EMBEDDING_SOCKET_PATH is set in their environment too.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from app.embedding_models import EMBEDDING_SOCKET_PATH, FRAME_HEADER, load_local_encoder
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+BATCH_WAIT = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "2")) / 1000
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+
+class EmbeddingServer:
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]],
+                 max_batch: int = MAX_BATCH, batch_wait: float = BATCH_WAIT):
+        self._encode = encode
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self._queue: asyncio.Queue = None
+        # One inference thread: the model's own thread pool is the only CPU parallelism
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedder")
+        self.stats = {"batches": 0, "texts": 0, "max_batch_seen": 0}
+
+    async def encode(self, texts: List[str]) -> List[List[float]]:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[List[str], asyncio.Future]]:
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = asyncio.get_running_loop().time() + self.batch_wait
+        while size < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            texts = [t for item_texts, _ in batch for t in item_texts]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._encode, texts)
+            except Exception as e:
+                logger.error(f"❌ Encoding a batch of {len(texts)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(texts))
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():  # client may have gone away
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                if size > MAX_FRAME_BYTES:
+                    raise ValueError(f"request of {size} bytes exceeds limit")
+                request = json.loads(await reader.readexactly(size))
+                try:
+                    if request.get("ping"):
+                        response = {"ok": True, **self.stats}
+                    else:
+                        response = {"embeddings": await self.encode(list(request["texts"]))}
+                except Exception as e:
+                    response = {"error": str(e)}
+                body = json.dumps(response).encode()
+                writer.write(FRAME_HEADER.pack(len(body)) + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Dropping embedding client: {e}")
+        finally:
+            writer.close()
+
+    async def serve(self, path: str):
+        self._queue = asyncio.Queue()
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        os.chmod(path, 0o660)
+        batcher = asyncio.create_task(self._batcher())
+        logger.info(f"✅ Embedding server listening on {path} (max batch {self.max_batch}, wait {self.batch_wait * 1000:.1f} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self._executor.shutdown(wait=False)
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else EMBEDDING_SOCKET_PATH
+    if not path:
+        sys.exit("Set EMBEDDING_SOCKET_PATH or pass the socket path")
+    encode = load_local_encoder()
+    encode(["warm up"])  # load weights before accepting clients
+    try:
+        asyncio.run(EmbeddingServer(encode).serve(path))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
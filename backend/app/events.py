@@ -0,0 +1,194 @@
+# backend/app/events.py
+"""
+Per-user push events (reminder fired, task created/updated/deleted) for /ws clients.
+
+Anything that changes a user's state calls publish(), from an API worker or
+the Celery worker alike; it is a single Redis PUBLISH on the user's channel.
+Each API process holds ONE pattern subscription (EventHub) and fans messages
+out to the WebSockets connected to it, so an idle client costs a small
+asyncio queue, not a Redis connection.
+
+Delivery is best-effort: a client that falls behind or was disconnected gets
+a {"type": "resync"} event / reconnects and catches up with GET /api/tasks?since=.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from app import bulkheads
+from app.config import settings
+from app.metrics import EVENTS_PUBLISHED, EVENTS_DELIVERED
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "events:user:"
+RESYNC = json.dumps({"type": "resync"})
+
+_publisher: Optional[redis.Redis] = None
+_async_publisher: Optional[aioredis.Redis] = None
+
+
+def channel(user_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{user_id}"
+
+
+def _encode(event_type: str, data: Optional[dict]) -> str:
+    return json.dumps({"type": event_type, "data": data or {}, "ts": time.time()}, default=str)
+
+
+def _client() -> redis.Redis:
+    global _publisher
+    if _publisher is None:
+        _publisher = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+    return _publisher
+
+
+def _async_client() -> aioredis.Redis:
+    global _async_publisher
+    if _async_publisher is None:
+        _async_publisher = aioredis.Redis.from_url(settings.REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+    return _async_publisher
+
+
+def publish(user_id: int, event_type: str, data: Optional[dict] = None) -> bool:
+    """
+    Send one event to every connected client of user_id. Never raises: a lost event only
+    means the client picks the change up on its next sync.
+    """
+    return publish_many(user_id, [(event_type, data)])
+
+
+def publish_many(user_id: int, events: Iterable[Tuple[str, Optional[dict]]]) -> bool:
+    """
+    Publish several events for one user in a single round trip (e.g. a task batch).
+    """
+    events = list(events)
+    if not events:
+        return True
+    try:
+        pipe = _client().pipeline(transaction=False)
+        for event_type, data in events:
+            pipe.publish(channel(user_id), _encode(event_type, data))
+        pipe.execute()
+        for event_type, _ in events:
+            EVENTS_PUBLISHED.labels(event_type).inc()
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Could not publish {len(events)} event(s) for user {user_id}: {e}")
+        return False
+
+
+async def publish_async(user_id: int, event_type: str, data: Optional[dict] = None) -> bool:
+    """publish() for async handlers."""
+    return await publish_many_async(user_id, [(event_type, data)])
+
+
+async def publish_many_async(user_id: int, events: Iterable[Tuple[str, Optional[dict]]]) -> bool:
+    """publish_many() for async handlers."""
+    events = list(events)
+    if not events:
+        return True
+    try:
+        async with bulkheads.redis.slot():  # BulkheadFull is just another lost event
+            pipe = _async_client().pipeline(transaction=False)
+            for event_type, data in events:
+                pipe.publish(channel(user_id), _encode(event_type, data))
+            await pipe.execute()
+        for event_type, _ in events:
+            EVENTS_PUBLISHED.labels(event_type).inc()
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Could not publish {len(events)} event(s) for user {user_id}: {e}")
+        return False
+
+
+class EventHub:
+    """
+    One psubscribe per process; routes each message to the queues of that user's sockets.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._queues: Dict[int, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        # The Redis subscription starts with the first socket, so processes without clients never open it
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queues.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._queues.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._queues[user_id]
+
+    def connections(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def dispatch(self, user_id: int, message: str):
+        for queue in self._queues.get(user_id, ()):
+            try:
+                queue.put_nowait(message)
+                EVENTS_DELIVERED.labels("queued").inc()
+            except asyncio.QueueFull:
+                # Slow client: drop its backlog and tell it to resync instead
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+                EVENTS_DELIVERED.labels("resync").inc()
+
+    async def _listen(self):
+        backoff = 1.0
+        while True:
+            client = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                logger.info("📡 Event hub subscribed")
+                backoff = 1.0
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    try:
+                        user_id = int(message["channel"][len(CHANNEL_PREFIX):])
+                    except ValueError:
+                        continue
+                    self.dispatch(user_id, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Event hub lost Redis ({e}), retrying in {backoff:.0f}s")
+                # Anything published while we were away is gone: every client resyncs
+                for user_id in list(self._queues):
+                    self.dispatch(user_id, RESYNC)
+            finally:
+                try:
+                    await pubsub.aclose()
+                    await client.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+event_hub = EventHub(settings.EVENTS_QUEUE_SIZE)
@@ -1,17 +1,27 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Response, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.concurrency import run_in_threadpool
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, field_validator
+import datetime as dt
 import logging
-import jwt
-
-from app.services import ai_services, nlu
-from app.db import utils as db_utils
-from app.db.utils import create_tables, save_chat, get_chat_history, get_conversations, get_messages_by_chat, delete_task  # correct import
-from app.db.neo4j_utils import save_fact_neo4j, get_fact_neo4j, get_all_facts_for_user, get_facts_neo4j
-from app.db.redis_utils import save_chat_redis, get_last_chats
+import os
+import pytz
+
+from app.services import ai_services, nlu, embeddings, ingestion
+from app.db.utils import create_tables, TaskCursorExpired
+# Handlers await the async data layer directly; the sync modules are for the Celery worker
+from app.db import async_utils as db, async_neo4j_utils as graph, async_redis_utils as chat_cache
+from app.db import neo4j_utils, redis_utils, pinecone_utils
 from app.config import settings
-from app.api.auth import router as auth_router
+from app.api.auth import router as auth_router, get_current_user_id
+from app.api.jobs import router as jobs_router
+from app.api.export import router as export_router
+from app.api.ws import router as ws_router
+from app.password_hashing import hash_pool
+from app.metrics import observe_stage, render_latest, mark_process_dead, CHAT_REQUESTS
+from app.readiness import readiness
+from app import bulkheads, events
+from app.bulkheads import BulkheadFull
 
 app = FastAPI(title="Personal AI Assistant")
 logger = logging.getLogger(__name__)
@@ -38,26 +48,94 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
-    await run_in_threadpool(create_tables)
-    logger.info("✅ Tables checked/created (tasks, chat_history)")
+    # Nothing here blocks: dependencies warm up in the background and /ready reports progress
+    readiness.register("postgres", create_tables, critical=True, retries=12)
+    readiness.register("redis", redis_utils.ping, retries=3)
+    readiness.register("neo4j", neo4j_utils.setup, retries=3)
+    readiness.register("pinecone", pinecone_utils.get_index, retries=3)
+    readiness.register("embedder", embeddings.warm_up)
+    readiness.register("llm_clients", ai_services.warm_up)
+    readiness.register("auth_hash_pool", hash_pool.warm_up)
+    readiness.start()
+    await db.get_pool()  # connections are made in the background
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    hash_pool.shutdown()
+    bulkheads.shutdown()
+    await events.event_hub.close()
+    await db.close_pool()
+    await graph.close()
+    await chat_cache.close()
+    mark_process_dead(os.getpid())
+
+@app.exception_handler(BulkheadFull)
+async def bulkhead_full_handler(request, exc: BulkheadFull):
+    # Only the features behind the saturated dependency fail, and they fail fast
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"The {exc.name} backend is busy, please retry."},
+        headers={"Retry-After": "1"},
+    )
 
 app.include_router(auth_router)
+app.include_router(jobs_router)
+app.include_router(export_router)
+app.include_router(ws_router)
 
 class ChatRequest(BaseModel):
     user_message: str
     token: str
     chat_id: str | None = None
-def get_current_user_id(token: str) -> int:
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        return int(payload.get("sub"))
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+IST = pytz.timezone("Asia/Kolkata")
+
+
+class TaskIn(BaseModel):
+    title: str = Field(min_length=1)
+    datetime: dt.datetime | None = None
+    priority: str | None = None
+    category: str | None = None
+    notes: str | None = None
+    external_id: str | None = Field(default=None, min_length=1, max_length=255)
+
+    @field_validator("datetime")
+    @classmethod
+    def _to_ist(cls, value):
+        # Tasks are stored as naive IST, which is what the reminder worker compares against
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(IST).replace(tzinfo=None)
+        return value
+
+
+class TaskBatchRequest(BaseModel):
+    token: str
+    tasks: list[TaskIn] = Field(min_length=1)
 
 @app.get("/")
 async def root():
     return {"message": "🚀 Personal AI Assistant backend running!"}
 
+@app.get("/ready")
+async def ready(response: Response):
+    is_ready = readiness.is_ready()
+    response.status_code = 200 if is_ready else 503
+    return {"ready": is_ready, "components": readiness.snapshot()}
+
+@app.get("/metrics")
+async def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+async def _cache_chat(user_id: int, user_message: str, reply: str, chat_id: str | None = None):
+    # Redis only caches the latest turns (Postgres has them all): skip it when Redis is saturated
+    try:
+        await bulkheads.redis.run(chat_cache.save_chat_redis, user_id, user_message, reply, chat_id)
+    except BulkheadFull:
+        logger.warning(f"⚠️ Redis bulkhead full, turn not cached for user {user_id}")
+
 @app.post("/chat/")
 async def chat(request: ChatRequest):
     user_message = request.user_message
@@ -68,28 +146,37 @@ async def chat(request: ChatRequest):
     
     try:
         # ---------- Determine intent ----------
-        structured = nlu.get_structured_intent(user_message)
+        with observe_stage("nlu"):
+            structured = nlu.get_structured_intent(user_message)
         action = structured.get("action")
+        CHAT_REQUESTS.labels(action or "unknown").inc()
 
         # ---------- Fetch global context ----------
         # 1️⃣ Build history text from DB by chat_id if provided; fallback to recent chats
         history_text = ""
-        if chat_id:
-            msgs = await run_in_threadpool(get_messages_by_chat, user_id, chat_id, 50)
-            history_text = "\n".join([f"{'Human' if m['sender']=='user' else 'Assistant'}: {m['content']}" for m in msgs])
-        else:
-            extra_chats = await run_in_threadpool(get_chat_history, user_id, 10)
-            history_text = "\n".join([f"Human: {c['user_query']}\nAssistant: {c['ai_response']}" for c in extra_chats])
+        with observe_stage("history_fetch"):
+            if chat_id:
+                msgs = await bulkheads.postgres.run(db.get_messages_by_chat, user_id, chat_id, 50)
+                history_text = "\n".join([f"{'Human' if m['sender']=='user' else 'Assistant'}: {m['content']}" for m in msgs])
+            else:
+                extra_chats = await bulkheads.postgres.run(db.get_chat_history, user_id, 10)
+                history_text = "\n".join([f"Human: {c['user_query']}\nAssistant: {c['ai_response']}" for c in extra_chats])
 
         # 3️⃣ Fetch all facts from Neo4j
-        facts_list = await run_in_threadpool(get_facts_neo4j, user_id)
-        facts_text = "\n".join([f"{fact['key']}: {fact['value']}" for fact in facts_list])
+        with observe_stage("facts_fetch"):
+            try:
+                facts_list = await bulkheads.neo4j.run(graph.get_facts_neo4j, user_id)
+            except BulkheadFull:
+                # Facts only enrich the reply: answer without them rather than fail the turn
+                logger.warning("⚠️ Neo4j bulkhead full, answering without facts")
+                facts_list = {}
+        facts_text = "\n".join(f"{key}: {value}" for key, value in facts_list.items())  # {key: value}
 
         # ---------- Handle actions ----------
         if action == "general_chat":
             # ✅ Wrap message in dict to avoid 'str' object has no attribute 'get'
             user_msg_dict = {"sender": str(user_id), "text": user_message}
-            response = await run_in_threadpool(
+            response = await bulkheads.llm.run(
                 ai_services.get_response,
                 user_msg_dict,
                 history=history_text,
@@ -97,29 +184,35 @@ async def chat(request: ChatRequest):
             )
 
             # Save chat for this user
-            await run_in_threadpool(save_chat, user_id, user_message, response, chat_id)
-            await run_in_threadpool(save_chat_redis, user_id, user_message, response, chat_id)
+            with observe_stage("postgres_write"):
+                await bulkheads.postgres.run(db.save_chat, user_id, user_message, response, chat_id)
+            with observe_stage("redis_write"):
+                await _cache_chat(user_id, user_message, response, chat_id)
 
             return {"success": True, "reply": response, "intent": structured}
 
         elif action == "create_task":
             # attach user_id
             data_with_user = {**structured["data"], "user_id": user_id}
-            await run_in_threadpool(db_utils.save_task, data_with_user)
+            with observe_stage("postgres_write"):
+                task_id = await bulkheads.postgres.run(db.save_task, data_with_user)
+            await events.publish_async(user_id, "task.created", {"id": task_id, **structured["data"]})
             confirmation_message = f"Task saved: {structured['data']['title']} due {structured['data']['datetime']}"
 
-            await run_in_threadpool(save_chat, user_id, user_message, confirmation_message)
-            await run_in_threadpool(save_chat_redis, user_id, user_message, confirmation_message)
+            with observe_stage("postgres_write"):
+                await bulkheads.postgres.run(db.save_chat, user_id, user_message, confirmation_message)
+            with observe_stage("redis_write"):
+                await _cache_chat(user_id, user_message, confirmation_message)
 
             return {"success": True, "reply": confirmation_message, "status": "✅ Task saved", "task": structured["data"]}
 
         elif action == "fetch_tasks":
-            tasks = await run_in_threadpool(db_utils.get_tasks, user_id)
+            tasks = await bulkheads.postgres.run(db.get_tasks, user_id)
             tasks_summary = f"You have {len(tasks)} tasks."
 
             # ✅ Wrap summary in dict for AI service
             tasks_msg_dict = {"sender": str(user_id), "text": tasks_summary}
-            ai_reply = await run_in_threadpool(
+            ai_reply = await bulkheads.llm.run(
                 ai_services.get_response,
                 tasks_msg_dict,
                 history=history_text,
@@ -131,11 +224,11 @@ async def chat(request: ChatRequest):
         elif action == "save_fact":
             key = structured["data"]["key"]
             value = structured["data"]["value"]
-            await run_in_threadpool(save_fact_neo4j, key, value)
+            await bulkheads.neo4j.run(graph.save_user_fact_neo4j, user_id, key, value)
 
             confirmation_message = f"I have saved the fact '{key}: {value}' in your knowledge base."
             confirm_msg_dict = {"sender": str(user_id), "text": confirmation_message}  # ✅ wrapped
-            ai_reply = await run_in_threadpool(
+            ai_reply = await bulkheads.llm.run(
                 ai_services.get_response,
                 confirm_msg_dict,
                 history=history_text,
@@ -146,49 +239,123 @@ async def chat(request: ChatRequest):
 
         elif action == "get_chat_history":
             # Return last 10 chats from Redis globally
-            history = await run_in_threadpool(get_last_chats, user_id)
+            history = await bulkheads.redis.run(chat_cache.get_last_chats, user_id)
             return {"success": True, "history": history, "intent": structured}
 
         else:
             return {"success": False, "reply": "⚠ Unknown action", "intent": structured}
 
+    except BulkheadFull:
+        raise
     except Exception as e:
         logger.exception(f"Chat endpoint failed: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+def _format_task(row) -> dict:
+    return {
+        "id": row["id"],
+        "external_id": row.get("external_id"),
+        "title": row["title"],
+        "datetime": row["datetime"].isoformat() if row["datetime"] else None,
+        "priority": row["priority"],
+        "category": row["category"],
+        "notes": row["notes"],
+        "notified": row["notified"],
+        "updated_at": row["updated_at"].isoformat() if row.get("updated_at") else None,
+    }
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag.removeprefix("W/") for t in tags)
+
+
 @app.get("/api/tasks")
-async def api_get_tasks(token: str):
+async def api_get_tasks(
+    token: str,
+    response: Response,
+    since: int | None = Query(default=None, ge=0),
+    if_none_match: str | None = Header(default=None),
+):
+    """
+    Full list (with an ETag; If-None-Match → 304 when nothing changed) or, with
+    since=<cursor>, only the tasks changed or deleted after that cursor, a page at a
+    time (`has_more` → call again with the new cursor). Both return a `cursor` to use
+    as the next `since`. A cursor older than the tombstone purge gets 410: resync
+    from the full list.
+    """
     try:
         user_id = get_current_user_id(token)
-        tasks = await run_in_threadpool(db_utils.get_tasks, user_id)
-        formatted_tasks = [
-            {
-                "id": row["id"],
-                "title": row["title"],
-                "datetime": row["datetime"].isoformat() if row["datetime"] else None,
-                "priority": row["priority"],
-                "category": row["category"],
-                "notes": row["notes"],
-                "notified": row["notified"]
+        response.headers["Cache-Control"] = "private, no-cache"
+
+        if since is not None:
+            try:
+                rows, cursor, has_more = await bulkheads.postgres.run(db.get_task_changes, user_id, since)
+            except TaskCursorExpired:
+                raise HTTPException(status_code=410, detail="Cursor expired; resync from the full task list")
+            return {
+                "success": True,
+                "tasks": [_format_task(r) for r in rows if r["deleted_at"] is None],
+                "deleted": [r["id"] for r in rows if r["deleted_at"] is not None],
+                "cursor": cursor,
+                "has_more": has_more,
             }
-            for row in tasks
-        ]
-        return {"success": True, "tasks": formatted_tasks}
+
+        # The version is read first: if a write lands before the list is read, the ETag is
+        # older than the body and the next poll just gets a 200 again
+        version = await bulkheads.postgres.run(db.get_task_version, user_id)
+        etag = f'W/"tasks-{version}"'
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+        tasks = await bulkheads.postgres.run(db.get_tasks, user_id)
+        response.headers["ETag"] = etag
+        return {"success": True, "tasks": [_format_task(r) for r in tasks], "cursor": version}
+    except (HTTPException, BulkheadFull):
+        raise
     except Exception as e:
         logger.exception(f"Error fetching tasks: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch tasks")
 
 
+@app.post("/api/tasks/batch")
+async def api_save_tasks_batch(request: TaskBatchRequest):
+    """
+    Create or update up to TASK_BATCH_MAX tasks in one transaction (e.g. from a calendar sync).
+    Tasks carrying an external_id are upserted; moving a task's datetime re-arms its reminder.
+    """
+    user_id = get_current_user_id(request.token)
+    if len(request.tasks) > settings.TASK_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {settings.TASK_BATCH_MAX} tasks per batch")
+    try:
+        with observe_stage("postgres_write"):
+            saved = await bulkheads.postgres.run(db.save_tasks_bulk, user_id, [t.model_dump() for t in request.tasks])
+    except BulkheadFull:
+        raise
+    except Exception as e:
+        logger.exception(f"Error saving task batch: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save tasks")
+    await events.publish_many_async(
+        user_id, [("task.created" if t["created"] else "task.updated", t) for t in saved]
+    )
+    created = sum(1 for t in saved if t["created"])
+    return {"success": True, "tasks": saved, "created": created, "updated": len(saved) - created}
+
+
 @app.delete("/api/tasks/{task_id}")
 async def api_delete_task(task_id: int, token: str):
     try:
         user_id = get_current_user_id(token)
-        success = await run_in_threadpool(delete_task, user_id, task_id)
+        success = await bulkheads.postgres.run(db.delete_task, user_id, task_id)
         if success:
+            await events.publish_async(user_id, "task.deleted", {"id": task_id})
             return {"success": True, "message": "Task deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Task not found")
+    except (HTTPException, BulkheadFull):
+        raise
     except Exception as e:
         logger.exception(f"Error deleting task: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete task")
@@ -198,8 +365,10 @@ async def api_delete_task(task_id: int, token: str):
 async def api_get_conversations(token: str):
     try:
         user_id = get_current_user_id(token)
-        convos = await run_in_threadpool(get_conversations, user_id)
+        convos = await bulkheads.postgres.run(db.get_conversations, user_id)
         return {"success": True, "conversations": convos}
+    except BulkheadFull:
+        raise
     except Exception as e:
         logger.exception(f"Error fetching conversations: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch conversations")
@@ -209,8 +378,10 @@ async def api_get_conversations(token: str):
 async def api_get_messages(chat_id: str, token: str):
     try:
         user_id = get_current_user_id(token)
-        messages = await run_in_threadpool(get_messages_by_chat, user_id, chat_id, 500)
+        messages = await bulkheads.postgres.run(db.get_messages_by_chat, user_id, chat_id, 500)
         return {"success": True, "messages": messages}
+    except BulkheadFull:
+        raise
     except Exception as e:
         logger.exception(f"Error fetching messages: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch messages")
@@ -234,23 +405,38 @@ async def chat_with_upload(
         except Exception:
             user_text = str(prompt)
 
-        # We don't process the file contents in this stub; ensure read to avoid warnings
-        await file.read()  # discard
-
-        # Create a simple response using AI service context if available
+        # Stream the file to a spooled temp file, then extract → chunk → embed → store it
+        spool = await ingestion.spool_upload(file)
+        try:
+            with observe_stage("ingestion"):
+                doc = await bulkheads.embeddings.run(
+                    ingestion.ingest_document, str(user_id), spool, file.filename, file.content_type, user_text
+                )
+        finally:
+            spool.close()
+
+        # Answer from the most relevant chunks of this document
         user_msg_dict = {"sender": str(user_id), "text": user_text}
-        ai_reply = await run_in_threadpool(
+        ai_reply = await bulkheads.llm.run(
             ai_services.get_response,
             user_msg_dict,
             history="",
+            pinecone_context=ingestion.build_document_context(doc),
             neo4j_facts=""
         )
 
         # Save entries
-        await run_in_threadpool(save_chat, user_id, user_text, ai_reply, chat_id)
-        await run_in_threadpool(save_chat_redis, user_id, user_text, ai_reply, chat_id)
-
-        return {"success": True, "response": ai_reply}
+        with observe_stage("postgres_write"):
+            await bulkheads.postgres.run(db.save_chat, user_id, user_text, ai_reply, chat_id)
+        with observe_stage("redis_write"):
+            await _cache_chat(user_id, user_text, ai_reply, chat_id)
+
+        document = {k: doc[k] for k in ("doc_id", "filename", "chunks", "truncated")}
+        return {"success": True, "response": ai_reply, "document": document}
+    except ingestion.IngestionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except (HTTPException, BulkheadFull):
+        raise
     except Exception as e:
         logger.exception(f"Upload chat failed: {e}")
         raise HTTPException(status_code=500, detail="Upload chat failed")
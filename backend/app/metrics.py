@@ -0,0 +1,112 @@
+# backend/app/metrics.py
+"""
+Prometheus metrics for the chat pipeline, exposed at /metrics.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by the workers (start.sh clears it on boot); each worker
+then writes its samples there and /metrics aggregates all of them.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if _MULTIPROC_DIR:
+    os.makedirs(_MULTIPROC_DIR, exist_ok=True)
+
+_STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# ---------------- CHAT PIPELINE ----------------
+STAGE_LATENCY = Histogram(
+    "chat_stage_seconds",
+    "Time spent in each stage of a chat turn",
+    ["stage"],
+    buckets=_STAGE_BUCKETS,
+)
+CHAT_REQUESTS = Counter("chat_requests_total", "Chat turns by detected action", ["action"])
+
+# ---------------- LLM PROVIDERS ----------------
+LLM_LATENCY = Histogram(
+    "llm_generation_seconds",
+    "LLM call latency per provider",
+    ["provider", "outcome"],
+    buckets=_STAGE_BUCKETS,
+)
+PROVIDER_FAILOVERS = Counter(
+    "llm_provider_failovers_total",
+    "Times a request moved on from a provider that failed",
+    ["provider"],
+)
+HEDGED_REQUESTS = Counter("llm_hedged_requests_total", "Requests where the secondary provider was fired", ["provider"])
+
+# ---------------- CACHES ----------------
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Single-flight reads: 'calls' reached the backend, 'shared' joined an identical call in flight",
+    ["function", "outcome"],
+)
+
+# ---------------- AUTH HASHING POOL ----------------
+HASH_JOBS = Counter("auth_hash_jobs_total", "Password hashing jobs by outcome", ["outcome"])
+HASH_LATENCY = Histogram("auth_hash_seconds", "Queue + compute time of password hashing jobs", buckets=_STAGE_BUCKETS)
+HASH_IN_FLIGHT = Gauge("auth_hash_in_flight", "Hashing jobs queued or running", multiprocess_mode="livesum")
+
+# ---------------- BULKHEADS ----------------
+BULKHEAD_CALLS = Counter("bulkhead_calls_total", "Calls through each dependency bulkhead by outcome", ["bulkhead", "outcome"])
+BULKHEAD_IN_FLIGHT = Gauge("bulkhead_in_flight", "Calls running or queued per bulkhead", ["bulkhead"], multiprocess_mode="livesum")
+BULKHEAD_RUNNING = Gauge("bulkhead_running", "Calls holding a bulkhead slot", ["bulkhead"], multiprocess_mode="livesum")
+# Saturation = bulkhead_running / bulkhead_capacity (both summed over workers)
+BULKHEAD_CAPACITY = Gauge("bulkhead_capacity", "Concurrent slots per bulkhead", ["bulkhead"], multiprocess_mode="livesum")
+BULKHEAD_WAIT = Histogram("bulkhead_wait_seconds", "Time queued for a bulkhead slot", ["bulkhead"], buckets=_STAGE_BUCKETS)
+
+# ---------------- PUSH EVENTS ----------------
+EVENTS_PUBLISHED = Counter("events_published_total", "Events published to Redis by type", ["type"])
+EVENTS_DELIVERED = Counter("events_delivered_total", "Events handed to WebSocket clients by outcome", ["outcome"])
+WS_CONNECTIONS = Gauge("ws_connections", "Open /ws connections", multiprocess_mode="livesum")
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """
+    Time a block of code into chat_stage_seconds{stage=...}.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_latest():
+    """
+    Returns (body, content_type) in Prometheus text format, aggregated across
+    workers when running in multiprocess mode.
+    """
+    if _MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    if _MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,124 @@
+# backend/app/password_hashing.py
+"""
+Password hashing off the request threadpool.
+
+argon2 hashing and verification are CPU-bound. They run on a small dedicated
+process pool with a bounded queue, so a burst of logins is rejected quickly
+(503) instead of occupying the threads that serve chat requests.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from app.config import settings
+from app.metrics import HASH_JOBS, HASH_LATENCY, HASH_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+
+class HashPoolBusy(RuntimeError):
+    pass
+
+
+# ---------------- WORKER-SIDE FUNCTIONS (run in child processes) ----------------
+def _warm_worker():
+    from app.db.utils import pwd_context  # noqa: F401  (import once per child)
+
+
+def _hash_in_worker(plain_password: str) -> str:
+    from app.db.utils import hash_password
+    return hash_password(plain_password)
+
+
+def _verify_in_worker(plain_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify and, if the stored hash uses outdated parameters or scheme,
+    return a fresh hash to replace it with.
+    """
+    from app.db.utils import pwd_context
+    return pwd_context.verify_and_update(plain_password, password_hash)
+
+
+# ---------------- POOL ----------------
+class HashPool:
+    def __init__(self, size: int, queue_limit: int):
+        self.size = size
+        self.queue_limit = queue_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "busy_seconds": 0.0, "max_in_flight": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: never fork a process that is already running server threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                )
+            return self._executor
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.size + self.queue_limit:
+                self._stats["rejected"] += 1
+                HASH_JOBS.labels("rejected").inc()
+                raise HashPoolBusy("Password hashing pool is saturated.")
+            self._in_flight += 1
+            self._stats["submitted"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._in_flight)
+        HASH_IN_FLIGHT.inc()
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), fn, *args)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._in_flight -= 1
+                self._stats["completed" if ok else "failed"] += 1
+                self._stats["busy_seconds"] += elapsed
+            HASH_IN_FLIGHT.dec()
+            HASH_JOBS.labels("completed" if ok else "failed").inc()
+            HASH_LATENCY.observe(elapsed)
+
+    async def hash(self, plain_password: str) -> str:
+        return await self._submit(_hash_in_worker, plain_password)
+
+    async def verify(self, plain_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (valid, new_hash). new_hash is set when the stored hash should be upgraded.
+        """
+        return await self._submit(_verify_in_worker, plain_password, password_hash)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "in_flight": self._in_flight, "pool_size": self.size, "queue_limit": self.queue_limit}
+
+    def warm_up(self):
+        """
+        Start the worker processes ahead of the first login.
+        """
+        executor = self._get_executor()
+        for _ in range(self.size):
+            executor.submit(_warm_worker)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hash_pool = HashPool(settings.AUTH_HASH_POOL_SIZE, settings.AUTH_HASH_QUEUE_LIMIT)
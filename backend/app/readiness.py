@@ -0,0 +1,76 @@
+# backend/app/readiness.py
+"""
+Warm-up state of heavy dependencies, reported by /ready.
+
+Startup only schedules the warm-ups; each one runs on its own background
+thread, so the server accepts connections immediately. A request that needs a
+dependency that is still warming loads it on first use. /ready turns 200 once
+every critical component is up; the rest are reported but only degrade the
+features that use them.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+PENDING, WARMING, READY, FAILED = "pending", "warming", "ready", "failed"
+
+
+class Readiness:
+    def __init__(self):
+        self._components: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, warm_up: Callable[[], object], critical: bool = False,
+                 retries: int = 0, retry_delay: float = 5.0):
+        with self._lock:
+            self._components[name] = {
+                "fn": warm_up, "critical": critical, "retries": retries, "retry_delay": retry_delay,
+                "state": PENDING, "error": None, "seconds": None, "attempts": 0,
+            }
+
+    def start(self):
+        """
+        Kick off every registered warm-up on a daemon thread and return immediately.
+        """
+        for name in list(self._components):
+            threading.Thread(target=self._run, args=(name,), name=f"warmup-{name}", daemon=True).start()
+
+    def _run(self, name: str):
+        comp = self._components[name]
+        started = time.perf_counter()
+        while True:
+            with self._lock:
+                comp["state"], comp["attempts"] = WARMING, comp["attempts"] + 1
+            try:
+                comp["fn"]()
+                with self._lock:
+                    comp["state"], comp["error"] = READY, None
+                    comp["seconds"] = round(time.perf_counter() - started, 3)
+                logger.info(f"✅ Warm-up '{name}' ready in {comp['seconds']}s")
+                return
+            except Exception as e:
+                with self._lock:
+                    comp["state"], comp["error"] = FAILED, str(e)
+                if comp["attempts"] > comp["retries"]:
+                    logger.error(f"❌ Warm-up '{name}' failed: {e}")
+                    return
+                logger.warning(f"⚠️ Warm-up '{name}' failed (attempt {comp['attempts']}), retrying: {e}")
+                time.sleep(comp["retry_delay"])
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                name: {k: c[k] for k in ("state", "critical", "seconds", "attempts", "error")}
+                for name, c in self._components.items()
+            }
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(c["state"] == READY for c in self._components.values() if c["critical"])
+
+
+readiness = Readiness()
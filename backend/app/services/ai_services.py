@@ -3,14 +3,19 @@
 import time
 import logging
 import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
 from typing import List, Optional
 from datetime import datetime
 
-import google.generativeai as genai
-import cohere
 from app.config import settings
 from app.prompt_templates import MAIN_SYSTEM_PROMPT
-from app.services.semantic_memory import query_semantic_memory, store_semantic_memory
+from app.services.semantic_memory import store_semantic_memory
+from app.services.retrieval import hybrid_search
+from app.services.provider_health import health, key_target
+from app.services.gemini_key_pool import make_pool, estimate_tokens, is_rate_limit_error
+from app.metrics import LLM_LATENCY, PROVIDER_FAILOVERS, HEDGED_REQUESTS
 
 logger = logging.getLogger(__name__)
 
@@ -18,65 +23,133 @@ logger = logging.getLogger(__name__)
 # 🔹 Initialize AI Clients
 # =====================================================
 gemini_keys = [key.strip() for key in settings.GEMINI_API_KEYS.split(",") if key.strip()]
-current_gemini_key_index = 0
+gemini_key_targets = [key_target("gemini", key) for key in gemini_keys]
+current_gemini_key_index = 0  # round-robin tie-breaker between equally healthy keys
+_gemini_key_lock = threading.Lock()
+gemini_key_pool = make_pool(gemini_key_targets)
 
-cohere_client = None
-if settings.COHERE_API_KEY:
-    try:
-        cohere_client = cohere.Client(settings.COHERE_API_KEY)
-    except Exception as e:
-        logger.error(f"[Cohere] Initialization failed: {e}")
+# One configured model handle per key, built once (model discovery is a network call)
+_gemini_models: dict = {}
+_gemini_model_lock = threading.Lock()
+
+# SDK clients are created on first use (or by warm_up()), keeping import cheap
+_cohere_client = None
+_cohere_lock = threading.Lock()
+
+
+def get_cohere_client():
+    """
+    Lazily build the Cohere client. Returns None if Cohere is not configured.
+    """
+    global _cohere_client
+    if _cohere_client is None and settings.COHERE_API_KEY:
+        with _cohere_lock:
+            if _cohere_client is None:
+                try:
+                    import cohere
+                    _cohere_client = cohere.Client(settings.COHERE_API_KEY)
+                except Exception as e:
+                    logger.error(f"[Cohere] Initialization failed: {e}")
+    return _cohere_client
 
-FAILED_PROVIDERS: dict[str, float] = {}
 AI_PROVIDERS = ["gemini", "cohere"]
 
 # =====================================================
-# 🔹 Provider Availability
+# 🔹 Provider Availability (shared circuit breakers)
 # =====================================================
 def _is_provider_available(name: str) -> bool:
-    failure_time = FAILED_PROVIDERS.get(name)
-    if failure_time and (time.time() - failure_time) < settings.AI_PROVIDER_FAILURE_TIMEOUT:
-        logger.warning(f"[AI] Provider '{name}' in cooldown. Skipping.")
+    if not health.allow(name):
+        logger.warning(f"[AI] Provider '{name}' circuit open. Skipping.")
         return False
     return True
 
 # =====================================================
 # 🔹 Gemini Helper
 # =====================================================
-def _try_gemini(prompt: str) -> str:
+def _gemini_key_order() -> List[int]:
     """
-    Attempt to generate a response using Google Gemini.
-    Cycles through available API keys if one fails.
+    Key indexes to try, healthiest first. The rotation index only breaks ties,
+    so load spreads across keys that are equally healthy.
     """
     global current_gemini_key_index
+    with _gemini_key_lock:
+        start = current_gemini_key_index
+        current_gemini_key_index = (current_gemini_key_index + 1) % len(gemini_keys)
+    rotated = [(start + i) % len(gemini_keys) for i in range(len(gemini_keys))]
+    by_target = {gemini_key_targets[i]: i for i in rotated}
+    return [by_target[t] for t in health.rank_keys([gemini_key_targets[i] for i in rotated])]
+
+
+def _gemini_model(key_index: int):
+    model = _gemini_models.get(key_index)
+    if model is not None:
+        return model
+    with _gemini_model_lock:
+        if key_index in _gemini_models:
+            return _gemini_models[key_index]
+        import google.generativeai as genai
+        from google.generativeai import client as genai_client
+
+        genai.configure(api_key=gemini_keys[key_index])
+
+        # Pick best available model (API returns names like "models/gemini-2.5-flash")
+        available_models = {m.name.split("/")[-1] for m in genai.list_models()}
+        preferred_models = [settings.GEMINI_MODEL, "gemini-2.5-flash", "gemini-2.5", "gemini-1.5-flash"]
+        selected_model = next((m for m in preferred_models if m in available_models), None)
+
+        if not selected_model:
+            raise RuntimeError("No supported Gemini models found for this key.")
+
+        model = genai.GenerativeModel(selected_model)
+        # genai.configure() is process-global: bind this key's client to the model
+        # now so concurrent calls on other keys cannot swap it underneath us.
+        # google-generativeai has no public per-key client, so this sets the model's
+        # private _client (present in the pinned 0.8.x, see requirements.txt); fail
+        # loudly rather than silently share one key if an upgrade drops it.
+        if not hasattr(model, "_client"):
+            raise RuntimeError("google-generativeai no longer has GenerativeModel._client; per-key Gemini clients need updating")
+        model._client = genai_client.get_default_generative_client()
+        _gemini_models[key_index] = model
+        return model
 
+
+def _try_gemini(prompt: str) -> str:
+    """
+    Attempt to generate a response using Google Gemini.
+    Each attempt takes the least-loaded healthy key that still has quota
+    (waiting briefly if all are saturated) and moves on to another key if it fails.
+    """
     if not gemini_keys:
         raise RuntimeError("No Gemini API keys configured.")
 
-    start_index = current_gemini_key_index
-
+    need = estimate_tokens(prompt)
+    tried = set()
     while True:
-        try:
-            key = gemini_keys[current_gemini_key_index]
-            genai.configure(api_key=key)
-
-            # Pick best available model
-            available_models = [m.name for m in genai.list_models()]
-            preferred_models = ["gemini-2.5-flash", "gemini-2.5", "gemini-1.5-flash"]
-            selected_model = next((m for m in preferred_models if m in available_models), None)
-
-            if not selected_model:
-                raise RuntimeError("No supported Gemini models found for this key.")
+        candidates = [gemini_key_targets[i] for i in _gemini_key_order() if gemini_key_targets[i] not in tried]
+        if not candidates:
+            raise RuntimeError("All Gemini API keys failed.")
+
+        target = gemini_key_pool.acquire(need, candidates)
+        tried.add(target)
+        key_index = gemini_key_targets.index(target)
+        if not health.allow(target):
+            gemini_key_pool.release(target, need)  # circuit open: the call is never sent
+            continue
 
-            model = genai.GenerativeModel(selected_model)
-            response = model.generate_content(prompt)
-            return response.text.strip()
+        started = time.monotonic()
+        try:
+            response = _gemini_model(key_index).generate_content(prompt)
+            text = response.text.strip()
+            health.record(target, True, time.monotonic() - started)
+            usage = getattr(response, "usage_metadata", None)
+            gemini_key_pool.settle(target, need, getattr(usage, "total_token_count", None))
+            return text
 
         except Exception as e:
-            logger.error(f"[Gemini] API key {current_gemini_key_index} failed: {e}")
-            current_gemini_key_index = (current_gemini_key_index + 1) % len(gemini_keys)
-            if current_gemini_key_index == start_index:
-                raise RuntimeError("All Gemini API keys failed.")
+            health.record(target, False)
+            if is_rate_limit_error(e):
+                gemini_key_pool.mark_exhausted(target)
+            logger.error(f"[Gemini] API key {key_index} failed: {e}")
 
 # =====================================================
 # 🔹 Cohere Helper
@@ -85,6 +158,7 @@ def _try_cohere(prompt: str) -> str:
     """
     Attempt to generate a response using Cohere's Command-R model.
     """
+    cohere_client = get_cohere_client()
     if not cohere_client:
         raise RuntimeError("Cohere API client not configured.")
     try:
@@ -93,6 +167,181 @@ def _try_cohere(prompt: str) -> str:
     except Exception as e:
         raise RuntimeError(f"Cohere API error: {e}")
 
+# =====================================================
+# 🔹 Provider Dispatch (sequential + hedged)
+# =====================================================
+_PROVIDER_CALLS = {
+    "gemini": lambda prompt: _try_gemini(prompt),
+    "cohere": lambda prompt: _try_cohere(prompt),
+}
+
+# Calls that may hedge run on their own pool so a slow provider never blocks the caller's thread.
+# Room for every concurrent LLM call plus as many hedges, and losers that finish after being cancelled.
+_hedge_executor = ThreadPoolExecutor(max_workers=2 * settings.BULKHEAD_LLM_SIZE, thread_name_prefix="ai-hedge")
+_hedge_lock = threading.Lock()
+_primary_latencies: deque = deque(maxlen=200)  # seconds, successful primary calls only
+_HEDGE_MIN_SAMPLES = 20
+_HEDGE_BUDGET_CAP = 10.0
+_hedge_tokens = _HEDGE_BUDGET_CAP
+
+
+def _call_provider(provider: str, prompt: str) -> str:
+    """
+    Run one provider call and feed its outcome into the shared health state.
+    """
+    started = time.monotonic()
+    try:
+        result = _PROVIDER_CALLS[provider](prompt)
+    except Exception:
+        LLM_LATENCY.labels(provider, "error").observe(time.monotonic() - started)
+        health.record(provider, False)
+        raise
+    LLM_LATENCY.labels(provider, "ok").observe(time.monotonic() - started)
+    health.record(provider, True, time.monotonic() - started)
+    return result
+
+
+def _log_failure(provider: str, error: Exception):
+    logger.error(f"[AI] Provider '{provider}' failed: {error}")
+    PROVIDER_FAILOVERS.labels(provider).inc()
+
+
+def _hedge_delay() -> float:
+    """
+    Delay before the secondary provider is fired: the configured value,
+    or the observed p90 of successful primary calls.
+    """
+    if settings.AI_HEDGE_DELAY_SECONDS > 0:
+        return settings.AI_HEDGE_DELAY_SECONDS
+    with _hedge_lock:
+        samples = sorted(_primary_latencies)
+    if len(samples) < _HEDGE_MIN_SAMPLES:
+        return settings.AI_HEDGE_FALLBACK_DELAY_SECONDS
+    return samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+
+
+def _earn_hedge_budget():
+    # Every request earns a fraction of a hedge; this caps hedges at AI_HEDGE_BUDGET_RATIO of traffic
+    global _hedge_tokens
+    with _hedge_lock:
+        _hedge_tokens = min(_HEDGE_BUDGET_CAP, _hedge_tokens + settings.AI_HEDGE_BUDGET_RATIO)
+
+
+def _hedge_budget_left() -> bool:
+    with _hedge_lock:
+        return _hedge_tokens >= 1.0
+
+
+def _take_hedge_token() -> bool:
+    global _hedge_tokens
+    with _hedge_lock:
+        if _hedge_tokens >= 1.0:
+            _hedge_tokens -= 1.0
+            return True
+        return False
+
+
+def _generate_sequential(prompt: str, providers: List[str]) -> Optional[str]:
+    for provider in providers:
+        if not _is_provider_available(provider):
+            continue
+        try:
+            return _call_provider(provider, prompt)
+        except Exception as e:
+            _log_failure(provider, e)
+    return None
+
+
+def _generate_hedged(prompt: str, primary: str, secondary: str, rest: List[str]) -> Optional[str]:
+    """
+    Start the primary provider; if it has not answered within the hedge delay,
+    also start the secondary. The first successful answer wins and the other
+    call is cancelled (or, if already running, its result is discarded).
+    """
+    if not _is_provider_available(primary):
+        return _generate_sequential(prompt, [secondary] + rest)
+    if not (_hedge_budget_left() and _is_provider_available(secondary)):
+        # Cannot hedge anyway: stay on the caller's thread
+        return _generate_sequential(prompt, [primary, secondary] + rest)
+
+    # Delay and latency samples count from when the call starts running, not from when it was queued
+    started = threading.Event()
+    started_at = [0.0]
+
+    def _run_primary():
+        started_at[0] = time.monotonic()
+        started.set()
+        return _call_provider(primary, prompt)
+
+    def _record_primary_latency(fut):
+        if not fut.cancelled() and fut.exception() is None:
+            with _hedge_lock:
+                _primary_latencies.append(time.monotonic() - started_at[0])
+
+    primary_future = _hedge_executor.submit(_run_primary)
+    primary_future.add_done_callback(_record_primary_latency)
+
+    # A pool too busy to start the primary within the hedge delay would only add queueing to the call
+    if not started.wait(timeout=_hedge_delay()) and primary_future.cancel():
+        logger.warning(f"[AI] Hedge pool busy; calling '{primary}' on the request thread")
+        return _generate_sequential(prompt, [primary, secondary] + rest)
+    started.wait()  # cancel() failed, so the primary is already running
+
+    try:
+        return primary_future.result(timeout=max(0.0, _hedge_delay() - (time.monotonic() - started_at[0])))
+    except FutureTimeoutError:
+        pass
+    except Exception as e:
+        _log_failure(primary, e)
+        return _generate_sequential(prompt, [secondary] + rest)
+
+    if not (_take_hedge_token() and _is_provider_available(secondary)):
+        # No hedge: wait for the primary like the non-hedged path would
+        try:
+            return primary_future.result()
+        except Exception as e:
+            _log_failure(primary, e)
+            return _generate_sequential(prompt, [secondary] + rest)
+
+    logger.info(f"[AI] '{primary}' slower than hedge delay; hedging with '{secondary}'")
+    HEDGED_REQUESTS.labels(secondary).inc()
+    pending = {primary_future: primary, _hedge_executor.submit(_call_provider, secondary, prompt): secondary}
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            provider = pending.pop(fut)
+            try:
+                result = fut.result()
+            except Exception as e:
+                _log_failure(provider, e)
+                continue
+            for loser in pending:
+                loser.cancel()
+            return result
+
+    return _generate_sequential(prompt, rest)
+
+
+def generate_text(prompt: str) -> Optional[str]:
+    """
+    Run a prompt against the providers, healthiest first (priority order among equals).
+    Returns None when every provider failed or has an open circuit.
+    """
+    providers = health.rank(AI_PROVIDERS)
+    if settings.AI_HEDGING_ENABLED and len(providers) >= 2:
+        _earn_hedge_budget()
+        return _generate_hedged(prompt, providers[0], providers[1], providers[2:])
+    return _generate_sequential(prompt, providers)
+
+
+def warm_up():
+    """
+    Build provider clients ahead of the first chat turn (run in the background at startup).
+    """
+    get_cohere_client()
+    if gemini_keys:
+        _gemini_model(0)
+
 # =====================================================
 # 🔹 Main AI Response Generator (Personalized)
 # =====================================================
@@ -113,7 +362,7 @@ def get_response(
     # 🧠 Retrieve prior context from semantic memory if not already passed
     if pinecone_context is None:
         try:
-            matches = query_semantic_memory(user_id, user_text, top_k=5)
+            matches = hybrid_search(user_id, user_text, top_k=5)
             pinecone_context = "\n".join(
                 f"• {m['metadata'].get('text', '')}" for m in matches if m.get("metadata")
             ) or "No similar conversations found."
@@ -158,21 +407,10 @@ def get_response(
 
     logger.debug(f"[AI] Final prompt prepared for {user_id}:\n{full_prompt}")
 
-    # 🔄 Try available providers (Gemini → Cohere)
-    for provider in AI_PROVIDERS:
-        if not _is_provider_available(provider):
-            continue
-        try:
-            if provider == "gemini":
-                result = _try_gemini(full_prompt)
-            elif provider == "cohere":
-                result = _try_cohere(full_prompt)
-
-            FAILED_PROVIDERS.pop(provider, None)
-            return result
-        except Exception as e:
-            logger.error(f"[AI] Provider '{provider}' failed: {e}")
-            FAILED_PROVIDERS[provider] = time.time()
+    # 🔄 Try available providers (Gemini → Cohere), hedged if enabled
+    result = generate_text(full_prompt)
+    if result is not None:
+        return result
 
     return "❌ All AI providers are currently unavailable. Please try again later."
 
@@ -187,41 +425,50 @@ def summarize_text(text: str) -> str:
         "You are a summarization engine. Summarize the following conversation:\n\n"
         f"---\n{text}\n---\n\nSummary:"
     )
-    for provider in AI_PROVIDERS:
-        if not _is_provider_available(provider):
-            continue
-        try:
-            if provider == "gemini":
-                return _try_gemini(summary_prompt)
-            elif provider == "cohere":
-                return _try_cohere(summary_prompt)
-        except Exception as e:
-            logger.error(f"[AI] Summarization failed ({provider}): {e}")
-            FAILED_PROVIDERS[provider] = time.time()
+    result = generate_text(summary_prompt)
+    if result is not None:
+        return result
     return "❌ Failed to summarize. All AI providers unavailable."
 
 # =====================================================
 # 🔹 Fact Extraction Utility
 # =====================================================
-def extract_facts_from_text(text: str) -> dict:
+def extract_knowledge(text: str) -> dict:
     """
-    Extract entities and relationships from text for storing in Neo4j.
+    Entities and relationships stated in a conversation excerpt, in one LLM call (same
+    provider failover and quotas as chat). Source "user" means the person chatting.
+    Returns {"entities": [{"name", "type"}], "relationships": [{"source", "relation", "target"}]}.
+    Raises when no provider answered or the reply is not JSON, so the caller can retry later.
     """
     extraction_prompt = f"""
-    Extract entities and relationships in JSON.
-    Return ONLY valid JSON.
+    Extract a knowledge graph from the conversation below.
+    Return ONLY valid JSON of the form:
+    {{"entities": [{{"name": "...", "type": "person|place|organization|project|preference|other"}}],
+     "relationships": [{{"source": "...", "relation": "...", "target": "..."}}]}}
+    Use "user" as the source for anything about the person chatting (name, work, home, likes, plans, people they know).
+    Relations are short snake_case verbs such as works_at, lives_in, likes, sister_of.
+    Only include what the text states; skip small talk, questions and the assistant's own suggestions.
     If nothing found, return {{"entities": [], "relationships": []}}.
 
-    Text:
+    Conversation:
     ---{text}---
     """
+    raw_response = generate_text(extraction_prompt)
+    if raw_response is None:
+        raise RuntimeError("No LLM provider available for extraction")
+    start = raw_response.find("{")
+    end = raw_response.rfind("}")
+    if start == -1 or end == -1:
+        raise ValueError("Extraction reply contains no JSON object")
+    return json.loads(raw_response[start:end + 1])
+
+
+def extract_facts_from_text(text: str) -> dict:
+    """
+    Extract entities and relationships from text for storing in Neo4j (never raises).
+    """
     try:
-        raw_response = _try_gemini(extraction_prompt)
-        start = raw_response.find("{")
-        end = raw_response.rfind("}")
-        if start != -1 and end != -1:
-            return json.loads(raw_response[start:end + 1])
-        return {"entities": [], "relationships": []}
+        return extract_knowledge(text)
     except Exception as e:
         logger.error(f"[AI] Fact extraction failed: {e}")
         return {"entities": [], "relationships": []}
@@ -3,7 +3,8 @@ import logging
 from typing import List, Optional
 
 from app.services import ai_services
-from app.services.semantic_memory import query_semantic_memory, store_semantic_memory
+from app.services.semantic_memory import store_semantic_memory
+from app.services.retrieval import hybrid_search
 from app.services.memory import get_all_user_facts, save_user_fact
 
 logger = logging.getLogger(__name__)
@@ -23,14 +24,14 @@ def build_context_from_matches(matches: List[dict], max_chars: int = 800) -> str
 def manage_dialogue(user_message: str, history: Optional[List[dict]] = None, user_id: Optional[str] = "anonymous") -> str:
     """
     Main conversation entrypoint:
-    - Uses Pinecone for semantic memory
+    - Uses Pinecone semantic memory + chat_history full-text search (hybrid recall)
     - Loads Neo4j personalization facts
     - Stores new facts if detected (like "my name is ...")
     - Generates response using AI service
     """
     try:
-        # 1️⃣ Get similar memory from Pinecone
-        matches = query_semantic_memory(user_id=user_id, query=user_message, top_k=5)
+        # 1️⃣ Get similar memory (Pinecone + Postgres full-text, fused)
+        matches = hybrid_search(user_id=user_id, query=user_message, top_k=5)
         pinecone_context = build_context_from_matches(matches)
 
         # 2️⃣ Detect if user is telling their name
@@ -3,49 +3,126 @@
 Embedding utility. Primary method: local sentence-transformers model 'all-MiniLM-L6-v2'.
 Fallback: Cohere (if configured) embeddings.
 This module exposes get_embedding(text: str) -> List[float] and get_batch_embeddings(list[str]).
+
+EMBEDDING_BACKEND selects how the local model runs (see app/embedding_models.py):
+- "torch" (default): SentenceTransformer on PyTorch
+- "onnx": the same model exported and int8-quantized for onnxruntime
+  (see app/tools/export_onnx_embedder.py); much lighter on CPU-only hosts
+
+If EMBEDDING_SOCKET_PATH is set, no model is loaded in this process: encode
+calls go to the shared embedding server (app/embedding_server.py)
+over that Unix socket, so a host runs one model however many workers it has.
+
+Nothing heavy happens at import: the model is loaded on first use, or ahead of
+time by warm_up() from the startup readiness tasks.
 """
 
+import json
 import logging
 import os
-from typing import List
+import socket
+import threading
+from typing import Callable, List, Optional
+
+from app.embedding_models import EMBEDDING_SOCKET_PATH, FRAME_HEADER, load_local_encoder
+
 logger = logging.getLogger(__name__)
 
-# Try local sentence-transformers first (recommended for 'all-MiniLM-L6-v2')
-try:
-    from sentence_transformers import SentenceTransformer
-    _SENTENCE_MODEL_NAME = os.getenv("SENTENCE_MODEL_NAME", "all-MiniLM-L6-v2")
-    _s_model = SentenceTransformer(_SENTENCE_MODEL_NAME)
-    logger.info("Loaded local SentenceTransformer model: %s", _SENTENCE_MODEL_NAME)
-
-    def get_embedding(text: str) -> List[float]:
-        vec = _s_model.encode(text, show_progress_bar=False, convert_to_numpy=True)
-        return vec.tolist()
-
-    def get_batch_embeddings(texts: List[str]) -> List[List[float]]:
-        vecs = _s_model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
-        return [v.tolist() for v in vecs]
-
-except Exception as e:
-    logger.warning("SentenceTransformers not available or failed to load: %s. Falling back to Cohere if available.", e)
-    _s_model = None
-
-    # fallback to Cohere if cohere client exists
-    try:
-        from app.services.ai_services import cohere_client
-        if cohere_client is None:
-            raise RuntimeError("Cohere client not configured")
-        def get_embedding(text: str):
-            resp = cohere_client.embed(texts=[text], model="embed-english-v2.0")
-            return resp.embeddings[0]
-
-        def get_batch_embeddings(texts: List[str]):
-            resp = cohere_client.embed(texts=texts, model="embed-english-v2.0")
-            return resp.embeddings
-        logger.info("Using Cohere embeddings as fallback.")
-    except Exception as ex:
-        logger.error("No embedding provider available. Install sentence-transformers or configure Cohere. %s", ex)
-        def get_embedding(text: str):
-            raise RuntimeError("No embedding provider available. Install sentence-transformers or configure Cohere.")
-
-        def get_batch_embeddings(texts: List[str]):
-            raise RuntimeError("No embedding provider available. Install sentence-transformers or configure Cohere.")
+_SOCKET_TIMEOUT = float(os.getenv("EMBEDDING_SOCKET_TIMEOUT", "10"))  # connect, and base wait for a reply
+_SOCKET_TIMEOUT_PER_TEXT = float(os.getenv("EMBEDDING_SOCKET_TIMEOUT_PER_TEXT", "0.05"))  # added per text encoded
+
+_encoder: Callable[[List[str]], List[List[float]]] = None
+_encoder_lock = threading.Lock()
+
+
+# ---------------- SHARED SERVER CLIENT ----------------
+_conn = threading.local()
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("embedding server closed the connection")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _drop_connection(sock: Optional[socket.socket]):
+    _conn.sock = None
+    if sock is not None:
+        sock.close()
+
+
+def _server_request(payload: dict) -> dict:
+    """
+    One request/response round trip to the embedding server. Each thread keeps its
+    own connection. Only a request that never got out (connect failed, or a kept
+    connection had been closed) is retried; once sent, a failure or timeout is raised
+    rather than making the server encode the batch twice.
+    The reply wait grows with the number of texts.
+    """
+    body = json.dumps(payload).encode()
+    timeout = _SOCKET_TIMEOUT + _SOCKET_TIMEOUT_PER_TEXT * len(payload.get("texts") or ())
+    for attempt in (1, 2):
+        sock = getattr(_conn, "sock", None)
+        sent = False
+        try:
+            if sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(_SOCKET_TIMEOUT)
+                sock.connect(EMBEDDING_SOCKET_PATH)
+                _conn.sock = sock
+            sock.settimeout(timeout)
+            sock.sendall(FRAME_HEADER.pack(len(body)) + body)
+            sent = True
+            (size,) = FRAME_HEADER.unpack(_recv_exactly(sock, FRAME_HEADER.size))
+            resp = json.loads(_recv_exactly(sock, size))
+            break
+        except OSError:
+            _drop_connection(sock)
+            if sent or attempt == 2:
+                raise
+    if "error" in resp:
+        raise RuntimeError(f"Embedding server error: {resp['error']}")
+    return resp
+
+
+def _server_encode(texts: List[str]) -> List[List[float]]:
+    return _server_request({"texts": texts})["embeddings"]
+
+
+# ---------------- ENCODER SELECTION ----------------
+def _load_encoder() -> Callable[[List[str]], List[List[float]]]:
+    if EMBEDDING_SOCKET_PATH:
+        logger.info("Using shared embedding server at %s", EMBEDDING_SOCKET_PATH)
+        return _server_encode
+    return load_local_encoder()
+
+
+def _get_encoder() -> Callable[[List[str]], List[List[float]]]:
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = _load_encoder()
+    return _encoder
+
+
+def get_embedding(text: str) -> List[float]:
+    return _get_encoder()([text])[0]
+
+
+def get_batch_embeddings(texts: List[str]) -> List[List[float]]:
+    return _get_encoder()(texts)
+
+
+def warm_up():
+    """
+    Load the model now (called in the background at startup). With a shared
+    server, check that it is up instead.
+    """
+    _get_encoder()
+    if EMBEDDING_SOCKET_PATH:
+        _server_request({"ping": True})
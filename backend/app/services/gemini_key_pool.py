@@ -0,0 +1,212 @@
+# backend/app/services/gemini_key_pool.py
+"""
+Gemini API key pool with per-key token buckets.
+
+Every key has two buckets, requests-per-minute and tokens-per-minute, kept in
+Redis so all API workers and Celery processes draw from the same quota. A
+request is given the least-loaded key that still has capacity; when every key
+is saturated the caller waits (up to GEMINI_KEY_QUEUE_SECONDS) for a refill
+instead of sending a call that would come back as a 429.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.db.redis_utils import state_client
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "gemini_bucket"
+_BUCKET_TTL = 3600
+_REDIS_RETRY_AFTER = 5.0
+
+# KEYS = bucket hashes (one per candidate key, in preference order)
+# ARGV = now, rpm, tpm, tokens_needed, ttl
+# Returns {chosen 1-based index or 0, milliseconds until some key has capacity}
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rpm = tonumber(ARGV[2])
+local tpm = tonumber(ARGV[3])
+local need = tonumber(ARGV[4])
+local best, best_free, best_req, best_tok = 0, -1, 0, 0
+local min_wait = 60.0
+for i, h in ipairs(KEYS) do
+    local ts = tonumber(redis.call('HGET', h, 'ts') or ARGV[1])
+    local req = tonumber(redis.call('HGET', h, 'req') or ARGV[2])
+    local tok = tonumber(redis.call('HGET', h, 'tok') or ARGV[3])
+    local elapsed = math.max(0, now - ts)
+    req = math.min(rpm, req + elapsed * rpm / 60.0)
+    tok = math.min(tpm, tok + elapsed * tpm / 60.0)
+    if req >= 1 and tok >= need then
+        local free = math.min(req / rpm, tok / tpm)
+        if free > best_free then
+            best, best_free, best_req, best_tok = i, free, req, tok
+        end
+    else
+        local wait_req = math.max(0, (1 - req) * 60.0 / rpm)
+        local wait_tok = math.max(0, (need - tok) * 60.0 / tpm)
+        min_wait = math.min(min_wait, math.max(wait_req, wait_tok))
+    end
+end
+if best > 0 then
+    local h = KEYS[best]
+    redis.call('HSET', h, 'ts', now, 'req', best_req - 1, 'tok', best_tok - need)
+    redis.call('EXPIRE', h, tonumber(ARGV[5]))
+    return {best, 0}
+end
+return {0, math.ceil(min_wait * 1000)}
+"""
+
+# KEYS[1] = bucket hash; ARGV = token delta (may be negative), drain flag, ttl, now, tpm, request delta
+# A drain empties the request bucket as of now (tokens are refilled up to now first),
+# so the next acquire cannot credit back the refill since the previous timestamp.
+_ADJUST_SCRIPT = """
+local h = KEYS[1]
+if tonumber(ARGV[2]) == 1 then
+    local now = tonumber(ARGV[4])
+    local tpm = tonumber(ARGV[5])
+    local ts = tonumber(redis.call('HGET', h, 'ts') or ARGV[4])
+    local tok = tonumber(redis.call('HGET', h, 'tok') or ARGV[5])
+    tok = math.min(tpm, tok + math.max(0, now - ts) * tpm / 60.0)
+    redis.call('HSET', h, 'ts', now, 'req', 0, 'tok', tok)
+end
+if redis.call('EXISTS', h) == 1 then
+    redis.call('HINCRBYFLOAT', h, 'tok', ARGV[1])
+    redis.call('HINCRBYFLOAT', h, 'req', ARGV[6])
+    redis.call('EXPIRE', h, tonumber(ARGV[3]))
+end
+return 1
+"""
+
+
+def estimate_tokens(prompt: str) -> int:
+    """
+    Rough token estimate for quota purposes (~4 characters per token) plus expected output.
+    """
+    return len(prompt) // 4 + settings.GEMINI_EXPECTED_OUTPUT_TOKENS
+
+
+class KeyPoolSaturated(RuntimeError):
+    pass
+
+
+class GeminiKeyPool:
+    def __init__(self, key_ids: List[str], redis_client=None):
+        self.key_ids = key_ids
+        self._redis = redis_client
+        self._acquire = redis_client.register_script(_ACQUIRE_SCRIPT) if redis_client else None
+        self._adjust = redis_client.register_script(_ADJUST_SCRIPT) if redis_client else None
+        self._local: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._redis_down_until = 0.0
+
+    def _use_redis(self) -> bool:
+        return self._redis is not None and time.time() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception):
+        logger.warning(f"[KeyPool] Redis unavailable, using local buckets: {e}")
+        self._redis_down_until = time.time() + _REDIS_RETRY_AFTER
+
+    def _try_acquire(self, candidates: List[str], need: int) -> Tuple[Optional[str], float]:
+        now = time.time()
+        rpm, tpm = settings.GEMINI_KEY_RPM, settings.GEMINI_KEY_TPM
+        if self._use_redis():
+            try:
+                idx, wait_ms = self._acquire(
+                    keys=[f"{_KEY_PREFIX}:{k}" for k in candidates],
+                    args=[now, rpm, tpm, need, _BUCKET_TTL],
+                )
+                return (candidates[int(idx) - 1] if int(idx) else None), int(wait_ms) / 1000.0
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            best, best_free, min_wait = None, -1.0, 60.0
+            for k in candidates:
+                b = self._local.setdefault(k, {"ts": now, "req": float(rpm), "tok": float(tpm)})
+                elapsed = max(0.0, now - b["ts"])
+                b["req"] = min(rpm, b["req"] + elapsed * rpm / 60.0)
+                b["tok"] = min(tpm, b["tok"] + elapsed * tpm / 60.0)
+                b["ts"] = now
+                if b["req"] >= 1 and b["tok"] >= need:
+                    free = min(b["req"] / rpm, b["tok"] / tpm)
+                    if free > best_free:
+                        best, best_free = k, free
+                else:
+                    wait_req = max(0.0, (1 - b["req"]) * 60.0 / rpm)
+                    wait_tok = max(0.0, (need - b["tok"]) * 60.0 / tpm)
+                    min_wait = min(min_wait, max(wait_req, wait_tok))
+            if best is None:
+                return None, min_wait
+            self._local[best]["req"] -= 1
+            self._local[best]["tok"] -= need
+            return best, 0.0
+
+    def acquire(self, need: int, candidates: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """
+        Reserve one request and `need` tokens on the least-loaded candidate key.
+        Blocks up to `timeout` seconds while every candidate is saturated, then
+        raises KeyPoolSaturated.
+        """
+        candidates = candidates if candidates is not None else self.key_ids
+        if not candidates:
+            raise KeyPoolSaturated("No Gemini keys available.")
+        timeout = settings.GEMINI_KEY_QUEUE_SECONDS if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            key_id, wait = self._try_acquire(candidates, need)
+            if key_id:
+                return key_id
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or wait > remaining:
+                raise KeyPoolSaturated(f"All Gemini keys saturated (next capacity in {wait:.1f}s).")
+            time.sleep(max(0.05, wait))
+
+    def settle(self, key_id: str, estimated: int, actual: Optional[int]):
+        """
+        Correct the token bucket once the real usage of a call is known.
+        """
+        if actual is None:
+            return
+        self._adjust_bucket(key_id, estimated - actual, drain=False)
+
+    def release(self, key_id: str, need: int):
+        """
+        Hand back a reservation that was never used (the call was not sent).
+        """
+        self._adjust_bucket(key_id, need, drain=False, requests=1)
+
+    def mark_exhausted(self, key_id: str):
+        """
+        The API answered 429: treat this key's request bucket as empty.
+        """
+        self._adjust_bucket(key_id, 0, drain=True)
+
+    def _adjust_bucket(self, key_id: str, token_delta: float, drain: bool, requests: int = 0):
+        now, tpm = time.time(), settings.GEMINI_KEY_TPM
+        if self._use_redis():
+            try:
+                self._adjust(keys=[f"{_KEY_PREFIX}:{key_id}"],
+                             args=[token_delta, 1 if drain else 0, _BUCKET_TTL, now, tpm, requests])
+                return
+            except Exception as e:
+                self._redis_failed(e)
+        with self._lock:
+            b = self._local.get(key_id)
+            if b:
+                if drain:
+                    b["tok"] = min(tpm, b["tok"] + max(0.0, now - b["ts"]) * tpm / 60.0)
+                    b["ts"], b["req"] = now, 0.0
+                b["tok"] += token_delta
+                b["req"] += requests
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    return type(e).__name__ in ("ResourceExhausted", "TooManyRequests") or "429" in str(e)
+
+
+def make_pool(key_ids: List[str]) -> GeminiKeyPool:
+    return GeminiKeyPool(key_ids, state_client)
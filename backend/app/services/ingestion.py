@@ -0,0 +1,263 @@
+# backend/app/services/ingestion.py
+"""
+Document ingestion for /chat-with-upload/.
+
+The upload is copied in small reads into a spooled temp file (memory up to
+UPLOAD_SPOOL_BYTES, disk beyond, hard cap UPLOAD_MAX_BYTES), then streamed
+through: text extraction (decoded incrementally, PDFs page by page) → chunking
+with overlap → batch embedding → store_many into the user's semantic memory,
+tagged with a doc_id. Only one batch of chunks is in memory at a time.
+
+While batches stream past, the few chunks most similar to the user's prompt
+are kept (a bounded heap), and the answer is built from those after MMR
+reranking, so it never waits on the vector index to catch up with the writes.
+"""
+
+import codecs
+import heapq
+import itertools
+import logging
+import os
+import tempfile
+import uuid
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from fastapi import UploadFile
+
+from app.config import settings
+from app.metrics import observe_stage
+from app.services.embeddings import get_batch_embeddings, get_embedding
+from app.services.rerank import rerank
+from app.services.semantic_memory import store_many
+
+logger = logging.getLogger(__name__)
+
+_READ_SIZE = 64 * 1024
+_TEXT_EXTENSIONS = {".txt", ".md", ".markdown", ".rst", ".csv", ".tsv", ".json", ".log", ".yaml", ".yml", ".xml", ".html"}
+_CANDIDATES_KEPT = 20  # best-matching chunks kept for the answer
+
+
+class IngestionError(Exception):
+    status_code = 422
+
+
+class UploadTooLarge(IngestionError):
+    status_code = 413
+
+
+class UnsupportedDocument(IngestionError):
+    status_code = 415
+
+
+# ---------------- UPLOAD ----------------
+async def _copy_upload(upload: UploadFile, dest: IO[bytes], max_bytes: Optional[int]) -> int:
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLarge(f"File is larger than {max_bytes // (1024 * 1024)} MB")
+    total = 0
+    while True:
+        chunk = await upload.read(_READ_SIZE)
+        if not chunk:
+            return total
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLarge(f"File is larger than {max_bytes // (1024 * 1024)} MB")
+        dest.write(chunk)
+
+
+async def spool_upload(upload: UploadFile, max_bytes: Optional[int] = None) -> IO[bytes]:
+    """
+    Copy the upload into a SpooledTemporaryFile, failing fast once it exceeds max_bytes.
+    The caller closes the returned file.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_BYTES)
+    try:
+        await _copy_upload(upload, spool, max_bytes)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def save_upload(upload: UploadFile, path: str, max_bytes: Optional[int] = None) -> int:
+    """
+    Stream the upload to a file (e.g. in the directory shared with the job workers).
+    Returns the size; nothing is left behind if it is rejected.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        with open(path, "wb") as f:
+            return await _copy_upload(upload, f, max_bytes)
+    except BaseException:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+
+
+def detect_kind(filename: Optional[str], content_type: Optional[str], head: bytes) -> str:
+    """
+    'pdf' or 'text'; anything else is rejected.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    if head.startswith(b"%PDF-") or content_type == "application/pdf" or ext == ".pdf":
+        return "pdf"
+    if ext in _TEXT_EXTENSIONS or (content_type or "").startswith("text/") or content_type == "application/json":
+        return "text"
+    raise UnsupportedDocument(f"Unsupported file type: {content_type or ext or 'unknown'} (upload text or PDF)")
+
+
+# ---------------- EXTRACTION ----------------
+def iter_text(stream: IO[bytes], kind: str) -> Iterator[str]:
+    if kind == "pdf":
+        yield from _iter_pdf(stream)
+        return
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = stream.read(_READ_SIZE)
+        if not chunk:
+            break
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def _iter_pdf(stream: IO[bytes]) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedDocument("PDF support is not installed on this server")
+    try:
+        reader = PdfReader(stream)
+        pages = reader.pages
+    except Exception as e:
+        raise IngestionError(f"Could not read PDF: {e}")
+    for page in pages:
+        try:
+            yield (page.extract_text() or "") + "\n\n"
+        except Exception as e:
+            logger.warning(f"⚠️ Skipping unreadable PDF page: {e}")
+
+
+# ---------------- CHUNKING ----------------
+def _cut_point(buffer: str, size: int) -> int:
+    # Prefer paragraph, line, sentence, then word boundaries in the second half of the window
+    for sep in ("\n\n", "\n", ". ", " "):
+        idx = buffer.rfind(sep, size // 2, size)
+        if idx != -1:
+            return idx + len(sep)
+    return size
+
+
+def iter_chunks(pieces: Iterable[str], size: int, overlap: int) -> Iterator[str]:
+    """
+    Re-chunk a stream of text pieces into ~size-character chunks that overlap by ~overlap characters.
+    """
+    overlap = min(overlap, size // 4)
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= size:
+            cut = _cut_point(buffer, size)
+            chunk = " ".join(buffer[:cut].split())
+            if chunk:
+                yield chunk
+            start = buffer.find(" ", cut - overlap, cut)
+            buffer = buffer[(start + 1) if start != -1 else cut - overlap:]
+    chunk = " ".join(buffer.split())
+    if chunk:
+        yield chunk
+
+
+# ---------------- PIPELINE ----------------
+def ingest_document(
+    user_id: str,
+    stream: IO[bytes],
+    filename: Optional[str],
+    content_type: Optional[str],
+    query: Optional[str] = None,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Extract, chunk, embed and store a spooled upload. With a query, also returns the
+    chunks most relevant to it ('matches', reranked). progress(chunks_stored_so_far)
+    is called after every batch. Blocking; run in a thread.
+    """
+    head = stream.read(8)
+    stream.seek(0)
+    kind = detect_kind(filename, content_type, head)
+    doc_id = uuid.uuid4().hex
+    size, overlap = settings.UPLOAD_CHUNK_CHARS, settings.UPLOAD_CHUNK_OVERLAP
+
+    query_vec = None
+    if query:
+        with observe_stage("embedding"):
+            query_vec = np.asarray(get_embedding(query), dtype=np.float32)
+            query_vec /= (np.linalg.norm(query_vec) or 1.0)
+    best: List[tuple] = []  # min-heap of (similarity, seq, candidate)
+    seq = itertools.count()
+    stats = {"chunks": 0, "stored": 0, "truncated": False}
+
+    def flush(batch: List[str], first_index: int):
+        with observe_stage("embedding"):
+            vectors = get_batch_embeddings(batch)
+        metadatas = [
+            {"source": "upload", "doc_id": doc_id, "filename": filename or "document", "chunk": first_index + i}
+            for i in range(len(batch))
+        ]
+        res = store_many(user_id, batch, metadatas, embeddings=vectors, scope=doc_id)
+        if not res.get("ok"):
+            raise RuntimeError(f"Storing document chunks failed: {res.get('error', 'upsert failed')}")
+        stats["stored"] += res.get("stored", 0)
+        if progress:
+            progress(first_index + len(batch))
+        if query_vec is None:
+            return
+        mat = np.asarray(vectors, dtype=np.float32)
+        sims = (mat @ query_vec) / np.clip(np.linalg.norm(mat, axis=1), 1e-12, None)
+        for text, vec, meta, sim in zip(batch, vectors, metadatas, sims):
+            item = (float(sim), next(seq), {"id": f"{doc_id}-{meta['chunk']}", "values": vec, "metadata": {**meta, "text": text}})
+            if len(best) < _CANDIDATES_KEPT:
+                heapq.heappush(best, item)
+            elif item[0] > best[0][0]:
+                heapq.heapreplace(best, item)
+
+    batch: List[str] = []
+    for chunk in iter_chunks(iter_text(stream, kind), size, overlap):
+        if stats["chunks"] >= settings.UPLOAD_MAX_CHUNKS:
+            stats["truncated"] = True
+            break
+        batch.append(chunk)
+        stats["chunks"] += 1
+        if len(batch) >= settings.UPLOAD_EMBED_BATCH:
+            flush(batch, stats["chunks"] - len(batch))
+            batch = []
+    if batch:
+        flush(batch, stats["chunks"] - len(batch))
+
+    if stats["chunks"] == 0:
+        raise IngestionError("No text could be extracted from the document")
+
+    matches = []
+    if query_vec is not None:
+        with observe_stage("rerank"):
+            # every kept chunk belongs to the document the user is asking about, so no score floor
+            matches = rerank(query_vec.tolist(), [c for _, _, c in best], top_k=5, min_score=0.0)
+    logger.info(f"📄 Ingested {filename!r} for user {user_id}: {stats['chunks']} chunks, doc_id={doc_id}")
+    return {"doc_id": doc_id, "filename": filename, "kind": kind, **stats, "matches": matches}
+
+
+def build_document_context(result: Dict[str, Any], max_chars: int = 4000) -> str:
+    """
+    Prompt context from the best chunks of an ingested document, in document order.
+    """
+    matches = sorted(result.get("matches", []), key=lambda m: m["metadata"].get("chunk", 0))
+    header = f"Excerpts from the uploaded document '{result.get('filename') or 'document'}':"
+    pieces, used = [header], len(header)
+    for m in matches:
+        piece = f"• {m['metadata'].get('text', '')}"
+        if used + len(piece) > max_chars:
+            break
+        pieces.append(piece)
+        used += len(piece) + 1
+    return "\n".join(pieces)
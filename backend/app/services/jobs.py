@@ -0,0 +1,188 @@
+# backend/app/services/jobs.py
+"""
+Background jobs: long chat turns and document uploads run on the Celery worker
+(worker.run_job) while the API only enqueues them and serves status reads.
+
+Each job is a Redis hash job:<id> (chat Redis DB) that expires JOB_TTL_SECONDS
+after its last update:
+    status    queued → running → succeeded | failed
+    progress  0.0 … 1.0, with a short 'stage' description
+    result    JSON, once succeeded;  error, once failed
+Uploaded files wait in JOB_UPLOAD_DIR and are deleted when the job finishes.
+The API writes them and the worker reads them, so both must mount the same
+volume (the job_uploads volume in docker-compose.yml).
+
+worker.run_job is acks_late, so a job whose worker died is delivered again.
+Its steps (an LLM reply, a saved chat turn, ingestion) are not safe to repeat,
+so only the first delivery runs it (job:<id>:attempt); a later one finds the
+job unfinished and marks it failed, to be resubmitted by the client.
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+from app.db import redis_utils
+from app.db import utils as db_utils
+from app.db.neo4j_utils import get_facts_neo4j
+from app.services import ai_services, ingestion
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+KINDS = ("chat", "upload")
+_JSON_FIELDS = ("params", "result")
+
+
+def _key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _claim_first_attempt(job_id: str) -> bool:
+    return bool(redis_utils.client.set(f"{_key(job_id)}:attempt", 1, nx=True, ex=settings.JOB_TTL_SECONDS))
+
+
+def _remove_upload(job: Dict[str, Any]):
+    path = (job["params"] or {}).get("path")
+    if path and os.path.exists(path):
+        os.unlink(path)
+
+
+def upload_path(job_id: str, filename: Optional[str]) -> str:
+    ext = os.path.splitext(filename or "")[1][:10]
+    return os.path.join(settings.JOB_UPLOAD_DIR, f"{job_id}{ext}")
+
+
+# ---------------- STORE ----------------
+def create_job(user_id: int, kind: str, params: Dict[str, Any], job_id: Optional[str] = None) -> str:
+    job_id = job_id or uuid.uuid4().hex
+    now = time.time()
+    _write(job_id, {
+        "job_id": job_id, "user_id": user_id, "kind": kind, "status": QUEUED, "progress": 0.0,
+        "stage": "queued", "params": params, "created_at": now, "updated_at": now,
+    })
+    return job_id
+
+
+def _write(job_id: str, fields: Dict[str, Any]):
+    mapping = {k: json.dumps(v) if k in _JSON_FIELDS else ("" if v is None else v) for k, v in fields.items()}
+    pipe = redis_utils.client.pipeline()
+    pipe.hset(_key(job_id), mapping=mapping)
+    pipe.expire(_key(job_id), settings.JOB_TTL_SECONDS)
+    pipe.execute()
+
+
+def update_job(job_id: str, **fields):
+    _write(job_id, {**fields, "updated_at": time.time()})
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    raw = redis_utils.client.hgetall(_key(job_id))
+    if not raw:
+        return None
+    job = dict(raw)
+    for field in _JSON_FIELDS:
+        job[field] = json.loads(job[field]) if job.get(field) else None
+    job["user_id"] = int(job["user_id"])
+    for field in ("progress", "created_at", "updated_at"):
+        job[field] = float(job.get(field) or 0.0)
+    return job
+
+
+def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    view = {k: job.get(k) for k in ("job_id", "kind", "status", "progress", "stage", "created_at", "updated_at")}
+    if job["status"] == SUCCEEDED:
+        view["result"] = job.get("result")
+    elif job["status"] == FAILED:
+        view["error"] = job.get("error")
+    return view
+
+
+# ---------------- EXECUTION (Celery worker) ----------------
+def execute_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        logger.warning(f"⚠️ Job {job_id} expired or unknown; skipping")
+        return
+    if job["status"] in (SUCCEEDED, FAILED):
+        return  # redelivered after it already finished
+    if not _claim_first_attempt(job_id):
+        logger.warning(f"⚠️ Job {job_id} redelivered unfinished; marking it failed")
+        update_job(job_id, status=FAILED, stage="failed", error="Interrupted by a worker restart; please submit it again")
+        _remove_upload(job)
+        return
+
+    def report(progress: float, stage: str):
+        update_job(job_id, progress=round(progress, 3), stage=stage)
+
+    update_job(job_id, status=RUNNING, stage="started")
+    try:
+        result = _RUNNERS[job["kind"]](job["user_id"], job["params"], report)
+        update_job(job_id, status=SUCCEEDED, progress=1.0, stage="done", result=result)
+    except Exception as e:
+        logger.exception(f"❌ Job {job_id} ({job['kind']}) failed: {e}")
+        update_job(job_id, status=FAILED, stage="failed", error=str(e))
+    finally:
+        _remove_upload(job)
+
+
+def _facts_text(user_id: int) -> str:
+    facts = get_facts_neo4j(user_id) or {}
+    return "\n".join(f"{k}: {v}" for k, v in facts.items())
+
+
+def _save_turn(user_id: int, user_text: str, reply: str, chat_id: Optional[str]):
+    db_utils.save_chat(user_id, user_text, reply, chat_id)
+    redis_utils.save_chat_redis(user_id, user_text, reply, chat_id)
+
+
+def _run_chat(user_id: int, params: Dict[str, Any], report: Callable[[float, str], None]) -> Dict[str, Any]:
+    chat_id, message = params.get("chat_id"), params["message"]
+    report(0.1, "loading context")
+    if chat_id:
+        msgs = db_utils.get_messages_by_chat(user_id, chat_id, 50)
+        history_text = "\n".join(f"{'Human' if m['sender'] == 'user' else 'Assistant'}: {m['content']}" for m in msgs)
+    else:
+        chats = db_utils.get_chat_history(user_id, 10)
+        history_text = "\n".join(f"Human: {c['user_query']}\nAssistant: {c['ai_response']}" for c in chats)
+    facts_text = _facts_text(user_id)
+
+    report(0.3, "generating reply")
+    reply = ai_services.get_response({"sender": str(user_id), "text": message}, history=history_text, neo4j_facts=facts_text)
+
+    report(0.9, "saving")
+    _save_turn(user_id, message, reply, chat_id)
+    return {"reply": reply}
+
+
+def _run_upload(user_id: int, params: Dict[str, Any], report: Callable[[float, str], None]) -> Dict[str, Any]:
+    path, prompt = params["path"], params["prompt"]
+    total = max(1, os.path.getsize(path))
+    report(0.05, "extracting text")
+    with open(path, "rb") as f:
+        def on_batch(chunks: int):
+            report(0.05 + 0.8 * min(1.0, f.tell() / total), f"ingested {chunks} chunks")
+
+        doc = ingestion.ingest_document(
+            str(user_id), f, params.get("filename"), params.get("content_type"), prompt, progress=on_batch
+        )
+
+    report(0.9, "generating reply")
+    reply = ai_services.get_response(
+        {"sender": str(user_id), "text": prompt},
+        history="",
+        pinecone_context=ingestion.build_document_context(doc),
+        neo4j_facts="",
+    )
+    _save_turn(user_id, prompt, reply, params.get("chat_id"))
+    return {"reply": reply, "document": {k: doc[k] for k in ("doc_id", "filename", "chunks", "truncated")}}
+
+
+_RUNNERS: Dict[str, Callable[[int, Dict[str, Any], Callable[[float, str], None]], Dict[str, Any]]] = {
+    "chat": _run_chat,
+    "upload": _run_upload,
+}
@@ -0,0 +1,186 @@
+# backend/app/services/knowledge_graph.py
+"""
+Background knowledge-graph extraction from chat history, run by the Celery
+worker (worker.schedule_knowledge_extraction → worker.extract_user_knowledge)
+so no chat request waits on it.
+
+Instead of one LLM call per message, each user's new turns are batched: a user
+is due once KG_MIN_TURNS new turns have piled up, or once they have been quiet
+for KG_IDLE_SECONDS with at least one. One extraction call then covers up to
+KG_BATCH_MAX_TURNS turns, and the entities and relationships it returns are
+written to Neo4j in one transaction (neo4j_utils.save_knowledge).
+
+State lives in the chat Redis DB:
+    kg:watermark           hash user_id → id of the last chat_history row extracted
+    kg:pending:<user_id>   set while the user is queued or being processed (expires
+                           after KG_LOCK_SECONDS), so a user is never queued twice
+The watermark only moves after a successful write, so a failed batch is retried
+on a later scan. Writes MERGE on (owner, name), so re-extracting a turn adds nothing.
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.db import neo4j_utils, redis_utils
+from app.db import utils as db_utils
+from app.services import ai_services
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_KEY = "kg:watermark"
+_RESPONSE_CHARS = 500  # assistant replies are context only; facts come from what the user says
+_NAME_CHARS = 200
+_USER_ALIASES = {"user", "i", "me", "myself"}
+
+# One row per user with unextracted turns in the lookback window, if due
+USERS_DUE_SQL = """
+    SELECT c.user_id, COUNT(*) AS new_turns, MAX(c.id) AS last_id
+    FROM chat_history c
+    LEFT JOIN unnest(%s::int[], %s::bigint[]) AS w(user_id, last_id) ON w.user_id = c.user_id
+    WHERE c.created_at > LOCALTIMESTAMP - make_interval(hours => %s)
+      AND c.user_id IS NOT NULL
+      AND c.id > COALESCE(w.last_id, 0)
+    GROUP BY c.user_id
+    HAVING COUNT(*) >= %s OR MAX(c.created_at) < LOCALTIMESTAMP - make_interval(secs => %s)
+    ORDER BY MIN(c.created_at);
+"""
+PENDING_TURNS_SQL = """
+    SELECT id, user_query, ai_response
+    FROM chat_history
+    WHERE user_id = %s AND id > %s
+      AND created_at > LOCALTIMESTAMP - make_interval(hours => %s)
+    ORDER BY id
+    LIMIT %s;
+"""
+
+
+def _pending_key(user_id: int) -> str:
+    return f"kg:pending:{user_id}"
+
+
+# ---------------- SCHEDULING ----------------
+def claim(user_id: int) -> bool:
+    """Mark the user as queued; False if they already are (the caller must not enqueue)."""
+    return bool(redis_utils.client.set(_pending_key(user_id), 1, nx=True, ex=settings.KG_LOCK_SECONDS))
+
+
+def release(user_id: int):
+    redis_utils.client.delete(_pending_key(user_id))
+
+
+def get_watermarks() -> Dict[int, int]:
+    return {int(k): int(v) for k, v in redis_utils.client.hgetall(WATERMARK_KEY).items()}
+
+
+def users_due() -> List[Dict]:
+    """Users with enough new (or idle long enough) turns to extract, oldest first."""
+    watermarks = get_watermarks()
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(USERS_DUE_SQL, (
+                list(watermarks), list(watermarks.values()), settings.KG_LOOKBACK_HOURS,
+                settings.KG_MIN_TURNS, settings.KG_IDLE_SECONDS,
+            ))
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+# ---------------- EXTRACTION ----------------
+def _pending_turns(user_id: int, after_id: int) -> List[Dict]:
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(PENDING_TURNS_SQL, (user_id, after_id, settings.KG_LOOKBACK_HOURS,
+                                            settings.KG_BATCH_MAX_TURNS + 1))
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def _transcript(turns: List[Dict]) -> str:
+    lines = []
+    for t in turns:
+        lines.append(f"Human: {t['user_query']}")
+        if t["ai_response"]:
+            lines.append(f"Assistant: {t['ai_response'][:_RESPONSE_CHARS]}")
+    return "\n".join(lines)
+
+
+def _name(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    name = " ".join(value.split())[:_NAME_CHARS]
+    return name or None
+
+
+def _relation(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    return re.sub(r"[^a-z0-9]+", "_", value.lower()).strip("_")[:50] or None
+
+
+def normalize(extracted: Dict) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    """
+    LLM output → (entities, user_relationships, relationships) rows for neo4j_utils.save_knowledge,
+    deduplicated by casefolded name. Malformed items are dropped, not fatal.
+    """
+    entities: Dict[str, Dict] = {}
+
+    def entity(name: str, type_: Optional[str] = None) -> str:
+        key = name.casefold()
+        row = entities.setdefault(key, {"key": key, "name": name, "type": None})
+        row["type"] = row["type"] or _relation(type_)
+        return key
+
+    for ent in extracted.get("entities") or []:
+        name = _name(ent.get("name")) if isinstance(ent, dict) else None
+        if name and name.casefold() not in _USER_ALIASES:
+            entity(name, ent.get("type"))
+
+    user_relationships: Dict[tuple, Dict] = {}
+    relationships: Dict[tuple, Dict] = {}
+    for rel in extracted.get("relationships") or []:
+        if not isinstance(rel, dict):
+            continue
+        source, relation, target = _name(rel.get("source")), _relation(rel.get("relation")), _name(rel.get("target"))
+        if not (source and relation and target) or target.casefold() in _USER_ALIASES:
+            continue  # relations pointing at the user are not stored
+        target_key = entity(target)
+        if source.casefold() in _USER_ALIASES:
+            user_relationships[(relation, target_key)] = {"relation": relation, "target": target, "target_key": target_key}
+        else:
+            source_key = entity(source)
+            relationships[(source_key, relation, target_key)] = {
+                "source": source, "source_key": source_key, "relation": relation,
+                "target": target, "target_key": target_key,
+            }
+    return list(entities.values()), list(user_relationships.values()), list(relationships.values())
+
+
+def extract_for_user(user_id: int) -> bool:
+    """
+    Extract one batch of the user's unprocessed turns into Neo4j and advance their watermark.
+    Releases the user's claim when done. Returns True if more turns are waiting.
+    Raises when the LLM call or the graph write fails (the watermark stays put).
+    """
+    try:
+        after_id = int(redis_utils.client.hget(WATERMARK_KEY, user_id) or 0)
+        turns = _pending_turns(user_id, after_id)
+        more = len(turns) > settings.KG_BATCH_MAX_TURNS
+        turns = turns[:settings.KG_BATCH_MAX_TURNS]
+        if not turns:
+            return False
+
+        entities, user_relationships, relationships = normalize(ai_services.extract_knowledge(_transcript(turns)))
+        if entities:
+            neo4j_utils.save_knowledge(user_id, entities, user_relationships, relationships)
+        redis_utils.client.hset(WATERMARK_KEY, user_id, turns[-1]["id"])
+        logger.info(f"🧠 Extracted {len(turns)} turn(s) for user {user_id}: {len(entities)} entities, "
+                    f"{len(user_relationships) + len(relationships)} relationships")
+        return more
+    finally:
+        release(user_id)
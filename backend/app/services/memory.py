@@ -2,8 +2,8 @@
 import json
 from app.db import redis_utils as redis, postgres as postgres
 from app.db.neo4j_utils import (
-    save_fact_neo4j,
-    get_fact_neo4j,
+    save_user_fact_neo4j,
+    get_user_fact_neo4j,
     get_all_facts_for_user,
 )
 
@@ -14,14 +14,14 @@ def save_user_fact(user_id: str, key: str, value: str):
     """
     Persist a long-term user fact (e.g., name, preferences).
     """
-    save_fact_neo4j(user_id, key, value)
+    save_user_fact_neo4j(user_id, key, value)
 
 
 def get_user_fact(user_id: str, key: str):
     """
     Retrieve one user fact.
     """
-    return get_fact_neo4j(user_id, key)
+    return get_user_fact_neo4j(user_id, key)
 
 
 def get_all_user_facts(user_id: str) -> dict:
@@ -0,0 +1,257 @@
+# backend/app/services/provider_health.py
+"""
+Shared health tracking for AI providers and individual API keys.
+
+Each target ("gemini", "cohere", "gemini:key:<hash>") keeps an error-rate EWMA,
+a latency EWMA and a circuit breaker (closed → open → half_open → closed).
+The error rate also decays with time (half-life AI_PROVIDER_FAILURE_TIMEOUT),
+so a demoted target that receives no traffic drifts back to healthy.
+State lives in Redis so every uvicorn worker routes around a degraded
+provider or key as soon as one of them notices. If Redis is unreachable the
+same state machine runs process-locally.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, List
+
+from app.config import settings
+from app.db.redis_utils import state_client
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "ai_health"
+_STATE_TTL = 24 * 3600
+_REDIS_RETRY_AFTER = 5.0  # seconds to stay on local state after a Redis error
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# KEYS[1] = health hash
+# ARGV = ok, latency, alpha, now, error_threshold, min_samples, open_seconds, ttl
+_RECORD_SCRIPT = """
+local h = KEYS[1]
+local ok = tonumber(ARGV[1])
+local lat = tonumber(ARGV[2])
+local alpha = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local updated = tonumber(redis.call('HGET', h, 'updated_at') or ARGV[4])
+local err = tonumber(redis.call('HGET', h, 'err_ewma') or '0') * math.pow(0.5, (now - updated) / tonumber(ARGV[7]))
+local latv = redis.call('HGET', h, 'lat_ewma')
+local n = tonumber(redis.call('HGET', h, 'samples') or '0') + 1
+local state = redis.call('HGET', h, 'state') or 'closed'
+local failed = 1 - ok
+err = err + alpha * (failed - err)
+if ok == 1 then
+    if latv then latv = tonumber(latv) + alpha * (lat - tonumber(latv)) else latv = lat end
+    redis.call('HSET', h, 'lat_ewma', latv)
+end
+if state == 'half_open' then
+    redis.call('HDEL', h, 'probe_until')
+    if ok == 1 then
+        state = 'closed'
+        err = 0
+    else
+        state = 'open'
+        redis.call('HSET', h, 'open_until', now + tonumber(ARGV[7]))
+    end
+elseif state == 'closed' and n >= tonumber(ARGV[6]) and err >= tonumber(ARGV[5]) then
+    state = 'open'
+    redis.call('HSET', h, 'open_until', now + tonumber(ARGV[7]))
+end
+redis.call('HSET', h, 'err_ewma', err, 'samples', n, 'state', state, 'updated_at', now)
+redis.call('EXPIRE', h, tonumber(ARGV[8]))
+return state
+"""
+
+# KEYS[1] = health hash; ARGV = now, probe_timeout
+# Returns 1 if a call may go ahead (claiming the half-open probe if needed), else 0.
+_ALLOW_SCRIPT = """
+local h = KEYS[1]
+local now = tonumber(ARGV[1])
+local state = redis.call('HGET', h, 'state') or 'closed'
+if state == 'closed' then return 1 end
+if state == 'open' then
+    if now < tonumber(redis.call('HGET', h, 'open_until') or '0') then return 0 end
+    redis.call('HSET', h, 'state', 'half_open')
+end
+local probe_until = tonumber(redis.call('HGET', h, 'probe_until') or '0')
+if now < probe_until then return 0 end
+redis.call('HSET', h, 'probe_until', now + tonumber(ARGV[2]))
+return 1
+"""
+
+
+def key_target(provider: str, api_key: str) -> str:
+    """
+    Health target name for a single API key. Only a short hash of the key is stored.
+    """
+    digest = hashlib.sha256(api_key.encode()).hexdigest()[:10]
+    return f"{provider}:key:{digest}"
+
+
+class ProviderHealth:
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+        self._record = redis_client.register_script(_RECORD_SCRIPT) if redis_client else None
+        self._allow = redis_client.register_script(_ALLOW_SCRIPT) if redis_client else None
+        self._local: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._redis_down_until = 0.0
+
+    # -------------------------------------------------
+    # Redis / local plumbing
+    # -------------------------------------------------
+    def _use_redis(self) -> bool:
+        return self._redis is not None and time.time() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception):
+        logger.warning(f"[Health] Redis unavailable, using local provider state: {e}")
+        self._redis_down_until = time.time() + _REDIS_RETRY_AFTER
+
+    def _local_state(self, target: str) -> dict:
+        return self._local.setdefault(target, {"state": CLOSED, "err_ewma": 0.0, "samples": 0, "updated_at": time.time()})
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def allow(self, target: str) -> bool:
+        """
+        True if a call to `target` may proceed now. While half-open this claims
+        the single probe slot, so call it right before making the request.
+        """
+        now = time.time()
+        if self._use_redis():
+            try:
+                return bool(self._allow(keys=[f"{_KEY_PREFIX}:{target}"], args=[now, settings.AI_HEALTH_PROBE_TIMEOUT]))
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            st = self._local_state(target)
+            if st["state"] == CLOSED:
+                return True
+            if st["state"] == OPEN:
+                if now < st.get("open_until", 0):
+                    return False
+                st["state"] = HALF_OPEN
+            if now < st.get("probe_until", 0):
+                return False
+            st["probe_until"] = now + settings.AI_HEALTH_PROBE_TIMEOUT
+            return True
+
+    def record(self, target: str, ok: bool, latency: float = 0.0) -> str:
+        """
+        Feed the outcome of one call into the EWMAs and the breaker. Returns the new state.
+        """
+        now = time.time()
+        alpha = settings.AI_HEALTH_EWMA_ALPHA
+        open_seconds = settings.AI_PROVIDER_FAILURE_TIMEOUT
+        if self._use_redis():
+            try:
+                state = self._record(
+                    keys=[f"{_KEY_PREFIX}:{target}"],
+                    args=[
+                        1 if ok else 0, latency, alpha, now,
+                        settings.AI_HEALTH_ERROR_THRESHOLD, settings.AI_HEALTH_MIN_SAMPLES,
+                        open_seconds, _STATE_TTL,
+                    ],
+                )
+                if state == OPEN and not ok:
+                    logger.warning(f"[Health] Circuit open for '{target}'")
+                return state
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            st = self._local_state(target)
+            err = _decayed(st["err_ewma"], st["updated_at"], now)
+            st["err_ewma"] = err + alpha * ((0.0 if ok else 1.0) - err)
+            st["samples"] += 1
+            st["updated_at"] = now
+            if ok:
+                prev = st.get("lat_ewma")
+                st["lat_ewma"] = latency if prev is None else prev + alpha * (latency - prev)
+            if st["state"] == HALF_OPEN:
+                st.pop("probe_until", None)
+                if ok:
+                    st["state"], st["err_ewma"] = CLOSED, 0.0
+                else:
+                    st["state"], st["open_until"] = OPEN, now + open_seconds
+            elif (
+                st["state"] == CLOSED
+                and st["samples"] >= settings.AI_HEALTH_MIN_SAMPLES
+                and st["err_ewma"] >= settings.AI_HEALTH_ERROR_THRESHOLD
+            ):
+                st["state"], st["open_until"] = OPEN, now + open_seconds
+                logger.warning(f"[Health] Circuit open for '{target}'")
+            return st["state"]
+
+    def snapshot(self, targets: List[str]) -> Dict[str, dict]:
+        """
+        Current metrics for each target: state, err_ewma, lat_ewma, open_until.
+        """
+        if self._use_redis():
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for t in targets:
+                    pipe.hgetall(f"{_KEY_PREFIX}:{t}")
+                rows = pipe.execute()
+                return {t: _parse(row) for t, row in zip(targets, rows)}
+            except Exception as e:
+                self._redis_failed(e)
+        with self._lock:
+            return {t: _parse(self._local.get(t, {})) for t in targets}
+
+    def rank(self, targets: List[str]) -> List[str]:
+        """
+        Order providers for routing. Targets whose breaker is open (and not yet
+        due for a probe) are dropped and degraded targets go after healthy
+        ones; otherwise the given priority order is kept.
+        """
+        snap = self.snapshot(targets)
+        ranked = [(_degraded(snap[t]), i, t) for i, t in enumerate(targets) if _routable(snap[t])]
+        ranked.sort()
+        return [t for _, _, t in ranked]
+
+    def rank_keys(self, targets: List[str]) -> List[str]:
+        """
+        Order interchangeable API keys: routable keys by error-rate EWMA, then
+        latency EWMA, then the given order.
+        """
+        snap = self.snapshot(targets)
+        # Latency is bucketed to 0.5s so the given (rotation) order still spreads load
+        ranked = [
+            (round(snap[t]["err_ewma"], 2), round((snap[t]["lat_ewma"] or 0.0) * 2), i, t)
+            for i, t in enumerate(targets)
+            if _routable(snap[t])
+        ]
+        ranked.sort()
+        return [t for *_, t in ranked]
+
+
+def _routable(m: dict) -> bool:
+    return not (m["state"] == OPEN and time.time() < m["open_until"])
+
+
+def _degraded(m: dict) -> bool:
+    return m["state"] != CLOSED or m["err_ewma"] >= settings.AI_HEALTH_ERROR_THRESHOLD / 2
+
+
+def _decayed(err: float, updated_at: float, now: float) -> float:
+    return err * 0.5 ** (max(0.0, now - updated_at) / settings.AI_PROVIDER_FAILURE_TIMEOUT)
+
+
+def _parse(row: dict) -> dict:
+    lat = row.get("lat_ewma")
+    now = time.time()
+    return {
+        "state": row.get("state") or CLOSED,
+        "err_ewma": _decayed(float(row.get("err_ewma") or 0.0), float(row.get("updated_at") or now), now),
+        "lat_ewma": float(lat) if lat is not None else None,
+        "open_until": float(row.get("open_until") or 0.0),
+    }
+
+
+health = ProviderHealth(state_client)
@@ -0,0 +1,109 @@
+# backend/app/services/rerank.py
+"""
+Reranking of retrieved memories before they are put into a prompt.
+
+1. relevance = cosine(query, memory), optionally scaled down with age
+   (last_seen / stored_at, halving every SEMANTIC_RECENCY_HALF_LIFE_DAYS)
+2. memories below SEMANTIC_MIN_SCORE are dropped, except exact-term
+   (lexical) hits, which matched the query verbatim
+3. maximal marginal relevance picks the final top_k: each pick maximizes
+   λ·relevance − (1−λ)·max similarity to what was already picked, so
+   near-duplicates of a chosen snippet lose to something new
+"""
+
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config_pinecone import pinecone_settings
+
+_DAY = 86400.0
+_DUPLICATE_SIMILARITY = 0.97  # at or above this a candidate adds nothing to the picks
+
+
+def _unit(rows: np.ndarray) -> np.ndarray:
+    return rows / np.clip(np.linalg.norm(rows, axis=-1, keepdims=True), 1e-12, None)
+
+
+def _timestamp(meta: Dict[str, Any]) -> Optional[float]:
+    for key in ("last_seen", "stored_at"):
+        if meta.get(key):
+            return float(meta[key])
+    created = meta.get("created_at")
+    if created:
+        try:
+            return datetime.fromisoformat(created).timestamp()
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def recency_factors(candidates: List[Dict[str, Any]], weight: float, half_life_days: float,
+                    now: Optional[float] = None) -> np.ndarray:
+    """
+    (1 - weight) + weight * 0.5 ** (age / half_life) per candidate; 1.0 when weight is 0 or age unknown.
+    """
+    factors = np.ones(len(candidates), dtype=np.float32)
+    if weight <= 0 or half_life_days <= 0:
+        return factors
+    now = now or time.time()
+    for i, c in enumerate(candidates):
+        ts = _timestamp(c.get("metadata") or {})
+        if ts is not None:
+            age_days = max(0.0, now - ts) / _DAY
+            factors[i] = (1.0 - weight) + weight * 0.5 ** (age_days / half_life_days)
+    return factors
+
+
+def mmr_select(relevance: np.ndarray, vectors: np.ndarray, top_k: int, lambda_: float) -> List[int]:
+    """
+    Indices of up to top_k rows chosen by maximal marginal relevance (vectors must be unit length).
+    """
+    if len(relevance) == 0:
+        return []
+    similarity = vectors @ vectors.T
+    chosen: List[int] = []
+    max_sim = np.full(len(relevance), -np.inf, dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    while len(chosen) < top_k and available.any():
+        redundancy = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        scores = np.where(available, lambda_ * relevance - (1.0 - lambda_) * redundancy, -np.inf)
+        pick = int(np.argmax(scores))
+        chosen.append(pick)
+        available[pick] = False
+        max_sim = np.maximum(max_sim, similarity[pick])
+        available &= max_sim < _DUPLICATE_SIMILARITY
+    return chosen
+
+
+def rerank(query_vector: List[float], candidates: List[Dict[str, Any]], top_k: int,
+           min_score: Optional[float] = None, lambda_: Optional[float] = None,
+           recency_weight: Optional[float] = None, half_life_days: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Rerank candidates that carry 'values' (their embedding). Returns at most top_k of
+    them, best first, with 'score' set to the (recency-adjusted) cosine relevance.
+    """
+    s = pinecone_settings
+    min_score = s.SEMANTIC_MIN_SCORE if min_score is None else min_score
+    lambda_ = s.SEMANTIC_MMR_LAMBDA if lambda_ is None else lambda_
+    recency_weight = s.SEMANTIC_RECENCY_WEIGHT if recency_weight is None else recency_weight
+    half_life_days = s.SEMANTIC_RECENCY_HALF_LIFE_DAYS if half_life_days is None else half_life_days
+
+    candidates = [c for c in candidates if c.get("values")]
+    if not candidates:
+        return []
+    vectors = _unit(np.asarray([c["values"] for c in candidates], dtype=np.float32))
+    query = _unit(np.asarray(query_vector, dtype=np.float32))
+    relevance = (vectors @ query) * recency_factors(candidates, recency_weight, half_life_days)
+
+    keep = np.array([rel >= min_score or "lexical" in c.get("legs", {}) for rel, c in zip(relevance, candidates)])
+    kept = np.flatnonzero(keep)
+    picks = mmr_select(relevance[kept], vectors[kept], top_k, lambda_)
+
+    out = []
+    for p in picks:
+        c = candidates[kept[p]]
+        out.append({**{k: v for k, v in c.items() if k != "values"}, "score": float(relevance[kept[p]])})
+    return out
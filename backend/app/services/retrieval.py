@@ -0,0 +1,144 @@
+# backend/app/services/retrieval.py
+"""
+Hybrid recall over a user's past conversations.
+
+Two legs run concurrently for every query:
+- vector:  Pinecone semantic memory (paraphrases, related topics)
+- lexical: Postgres full-text search on chat_history (exact names, dates, ids)
+
+Their rankings are merged with reciprocal-rank fusion, so a memory ranked well
+by either leg surfaces, and one found by both rises to the top. Either leg
+failing or being slow only costs its own contribution. The fused candidates
+are then reranked (app/services/rerank.py) down to a few relevant, diverse
+snippets.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db import utils as db_utils
+from app.metrics import observe_stage
+from app.services.embeddings import get_batch_embeddings, get_embedding
+from app.services.rerank import rerank
+from app.services.semantic_memory import normalize_text, query_semantic_memory
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60  # standard damping constant: rank 1 scores 1/61, rank 10 1/70
+LEG_TIMEOUT = 3.0  # seconds; a leg slower than this is dropped for the turn
+_CANDIDATES_PER_LEG = 2  # fetch top_k * this from each leg before fusing
+
+_legs = ThreadPoolExecutor(max_workers=16, thread_name_prefix="retrieval")
+
+
+def _vector_leg(user_id: str, query: str, limit: int) -> Tuple[List[float], List[Dict[str, Any]]]:
+    with observe_stage("embedding"):
+        vector = get_embedding(query)
+    return vector, query_semantic_memory(user_id, query, top_k=limit, vector=vector, include_values=True)
+
+
+def _lexical_leg(user_id: str, query: str, limit: int) -> List[Dict[str, Any]]:
+    try:
+        pg_user_id = int(user_id)
+    except (TypeError, ValueError):
+        return []  # anonymous / non-numeric users have no chat_history rows
+    with observe_stage("lexical_query"):
+        rows = db_utils.search_chat_history(pg_user_id, query, limit=limit)
+    matches = []
+    for r in rows:
+        text = r["user_query"]
+        if r.get("ai_response"):
+            text = f"{text} → {r['ai_response'][:200]}"
+        matches.append({
+            "id": f"chat-{r['id']}",
+            "score": float(r.get("rank") or 0.0),
+            "metadata": {
+                "text": text,
+                "query": r["user_query"],
+                "chat_id": r.get("chat_id"),
+                "created_at": r["created_at"].isoformat() if r.get("created_at") else None,
+                "source": "chat_history",
+            },
+        })
+    return matches
+
+
+def _fusion_key(match: Dict[str, Any]) -> str:
+    # The same user message can come back from both legs under different ids
+    meta = match.get("metadata") or {}
+    return normalize_text(meta.get("query") or meta.get("text") or match.get("id") or "")
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Dict[str, Any]]], top_k: int, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Merge ranked match lists ({leg: [match, ...]}) into one list scored by sum(1 / (k + rank)).
+    Each result keeps the richest metadata seen and records which legs found it.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for leg, matches in rankings.items():
+        for rank, m in enumerate(matches, start=1):
+            key = _fusion_key(m)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {"id": m.get("id"), "score": 0.0, "metadata": dict(m.get("metadata") or {}), "legs": {}}
+            else:
+                entry["metadata"].update({k2: v for k2, v in (m.get("metadata") or {}).items() if v is not None})
+            if m.get("values") and not entry.get("values"):
+                entry["values"] = m["values"]
+            entry["score"] += 1.0 / (k + rank)
+            entry["legs"][leg] = m.get("score")
+    return sorted(fused.values(), key=lambda e: e["score"], reverse=True)[:top_k]
+
+
+def _embed_missing(candidates: List[Dict[str, Any]]):
+    # Lexical-only hits come without a vector; embed them in one batch so MMR can compare everything
+    missing = [c for c in candidates if not c.get("values")]
+    if missing:
+        with observe_stage("embedding"):
+            vectors = get_batch_embeddings([c["metadata"].get("query") or c["metadata"].get("text", "") for c in missing])
+        for c, v in zip(missing, vectors):
+            c["values"] = v
+
+
+def _without_vectors(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: v for k, v in m.items() if k != "values"} for m in matches]
+
+
+def hybrid_search(user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Returns up to top_k matches [{'id', 'score', 'metadata': {'text', ...}, 'legs': {leg: leg_score}}].
+    'score' is the reranked relevance (cosine, recency-adjusted) when the query could be embedded,
+    otherwise the RRF score.
+    """
+    limit = top_k * _CANDIDATES_PER_LEG
+    futures = {
+        "vector": _legs.submit(_vector_leg, user_id, query, limit),
+        "lexical": _legs.submit(_lexical_leg, user_id, query, limit),
+    }
+    with observe_stage("retrieval"):
+        wait(futures.values(), timeout=LEG_TIMEOUT)
+
+    rankings = {}
+    query_vector: Optional[List[float]] = None
+    for leg, future in futures.items():
+        if not future.done():
+            logger.warning(f"[Retrieval] {leg} leg exceeded {LEG_TIMEOUT}s; continuing without it")
+            continue
+        try:
+            rankings[leg] = future.result()
+        except Exception as e:
+            logger.error(f"[Retrieval] {leg} leg failed: {e}")
+    if "vector" in rankings:
+        query_vector, rankings["vector"] = rankings["vector"]
+
+    candidates = reciprocal_rank_fusion(rankings, top_k=limit * 2)
+    if query_vector is None:
+        return _without_vectors(candidates[:top_k])
+    try:
+        _embed_missing(candidates)
+        with observe_stage("rerank"):
+            return rerank(query_vector, candidates, top_k)
+    except Exception as e:
+        logger.error(f"[Retrieval] rerank failed, using fused order: {e}")
+        return _without_vectors(candidates[:top_k])
@@ -1,19 +1,84 @@
 # backend/app/services/semantic_memory.py
-import uuid
+import hashlib
+import re
+import string
 import time
 import logging
-from typing import List, Dict, Any, Optional
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
 
-from app.db.pinecone_utils import upsert_vectors, query_vectors, init_pinecone
+from app.config_pinecone import pinecone_settings
+from app.db.pinecone_utils import upsert_vectors, query_vectors, fetch_vectors, update_metadata, user_namespace
 from app.services.embeddings import get_embedding, get_batch_embeddings
+from app.metrics import observe_stage, record_cache
+from app.singleflight import singleflight
 
 logger = logging.getLogger(__name__)
 
-# Ensure Pinecone client/Index is initialized once at import
-try:
-    init_pinecone()
-except Exception as e:
-    logger.error("Pinecone init failed at import: %s", e)
+# Pinecone is initialized lazily by pinecone_utils.get_index() (or warmed at startup)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form for duplicate detection: case, surrounding punctuation and
+    repeated whitespace do not make a message new ("Hi!" == "hi").
+    """
+    return _WHITESPACE.sub(" ", text.casefold()).strip(string.punctuation + string.whitespace)
+
+
+def content_id(user_id: str, text: str, scope: Optional[str] = None) -> str:
+    """
+    Deterministic vector id for a user's text, so a repeat maps onto the same vector.
+    A scope (e.g. a document id) keeps identical text from different sources apart.
+    """
+    key = normalize_text(text) if scope is None else f"{scope}\x00{normalize_text(text)}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return f"{user_id}-{digest}"
+
+
+def _user_filter(user_id: str) -> Dict[str, Any]:
+    return {"user_id": {"$eq": user_id}}
+
+
+def _partition(user_id: str, namespace: Optional[str] = None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    (namespace, filter) that scopes an operation to one user's memories: their own
+    namespace, or the legacy shared namespace + user_id filter when
+    PINECONE_USER_NAMESPACES is off. An explicit namespace is shared, so it keeps the filter.
+    """
+    if namespace:
+        return namespace, _user_filter(user_id)
+    if pinecone_settings.PINECONE_USER_NAMESPACES:
+        return user_namespace(user_id), None
+    return None, _user_filter(user_id)
+
+
+def _normalize_matches(res) -> List[Dict[str, Any]]:
+    if not res:
+        return []
+    matches = []
+    raw = getattr(res, "matches", None) or res.get("matches", [])
+    for m in raw:
+        match = {
+            "id": getattr(m, "id", None) or m.get("id"),
+            "score": getattr(m, "score", None) or m.get("score"),
+            "metadata": getattr(m, "metadata", None) or m.get("metadata", {}),
+        }
+        values = m.get("values") if isinstance(m, dict) else getattr(m, "values", None)
+        if values:
+            match["values"] = list(values)
+        matches.append(match)
+    return matches
+
+
+def _bump(existing: Dict[str, Any], now: int, namespace: Optional[str], seen: int = 1) -> bool:
+    """
+    Record that an already-stored memory was seen again instead of inserting a copy.
+    """
+    count = int(existing.get("metadata", {}).get("count", 1)) + seen
+    return update_metadata(existing["id"], {"count": count, "last_seen": now}, namespace=namespace)
 
 
 def store_semantic_memory(
@@ -24,13 +89,32 @@ def store_semantic_memory(
 ) -> Dict[str, Any]:
     """
     Store one text entry with embedding for user.
+    An exact repeat (after normalization) has the same id, so it overwrites its own
+    vector (refreshing last_seen) without a lookup first. With SEMANTIC_DEDUP_THRESHOLD
+    set, a text at least that similar to the user's nearest memory, an exact repeat
+    included, only bumps the existing vector's count/last_seen.
     """
     try:
-        vec = get_embedding(text)
-        item_id = f"{user_id}-{uuid.uuid4()}"
+        ns, filter_obj = _partition(user_id, namespace)
+        now = int(time.time())
+        item_id = content_id(user_id, text)
+        with observe_stage("embedding"):
+            vec = get_embedding(text)
+
+        threshold = pinecone_settings.SEMANTIC_DEDUP_THRESHOLD
+        if threshold > 0:
+            with observe_stage("vector_query"):
+                nearest = _normalize_matches(query_vectors(vector=vec, top_k=1, filter=filter_obj, namespace=ns))
+            similar = bool(nearest) and (nearest[0]["score"] or 0.0) >= threshold
+            record_cache("semantic_dedup_similar", similar)
+            if similar:
+                kind = "exact" if nearest[0]["id"] == item_id else "similar"
+                return {"ok": _bump(nearest[0], now, ns), "id": nearest[0]["id"], "deduplicated": kind}
+
         meta = dict(metadata or {})
-        meta.update({"user_id": user_id, "text": text, "stored_at": int(time.time())})
-        ok = upsert_vectors([{"id": item_id, "values": vec, "metadata": meta}])
+        meta.update({"user_id": user_id, "text": text, "stored_at": now, "last_seen": now, "count": 1})
+        with observe_stage("vector_upsert"):
+            ok = upsert_vectors([{"id": item_id, "values": vec, "metadata": meta}], namespace=ns)
         return {"ok": ok, "id": item_id}
     except Exception as e:
         logger.error("store_semantic_memory failed: %s", e)
@@ -38,58 +122,81 @@ def store_semantic_memory(
 
 
 def store_many(
-    user_id: str, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None
+    user_id: str,
+    texts: List[str],
+    metadatas: Optional[List[Dict[str, Any]]] = None,
+    namespace: Optional[str] = None,
+    embeddings: Optional[List[List[float]]] = None,
+    scope: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Batch store multiple text entries.
+    Exact repeats (within the batch or already stored) are counted, not re-inserted.
+    Pass embeddings (aligned with texts) when the caller already computed them.
     """
     try:
         if not texts:
             return {"ok": True, "stored": 0}
         if metadatas is None:
             metadatas = [{} for _ in texts]
-        embeddings = get_batch_embeddings(texts)
-        items = []
+
+        ids = [content_id(user_id, t, scope) for t in texts]
+        seen = Counter(ids)
+        first: Dict[str, int] = {}
+        for i, vid in enumerate(ids):
+            first.setdefault(vid, i)
+
+        ns, _ = _partition(user_id, namespace)
         now = int(time.time())
-        for i, emb in enumerate(embeddings):
-            meta = dict(metadatas[i]) if i < len(metadatas) else {}
-            meta.update({"user_id": user_id, "text": texts[i], "stored_at": now})
-            items.append(
-                {"id": f"{user_id}-{uuid.uuid4()}", "values": emb, "metadata": meta}
-            )
-        ok = upsert_vectors(items)
-        return {"ok": ok, "stored": len(items)}
+        with observe_stage("vector_fetch"):
+            existing = fetch_vectors(list(first), namespace=ns)
+        ok = all([_bump(existing[vid], now, ns, seen[vid]) for vid in existing])
+        for vid in first:
+            record_cache("semantic_dedup_exact", vid in existing)
+
+        new = [(vid, i) for vid, i in first.items() if vid not in existing]
+        items = []
+        if new:
+            if embeddings is None:
+                with observe_stage("embedding"):
+                    new_embeddings = get_batch_embeddings([texts[i] for _, i in new])
+            else:
+                new_embeddings = [embeddings[i] for _, i in new]
+            for (vid, i), emb in zip(new, new_embeddings):
+                meta = dict(metadatas[i]) if i < len(metadatas) else {}
+                meta.update({"user_id": user_id, "text": texts[i], "stored_at": now, "last_seen": now, "count": seen[vid]})
+                items.append({"id": vid, "values": emb, "metadata": meta})
+            with observe_stage("vector_upsert"):
+                ok = upsert_vectors(items, namespace=ns) and ok
+        return {"ok": ok, "stored": len(items), "deduplicated": len(texts) - len(items)}
     except Exception as e:
         logger.error("store_many failed: %s", e)
         return {"ok": False, "error": str(e)}
 
 
+@singleflight
 def query_semantic_memory(
-    user_id: str, query: str, top_k: int = 5
+    user_id: str,
+    query: str,
+    top_k: int = 5,
+    namespace: Optional[str] = None,
+    vector: Optional[List[float]] = None,
+    include_values: bool = False,
 ) -> List[Dict[str, Any]]:
     """
     Query Pinecone for semantically similar past messages.
-    Returns list of {'id':..., 'score':..., 'metadata':{...}}.
+    Returns list of {'id':..., 'score':..., 'metadata':{...}} ('values' too with include_values).
+    Pass vector when the query is already embedded.
     """
     try:
-        vec = get_embedding(query)
-        filter_obj = {"user_id": {"$eq": user_id}}
-        res = query_vectors(vector=vec, top_k=top_k, filter=filter_obj)
-        if not res:
-            return []
-
-        # Normalize Pinecone results
-        matches = []
-        raw = getattr(res, "matches", None) or res.get("matches", [])
-        for m in raw:
-            matches.append(
-                {
-                    "id": getattr(m, "id", None) or m.get("id"),
-                    "score": getattr(m, "score", None) or m.get("score"),
-                    "metadata": getattr(m, "metadata", None) or m.get("metadata", {}),
-                }
-            )
-        return matches
+        if vector is None:
+            with observe_stage("embedding"):
+                vector = get_embedding(query)
+        with observe_stage("vector_query"):
+            ns, filter_obj = _partition(user_id, namespace)
+            res = query_vectors(vector=vector, top_k=top_k, filter=filter_obj, namespace=ns,
+                                include_values=include_values)
+        return _normalize_matches(res)
     except Exception as e:
         logger.error("query_semantic_memory failed: %s", e)
         return []
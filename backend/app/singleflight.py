@@ -0,0 +1,134 @@
+# backend/app/singleflight.py
+"""
+Single-flight: concurrent identical reads share one call.
+
+    @singleflight
+    def get_thing(user_id, ...): ...
+
+While a call for some (function, arguments) is in flight, further calls with
+the same arguments in this process wait for it and get the same result (or
+exception) instead of hitting the backend again. Nothing is cached: once the
+call returns, the next one runs afresh.
+
+Works for plain functions (threads wait on the leader) and coroutine
+functions (coroutines await one shared task, so a cancelled caller does not
+cancel the others). Only use it on reads whose result callers do not mutate,
+since every waiter gets the same object.
+"""
+
+import asyncio
+import functools
+import threading
+from typing import Any, Dict, Hashable, Optional
+
+from app.metrics import SINGLEFLIGHT_CALLS, record_cache
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _freeze(value: Any) -> Hashable:
+    # Turn list / dict arguments (e.g. a query vector, a filter) into a hashable key
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+def _key(args: tuple, kwargs: dict) -> Optional[Hashable]:
+    try:
+        key = (_freeze(args), _freeze(kwargs))
+        hash(key)
+        return key
+    except TypeError:
+        return None  # unhashable arguments: the call just runs on its own
+
+
+def _record(name: str, outcome: str):
+    with _stats_lock:
+        _stats[name][outcome] += 1
+    SINGLEFLIGHT_CALLS.labels(name, outcome).inc()
+    record_cache("singleflight", outcome == "shared")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+def singleflight(fn):
+    """
+    Decorator: collapse concurrent calls with equal arguments into one. See the module docstring.
+    """
+    name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+    with _stats_lock:
+        _stats.setdefault(name, {"calls": 0, "shared": 0})
+
+    if asyncio.iscoroutinefunction(fn):
+        tasks: Dict[Hashable, asyncio.Task] = {}
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            key = _key(args, kwargs)
+            if key is None:
+                _record(name, "calls")
+                return await fn(*args, **kwargs)
+            key = (asyncio.get_running_loop(), key)  # tasks belong to one event loop
+            task = tasks.get(key)
+            if task is None:
+                _record(name, "calls")
+                task = tasks[key] = asyncio.ensure_future(fn(*args, **kwargs))
+                task.add_done_callback(lambda _t, k=key: tasks.pop(k, None))
+            else:
+                _record(name, "shared")
+            return await asyncio.shield(task)
+
+        return async_wrapper
+
+    calls: Dict[Hashable, _Call] = {}
+    lock = threading.Lock()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = _key(args, kwargs)
+        if key is None:
+            _record(name, "calls")
+            return fn(*args, **kwargs)
+        with lock:
+            call = calls.get(key)
+            leader = call is None
+            if leader:
+                call = calls[key] = _Call()
+        if not leader:
+            _record(name, "shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        _record(name, "calls")
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with lock:
+                calls.pop(key, None)
+            call.done.set()
+
+    return wrapper
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """{function: {"calls": backend calls made, "shared": calls answered by another in-flight call}}"""
+    with _stats_lock:
+        return {name: dict(s) for name, s in _stats.items()}
@@ -0,0 +1,55 @@
+# backend/app/tools/auth_hash_benchmark.py
+"""
+Password Hashing Pool Benchmark
+-------------------------------
+Measures logins (argon2 verifications) per second through the auth hashing
+process pool at different pool sizes, with a burst of concurrent logins.
+
+Usage:
+    docker exec -it <backend_container> python -m app.tools.auth_hash_benchmark [logins] [sizes]
+Example:
+    docker exec -it backend python -m app.tools.auth_hash_benchmark 200 1,2,4,8
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from app.db.utils import hash_password
+from app.password_hashing import HashPool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run_burst(pool: HashPool, password_hash: str, logins: int) -> float:
+    # Warm the workers first so process start-up is not counted
+    await asyncio.gather(*(pool.verify("benchmark-password", password_hash) for _ in range(pool.size)))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(pool.verify("benchmark-password", password_hash) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    assert all(valid for valid, _ in results), "verification failed"
+    return elapsed
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    sizes = [int(s) for s in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 2, 4, os.cpu_count() or 4]
+
+    password_hash = hash_password("benchmark-password")
+    logger.info(f"🔐 {logins} concurrent logins per run, CPU count {os.cpu_count()}")
+
+    for size in sizes:
+        # Queue limit large enough that the burst is measured, not rejected
+        pool = HashPool(size=size, queue_limit=logins)
+        try:
+            elapsed = asyncio.run(run_burst(pool, password_hash, logins))
+        finally:
+            pool.shutdown()
+        logger.info(f" - pool size {size:>2}: {logins / elapsed:8.1f} logins/s ({elapsed * 1000 / logins:.1f} ms/login amortized)")
+
+
+if __name__ == "__main__":
+    main()
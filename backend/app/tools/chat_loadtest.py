@@ -0,0 +1,258 @@
+# backend/app/tools/chat_loadtest.py
+"""
+Offline /chat/ Load Test
+------------------------
+Boots app.main:app in-process with every external service replaced by the
+fakes in app/tools/loadtest_fakes.py, drives a realistic mix of chat intents
+from many concurrent users, and reports throughput, p50/p95/p99 latency and
+the time spent per pipeline stage (from the /metrics histograms).
+
+Results are written as JSON so runs can be compared with --compare.
+
+Usage:
+    python -m app.tools.chat_loadtest --users 50 --concurrency 32 --requests 2000 --llm-ms 400
+    python -m app.tools.chat_loadtest --compare loadtest_results/before.json loadtest_results/after.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+# The real settings classes require these; the fakes never use them.
+for _name, _value in {
+    "GEMINI_API_KEYS": "loadtest-key",
+    "NEO4J_PASSWORD": "loadtest",
+    "PINECONE_API_KEY": "loadtest",
+    "PINECONE_ENVIRONMENT": "loadtest",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from app.tools.loadtest_fakes import FakeLatencies, install  # noqa: E402
+
+# (weight, action, message templates)
+TRAFFIC_MIX = [
+    (60, "general_chat", ["How was my day planned?", "Tell me a joke about {topic}", "What do you know about {topic}?",
+                          "Can you summarise what we talked about regarding {topic}?", "hi", "thanks!"]),
+    (12, "create_task", ["remind me to {task} at {hour}pm", "add task {task} due {hour}:30 pm tomorrow"]),
+    (10, "fetch_tasks", ["show tasks", "list tasks please", "what are my tasks"]),
+    (10, "save_fact", ["my favourite {thing} is {value}", "remember {thing} is {value}"]),
+    (8, "get_chat_history", ["show chat history", "previous messages"]),
+]
+_WORDS = {
+    "topic": ["hiking", "fastapi", "cooking", "the weekend", "my exam", "neo4j"],
+    "task": ["call mom", "buy milk", "submit report", "water plants", "book tickets"],
+    "hour": [str(h) for h in range(1, 12)],
+    "thing": ["color", "food", "city", "band", "sport"],
+    "value": ["blue", "pizza", "hyderabad", "coldplay", "cricket"],
+}
+
+STAGE_METRIC = "chat_stage_seconds"
+LLM_METRIC = "llm_generation_seconds"
+
+
+def _message(rng: random.Random) -> str:
+    weights = [w for w, _, _ in TRAFFIC_MIX]
+    _, _, templates = rng.choices(TRAFFIC_MIX, weights=weights)[0]
+    return rng.choice(templates).format(**{k: rng.choice(v) for k, v in _WORDS.items()})
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {
+        "p50": round(pct(0.50) * 1000, 2),
+        "p95": round(pct(0.95) * 1000, 2),
+        "p99": round(pct(0.99) * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def _histogram_totals(metric: str, label: str) -> Dict[str, Dict[str, float]]:
+    """
+    Read {label_value: {"count": n, "sum": seconds}} from the in-process registry.
+    """
+    from prometheus_client import REGISTRY
+
+    totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0.0, "sum": 0.0})
+    for family in REGISTRY.collect():
+        if family.name != metric:
+            continue
+        for sample in family.samples:
+            key = sample.labels.get(label)
+            if sample.name.endswith("_count"):
+                totals[key]["count"] += sample.value
+            elif sample.name.endswith("_sum"):
+                totals[key]["sum"] += sample.value
+    return totals
+
+
+def _stage_breakdown(before: dict, after: dict, wall_seconds: float, concurrency: int) -> Dict[str, dict]:
+    out = {}
+    for stage, tot in after.items():
+        count = tot["count"] - before.get(stage, {}).get("count", 0.0)
+        total = tot["sum"] - before.get(stage, {}).get("sum", 0.0)
+        if count <= 0:
+            continue
+        out[stage] = {
+            "count": int(count),
+            "total_s": round(total, 3),
+            "mean_ms": round(total / count * 1000, 2),
+            # share of the available worker time spent in this stage
+            "share_of_capacity": round(total / (wall_seconds * concurrency), 4),
+        }
+    return dict(sorted(out.items(), key=lambda kv: -kv[1]["total_s"]))
+
+
+async def _run(args) -> dict:
+    fakes = install(FakeLatencies(
+        llm=args.llm_ms / 1000, embedding=args.embed_ms / 1000, vector=args.vector_ms / 1000,
+        graph=args.graph_ms / 1000, db=args.db_ms / 1000, redis=args.redis_ms / 1000,
+    ))
+
+    import httpx
+    from app.main import app
+    from app.api.auth import _create_jwt_token
+
+    rng = random.Random(args.seed)
+    users = []
+    for uid in range(1, args.users + 1):
+        users.append({
+            "token": _create_jwt_token(user_id=uid, email=f"user{uid}@loadtest.local"),
+            "chats": [str(uuid.uuid4()) for _ in range(3)],
+        })
+
+    latencies: List[float] = []
+    by_action: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    remaining = iter(range(args.requests))
+
+    stages_before = _histogram_totals(STAGE_METRIC, "stage")
+    llm_before = _histogram_totals(LLM_METRIC, "provider")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+
+        async def worker(worker_rng: random.Random):
+            for _ in remaining:
+                user = worker_rng.choice(users)
+                body = {
+                    "user_message": _message(worker_rng),
+                    "token": user["token"],
+                    # Most turns continue a conversation, some start without one
+                    "chat_id": worker_rng.choice(user["chats"]) if worker_rng.random() < 0.8 else None,
+                }
+                started = time.perf_counter()
+                try:
+                    resp = await client.post("/chat/", json=body)
+                    elapsed = time.perf_counter() - started
+                    if resp.status_code != 200:
+                        errors[f"http_{resp.status_code}"] += 1
+                        continue
+                    action = (resp.json().get("intent") or {}).get("action") or (
+                        "create_task" if "task" in resp.json() else "unknown"
+                    )
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+                    continue
+                latencies.append(elapsed)
+                by_action[action].append(elapsed)
+
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(worker(random.Random(rng.random())) for _ in range(args.concurrency)))
+        wall = time.perf_counter() - wall_started
+
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        "requests": len(latencies) + sum(errors.values()),
+        "succeeded": len(latencies),
+        "errors": dict(errors),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": _percentiles(latencies),
+        "by_action": {a: {"count": len(s), **_percentiles(s)} for a, s in sorted(by_action.items())},
+        "stages": _stage_breakdown(stages_before, _histogram_totals(STAGE_METRIC, "stage"), wall, args.concurrency),
+        "llm": _stage_breakdown(llm_before, _histogram_totals(LLM_METRIC, "provider"), wall, args.concurrency),
+        "fake_calls": {"llm_primary": fakes.llm_primary.calls, "llm_secondary": fakes.llm_secondary.calls},
+    }
+
+
+def _print_report(result: dict):
+    lat = result["latency_ms"]
+    print(f"\n📈 {result['succeeded']} ok / {result['requests']} requests in {result['wall_seconds']}s "
+          f"→ {result['throughput_rps']} req/s")
+    print(f"   latency ms  p50={lat['p50']}  p95={lat['p95']}  p99={lat['p99']}  max={lat['max']}")
+    if result["errors"]:
+        print(f"   errors: {result['errors']}")
+    print("\n   by action:")
+    for action, s in result["by_action"].items():
+        print(f"     {action:<18} n={s['count']:<6} p50={s['p50']:<9} p95={s['p95']:<9} p99={s['p99']}")
+    print("\n   stage breakdown (mean ms / total s / share of worker capacity):")
+    for stage, s in {**result["stages"], **{f"llm:{k}": v for k, v in result["llm"].items()}}.items():
+        print(f"     {stage:<18} {s['mean_ms']:>9} ms  {s['total_s']:>9} s  {s['share_of_capacity'] * 100:6.2f}%")
+
+
+def _compare(old_path: str, new_path: str):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def delta(a: float, b: float) -> str:
+        return f"{a} → {b} ({(b - a) / a * 100:+.1f}%)" if a else f"{a} → {b}"
+
+    print(f"throughput_rps  {delta(old['throughput_rps'], new['throughput_rps'])}")
+    for p in ("p50", "p95", "p99"):
+        print(f"latency {p:<7} {delta(old['latency_ms'][p], new['latency_ms'][p])}")
+    for stage in sorted(set(old["stages"]) | set(new["stages"])):
+        a = old["stages"].get(stage, {}).get("mean_ms", 0.0)
+        b = new["stages"].get(stage, {}).get("mean_ms", 0.0)
+        print(f"stage {stage:<16} {delta(a, b)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for /chat/ with in-process fakes")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--llm-ms", type=float, default=400.0)
+    parser.add_argument("--embed-ms", type=float, default=10.0)
+    parser.add_argument("--vector-ms", type=float, default=20.0)
+    parser.add_argument("--graph-ms", type=float, default=5.0)
+    parser.add_argument("--db-ms", type=float, default=3.0)
+    parser.add_argument("--redis-ms", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="JSON results path (default: loadtest_results/<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two saved result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        _compare(*args.compare)
+        return
+
+    result = asyncio.run(_run(args))
+    _print_report(result)
+
+    out = args.out or os.path.join("loadtest_results", datetime.utcnow().strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n💾 Results saved to {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# backend/app/tools/embedding_benchmark.py
+"""
+Embedding Backend Benchmark (torch vs int8 ONNX)
+------------------------------------------------
+Loads both local embedding backends and compares them on the same texts:
+
+- accuracy: cosine similarity between the torch and ONNX vector of each text,
+  and top-k neighbour agreement when each backend ranks the corpus for the same queries
+- speed:    single-text latency (what one chat turn pays) and batched throughput
+- memory:   growth of peak RSS while loading each backend (ONNX is loaded first)
+
+Texts come from a file (one per line) or a built-in chat-like sample.
+
+Usage:
+    docker exec -it <backend_container> python -m app.tools.embedding_benchmark [texts_file] [top_k]
+"""
+
+import logging
+import random
+import resource
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.embedding_models import ONNX_MODEL_DIR, _SENTENCE_MODEL_NAME, load_backend
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 32
+LATENCY_SAMPLES = 100
+
+_SUBJECTS = ["my sister", "the project", "our trip to Goa", "the exam", "my dog", "the new laptop", "dinner", "the meeting"]
+_VERBS = ["is scheduled for", "reminds me of", "went badly on", "should happen before", "was moved to", "depends on"]
+_OBJECTS = ["next Friday", "the weekend", "the deadline", "my birthday", "the client demo", "monsoon season", "9 pm"]
+
+
+def _sample_texts(n: int = 400) -> List[str]:
+    rng = random.Random(7)
+    return [f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}" for _ in range(n)]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _load(name: str) -> Dict:
+    before = _peak_rss_mb()
+    started = time.perf_counter()
+    encode = load_backend(name)
+    encode(["warm up"])
+    return {"encode": encode, "load_s": time.perf_counter() - started, "rss_mb": _peak_rss_mb() - before}
+
+
+def _speed(encode: Callable[[List[str]], List[List[float]]], texts: List[str]) -> Dict[str, float]:
+    single = []
+    for text in texts[:LATENCY_SAMPLES]:
+        started = time.perf_counter()
+        encode([text])
+        single.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    for i in range(0, len(texts), BATCH_SIZE):
+        encode(texts[i:i + BATCH_SIZE])
+    batch_elapsed = time.perf_counter() - started
+    single.sort()
+    return {
+        "p50_ms": statistics.median(single) * 1000,
+        "p95_ms": single[int(0.95 * (len(single) - 1))] * 1000,
+        "batch_texts_per_s": len(texts) / batch_elapsed,
+    }
+
+
+def _topk(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, 1:k + 1]  # column 0 is the query itself
+
+
+def main():
+    texts = _sample_texts()
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    top_k = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    logger.info(f"🧪 {_SENTENCE_MODEL_NAME}: torch vs ONNX int8 ({ONNX_MODEL_DIR}) on {len(texts)} texts")
+    backends = {name: _load(name) for name in ("onnx", "torch")}
+
+    vectors = {}
+    for name, b in backends.items():
+        v = np.asarray(b["encode"](texts), dtype=np.float32)
+        vectors[name] = v / np.clip(np.linalg.norm(v, axis=1, keepdims=True), 1e-12, None)
+
+    cosine = (vectors["torch"] * vectors["onnx"]).sum(axis=1)
+    queries = list(range(0, len(texts), max(1, len(texts) // 50)))
+    ref = _topk(vectors["torch"], vectors["torch"][queries], top_k)
+    got = _topk(vectors["onnx"], vectors["onnx"][queries], top_k)
+    overlap = np.mean([len(set(r) & set(g)) / top_k for r, g in zip(ref, got)])
+
+    logger.info("🎯 Accuracy (ONNX int8 vs torch)")
+    logger.info(f" - cosine(torch, onnx): mean {cosine.mean():.4f}, min {cosine.min():.4f}, p05 {np.percentile(cosine, 5):.4f}")
+    logger.info(f" - top-{top_k} neighbour agreement over {len(queries)} queries: {overlap * 100:.1f}%")
+
+    logger.info("⚡ Speed / memory")
+    for name, b in backends.items():
+        s = _speed(b["encode"], texts)
+        logger.info(
+            f" - {name:<5} load {b['load_s']:.1f}s, +{b['rss_mb']:.0f} MB peak RSS, "
+            f"single p50 {s['p50_ms']:.1f} ms / p95 {s['p95_ms']:.1f} ms, batch {s['batch_texts_per_s']:.0f} texts/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
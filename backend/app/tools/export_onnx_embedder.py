@@ -0,0 +1,113 @@
+# backend/app/tools/export_onnx_embedder.py
+"""
+Export the Embedding Model to int8 ONNX
+---------------------------------------
+Exports the transformer of SENTENCE_MODEL_NAME to ONNX, quantizes the weights
+to int8 (dynamic quantization) and writes everything the onnx embedding
+backend needs into ONNX_MODEL_DIR:
+
+    model.onnx            fp32 export (kept for reference / re-quantizing)
+    model-int8.onnx       quantized model loaded at runtime
+    tokenizer.json        fast tokenizer
+    embedder_config.json  pooling / normalization / max length of the pipeline
+
+Needs torch + sentence-transformers + onnx + onnxruntime, so run it once on a
+build host (or in the backend container) and ship the output directory;
+the runtime backend only needs onnxruntime and tokenizers.
+
+Usage:
+    docker exec -it <backend_container> python -m app.tools.export_onnx_embedder [out_dir]
+Then set EMBEDDING_BACKEND=onnx (and ONNX_MODEL_DIR if out_dir is not the default).
+"""
+
+import json
+import logging
+import os
+import sys
+
+from app.embedding_models import ONNX_MODEL_DIR, _SENTENCE_MODEL_NAME
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OPSET = 14
+
+
+def _pipeline_config(s_model) -> dict:
+    """
+    Read pooling mode and normalization from the SentenceTransformer modules so the
+    ONNX backend reproduces the same vectors.
+    """
+    pooling, normalize = "mean", False
+    for module in s_model:
+        name = type(module).__name__
+        if name == "Pooling":
+            cfg = module.get_config_dict()
+            pooling = "cls" if cfg.get("pooling_mode_cls_token") else "mean"
+        elif name == "Normalize":
+            normalize = True
+    tokenizer = s_model.tokenizer
+    return {
+        "model_name": _SENTENCE_MODEL_NAME,
+        "onnx_file": "model-int8.onnx",
+        "pooling": pooling,
+        "normalize": normalize,
+        "max_seq_length": s_model.max_seq_length,
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+        "dimension": s_model.get_sentence_embedding_dimension(),
+    }
+
+
+def export(out_dir: str):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(out_dir, exist_ok=True)
+    s_model = SentenceTransformer(_SENTENCE_MODEL_NAME, device="cpu")
+    transformer = s_model[0].auto_model.eval()
+    tokenizer = s_model.tokenizer
+
+    sample = tokenizer(["export sample sentence", "another one"], padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    logger.info(f"📦 Exporting {_SENTENCE_MODEL_NAME} to {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[n] for n in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=OPSET,
+            do_constant_folding=True,
+        )
+
+    int8_path = os.path.join(out_dir, "model-int8.onnx")
+    logger.info(f"🗜️ Quantizing weights to int8 → {int8_path}")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(out_dir)
+    if not os.path.exists(os.path.join(out_dir, "tokenizer.json")):
+        raise RuntimeError(f"{_SENTENCE_MODEL_NAME} has no fast tokenizer; the onnx backend needs tokenizer.json")
+
+    config = _pipeline_config(s_model)
+    with open(os.path.join(out_dir, "embedder_config.json"), "w") as f:
+        json.dump(config, f, indent=2)
+
+    sizes = {p: round(os.path.getsize(os.path.join(out_dir, p)) / 1e6, 1) for p in ("model.onnx", "model-int8.onnx")}
+    logger.info(f"✅ Export complete: {sizes} MB, pooling={config['pooling']}, normalize={config['normalize']}")
+
+
+def main():
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else ONNX_MODEL_DIR
+    export(out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+# backend/app/tools/loadtest_fakes.py
+"""
+In-process fakes for offline load testing
+-----------------------------------------
+Swappable stand-ins for every external dependency of the /chat/ pipeline:
+
+- LLM providers   → echo replies from app/ai/model.generate_response
+- Embeddings      → deterministic hash embeddings from app/ai/embedding.get_embedding
+- Pinecone        → in-memory vector store (cosine similarity with NumPy)
+- Neo4j           → in-memory fact store
+- Postgres        → in-memory tables (users, tasks, chat_history)
+- Redis           → in-memory lists, hashes and pub/sub
+- Celery          → jobs run eagerly, in-process
+
+Each fake sleeps for a configurable latency so the harness can model slow
+dependencies; the async data layer gets twins that await that latency on
+the event loop instead. install() must run BEFORE app.main is imported, because
+several modules bind these functions at import time.
+"""
+
+import asyncio
+import functools
+import itertools
+import sys
+import threading
+import time
+import types
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.ai.model import generate_response
+from app.ai.embedding import get_embedding as hash_embedding
+
+
+@dataclass
+class FakeLatencies:
+    llm: float = 0.5
+    embedding: float = 0.01
+    vector: float = 0.02
+    graph: float = 0.005
+    db: float = 0.003
+    redis: float = 0.0005
+
+
+_local = threading.local()
+
+
+def _sleep(seconds: float):
+    if seconds > 0 and not getattr(_local, "in_async_twin", False):
+        time.sleep(seconds)
+
+
+def _async_twin(fn: Callable, latency: float) -> Callable:
+    # Await the latency without blocking the loop, then run the (instant) sync fake
+    @functools.wraps(fn)
+    async def twin(*args, **kwargs):
+        if latency > 0:
+            await asyncio.sleep(latency)
+        _local.in_async_twin = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.in_async_twin = False
+    return twin
+
+
+# ---------------- LLM ----------------
+class FakeLLM:
+    def __init__(self, name: str, latency: float):
+        self.name = name
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, prompt: str) -> str:
+        self.calls += 1
+        _sleep(self.latency)
+        # Only echo the tail of the prompt; the full system prompt is noise here
+        return generate_response(prompt[-200:])
+
+
+# ---------------- EMBEDDINGS ----------------
+def make_embeddings_module(latency: float) -> types.ModuleType:
+    mod = types.ModuleType("app.services.embeddings")
+
+    def get_embedding(text: str) -> List[float]:
+        _sleep(latency)
+        return hash_embedding(text)
+
+    def get_batch_embeddings(texts: List[str]) -> List[List[float]]:
+        _sleep(latency)
+        return [hash_embedding(t) for t in texts]
+
+    mod.get_embedding = get_embedding
+    mod.get_batch_embeddings = get_batch_embeddings
+    mod.warm_up = lambda: None
+    return mod
+
+
+# ---------------- VECTOR STORE ----------------
+class InMemoryVectorStore:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._by_namespace: Dict[str, Dict[str, tuple]] = {}
+
+    def init_pinecone(self):
+        return self
+
+    def get_index(self):
+        return self
+
+    def upsert_vectors(self, items: List[Dict[str, Any]], namespace: Optional[str] = None, **_) -> bool:
+        _sleep(self.latency)
+        with self._lock:
+            rows = self._by_namespace.setdefault(namespace or "", {})
+            for i in items:
+                vec = np.asarray(i["values"], dtype=np.float32)
+                vec /= (np.linalg.norm(vec) or 1.0)
+                rows[i["id"]] = (vec, dict(i.get("metadata", {})))
+        return True
+
+    def query_vectors(self, vector: List[float], top_k: int = 5, filter: Optional[Dict] = None,
+                      include_metadata: bool = True, namespace: Optional[str] = None,
+                      include_values: bool = False, **_) -> Dict[str, Any]:
+        _sleep(self.latency)
+        with self._lock:
+            rows = list(self._by_namespace.get(namespace or "", {}).items())
+        if filter and "user_id" in filter:
+            cond = filter["user_id"]
+            user_id = cond.get("$eq") if isinstance(cond, dict) else cond
+            rows = [r for r in rows if r[1][1].get("user_id") == user_id]
+        if not rows:
+            return {"matches": []}
+        q = np.asarray(vector, dtype=np.float32)
+        q /= (np.linalg.norm(q) or 1.0)
+        scores = np.stack([v for _, (v, _) in rows]) @ q
+        best = np.argsort(-scores)[:top_k]
+        matches = []
+        for i in best:
+            match = {"id": rows[i][0], "score": float(scores[i]), "metadata": rows[i][1][1] if include_metadata else {}}
+            if include_values:
+                match["values"] = rows[i][1][0].tolist()
+            matches.append(match)
+        return {"matches": matches}
+
+    def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None, include_values: bool = False,
+                      **_) -> Dict[str, Dict[str, Any]]:
+        _sleep(self.latency)
+        with self._lock:
+            rows = self._by_namespace.get(namespace or "", {})
+            found = {}
+            for vid in ids:
+                if vid in rows:
+                    found[vid] = {"id": vid, "metadata": dict(rows[vid][1])}
+                    if include_values:
+                        found[vid]["values"] = rows[vid][0].tolist()
+            return found
+
+    def update_metadata(self, vector_id: str, metadata: Dict[str, Any], namespace: Optional[str] = None, **_) -> bool:
+        _sleep(self.latency)
+        with self._lock:
+            rows = self._by_namespace.get(namespace or "", {})
+            if vector_id not in rows:
+                return False
+            rows[vector_id][1].update(metadata)
+        return True
+
+
+# ---------------- GRAPH STORE ----------------
+class FakeGraphStore:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.facts: Dict[str, str] = {}
+        self.user_facts: Dict[str, Dict[str, str]] = {}
+        self.user_relations: Dict[str, Dict[str, List[str]]] = {}
+
+    def save_fact_neo4j(self, key: str, value: str):
+        _sleep(self.latency)
+        with self._lock:
+            self.facts[key] = value
+
+    def get_fact_neo4j(self, key: str):
+        _sleep(self.latency)
+        return self.facts.get(key)
+
+    def save_user_fact_neo4j(self, user_id: str, key: str, value: str):
+        _sleep(self.latency)
+        with self._lock:
+            self.user_facts.setdefault(str(user_id), {})[key] = value
+
+    def get_all_facts_for_user(self, user_id: str) -> Dict[str, str]:
+        _sleep(self.latency)
+        with self._lock:
+            relations = {k: ", ".join(v) for k, v in self.user_relations.get(str(user_id), {}).items()}
+            return {**relations, **self.user_facts.get(str(user_id), {})}
+
+    get_facts_neo4j = get_all_facts_for_user
+
+    def save_facts_bulk(self, facts, chunk_size: Optional[int] = None) -> List[dict]:
+        from app.db.neo4j_utils import chunked, prepare_fact_rows
+        rows, results = prepare_fact_rows(facts)
+        for chunk in chunked(rows, chunk_size or 1000):
+            _sleep(self.latency)  # one round trip per chunk
+            with self._lock:
+                for r in chunk:
+                    if r["user_id"] is None:
+                        self.facts[r["key"]] = r["value"]
+                    else:
+                        self.user_facts.setdefault(str(r["user_id"]), {})[r["key"]] = r["value"]
+                    results[r["index"]]["status"] = "saved"
+        return results
+
+    def save_knowledge(self, user_id, entities, user_relationships, relationships):
+        _sleep(self.latency)  # one transaction
+        with self._lock:
+            relations = self.user_relations.setdefault(str(user_id), {})
+            for rel in user_relationships:
+                targets = relations.setdefault(rel["relation"], [])
+                if rel["target"] not in targets:
+                    targets.append(rel["target"])
+
+
+# ---------------- DATABASE ----------------
+class InMemoryDatabase:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._change_seq = itertools.count(1)
+        self.tasks: List[dict] = []
+        self.chats: List[dict] = []
+
+    def create_tables(self):
+        pass
+
+    def _touch(self, task: dict) -> dict:
+        # what the tasks_touch trigger does
+        task["updated_at"], task["change_seq"] = datetime.utcnow(), next(self._change_seq)
+        return task
+
+    def save_task(self, task_data: dict):
+        _sleep(self.latency)
+        with self._lock:
+            self.tasks.append(self._touch({
+                "id": next(self._ids), "user_id": task_data.get("user_id"), "title": task_data.get("title"),
+                "datetime": datetime.fromisoformat(task_data["datetime"]) if task_data.get("datetime") else None,
+                "priority": task_data.get("priority"), "category": task_data.get("category"),
+                "notes": task_data.get("notes", ""), "notified": False, "deleted_at": None,
+            }))
+            return self.tasks[-1]["id"]
+
+    def save_tasks_bulk(self, user_id: int, tasks: List[dict]) -> List[dict]:
+        _sleep(self.latency)
+        out = []
+        with self._lock:
+            for t in tasks:
+                fields = {k: t.get(k) for k in ("title", "datetime", "priority", "category")}
+                fields["notes"] = t.get("notes") or ""
+                ext = t.get("external_id")
+                existing = next((x for x in self.tasks if ext is not None and x["user_id"] == user_id
+                                 and x.get("external_id") == ext), None)
+                if existing:
+                    if existing["datetime"] != fields["datetime"]:
+                        existing["notified"] = False
+                    existing.update(fields, deleted_at=None)
+                    self._touch(existing)
+                    out.append({"id": existing["id"], "external_id": ext, "created": False})
+                else:
+                    task = self._touch({"id": next(self._ids), "user_id": user_id, "external_id": ext,
+                                        "notified": False, "deleted_at": None, **fields})
+                    self.tasks.append(task)
+                    out.append({"id": task["id"], "external_id": ext, "created": True})
+        return out
+
+    def get_tasks(self, user_id: int):
+        _sleep(self.latency)
+        with self._lock:
+            return [t for t in self.tasks if t["user_id"] == user_id and t["deleted_at"] is None]
+
+    def get_task_version(self, user_id: int) -> int:
+        _sleep(self.latency)
+        with self._lock:
+            return max((t["change_seq"] for t in self.tasks if t["user_id"] == user_id), default=0)
+
+    def get_task_changes(self, user_id: int, since: int, limit: int = 1000):
+        _sleep(self.latency)
+        with self._lock:
+            rows = sorted((dict(t) for t in self.tasks if t["user_id"] == user_id and t["change_seq"] > since),
+                          key=lambda t: t["change_seq"])[:limit + 1]
+        return rows[:limit], (rows[:limit][-1]["change_seq"] if rows else since), len(rows) > limit
+
+    def delete_task(self, user_id: int, task_id: int) -> bool:
+        _sleep(self.latency)
+        with self._lock:
+            for t in self.tasks:
+                if t["id"] == task_id and t["user_id"] == user_id and t["deleted_at"] is None:
+                    t["deleted_at"] = datetime.utcnow()
+                    self._touch(t)
+                    return True
+            return False
+
+    def save_chat(self, user_id: int, user_query: str, ai_response: str, chat_id: Optional[str] = None):
+        _sleep(self.latency)
+        with self._lock:
+            self.chats.append({
+                "id": next(self._ids), "user_id": user_id, "chat_id": chat_id, "user_query": user_query,
+                "ai_response": ai_response, "created_at": datetime.utcnow(),
+            })
+
+    def get_chat_history(self, user_id: int, limit: int = 10):
+        _sleep(self.latency)
+        with self._lock:
+            rows = [c for c in self.chats if c["user_id"] == user_id][-limit:]
+        return [{"chat_id": c["chat_id"], "user_query": c["user_query"], "ai_response": c["ai_response"]} for c in reversed(rows)]
+
+    def search_chat_history(self, user_id: int, query: str, limit: int = 10):
+        _sleep(self.latency)
+        words = {w for w in query.lower().split() if len(w) > 2}
+        with self._lock:
+            rows = [c for c in self.chats if c["user_id"] == user_id]
+        scored = []
+        for c in rows:
+            hits = len(words & set(f"{c['user_query']} {c['ai_response'] or ''}".lower().split()))
+            if hits:
+                scored.append({**c, "rank": float(hits)})
+        scored.sort(key=lambda c: (c["rank"], c["created_at"]), reverse=True)
+        return scored[:limit]
+
+    def get_conversations(self, user_id: int, limit: int = 50):
+        _sleep(self.latency)
+        with self._lock:
+            seen = {}
+            for c in self.chats:
+                if c["user_id"] == user_id and c["chat_id"]:
+                    seen.setdefault(c["chat_id"], {"chat_id": c["chat_id"], "title": c["user_query"]})["last_at"] = c["created_at"].isoformat()
+        return sorted(seen.values(), key=lambda x: x["last_at"], reverse=True)[:limit]
+
+    def iter_user_rows(self, user_id: int, batch_size: int = 1000):
+        with self._lock:
+            tasks = [t for t in self.tasks if t["user_id"] == user_id]
+            chats = [c for c in self.chats if c["user_id"] == user_id]
+        for t in tasks:
+            if t["deleted_at"] is None:
+                yield "task", {k: t[k] for k in ("id", "title", "datetime", "priority", "category", "notes", "notified")}
+        for c in chats:
+            yield "chat", {k: v for k, v in c.items() if k != "user_id"}
+
+    def prepare_import(self, records):
+        for _ in records:
+            pass
+
+    def bulk_import(self, user_id: int, records, batch_size: int = 1000):
+        counts = {"task": 0, "chat": 0}
+        rows = {"task": [], "chat": []}
+        defaults = {"task": {"datetime": None, "priority": None, "category": None, "notes": "", "notified": False},
+                    "chat": {"chat_id": None, "ai_response": None}}
+        for kind, row in records:
+            row = {**defaults[kind], **row, "id": next(self._ids), "user_id": user_id}
+            if kind == "chat":
+                row["created_at"] = datetime.fromisoformat(row["created_at"]) if row.get("created_at") else datetime.utcnow()
+            rows[kind].append(row)
+            counts[kind] += 1
+        _sleep(self.latency)
+        with self._lock:
+            self.tasks.extend(self._touch({"external_id": None, "deleted_at": None, **t}) for t in rows["task"])
+            self.chats.extend(rows["chat"])
+        return counts
+
+    def get_messages_by_chat(self, user_id: int, chat_id: str, limit: int = 200):
+        _sleep(self.latency)
+        with self._lock:
+            rows = [c for c in self.chats if c["user_id"] == user_id and c["chat_id"] == chat_id][:limit]
+        messages = []
+        for r in rows:
+            messages.append({"type": "text", "sender": "user", "content": r["user_query"]})
+            if r["ai_response"]:
+                messages.append({"type": "text", "sender": "ai", "content": r["ai_response"]})
+        return messages
+
+
+# ---------------- REDIS ----------------
+class FakeRedis:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._lists: Dict[str, List[str]] = {}
+        self._hashes: Dict[str, Dict[str, str]] = {}
+        self.subscribers: List[Callable[[str, str], None]] = []  # pub/sub listeners
+
+    def lpush(self, key: str, *values):
+        _sleep(self.latency)
+        with self._lock:
+            lst = self._lists.setdefault(key, [])
+            for v in values:
+                lst.insert(0, v)
+            return len(lst)
+
+    def ltrim(self, key: str, start: int, end: int):
+        with self._lock:
+            self._lists[key] = self._lists.get(key, [])[start:end + 1]
+        return True
+
+    def lrange(self, key: str, start: int, end: int):
+        _sleep(self.latency)
+        with self._lock:
+            lst = self._lists.get(key, [])
+            return lst[start:] if end == -1 else lst[start:end + 1]
+
+    def hset(self, key: str, mapping: Dict[str, Any]):
+        _sleep(self.latency)
+        with self._lock:
+            self._hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+        return len(mapping)
+
+    def hgetall(self, key: str) -> Dict[str, str]:
+        _sleep(self.latency)
+        with self._lock:
+            return dict(self._hashes.get(key, {}))
+
+    def expire(self, key: str, seconds: int):
+        return True  # runs are short; nothing expires
+
+    def pipeline(self, transaction: bool = True):
+        return _FakePipeline(self)
+
+    def publish(self, channel: str, message: str) -> int:
+        for deliver in self.subscribers:
+            deliver(channel, message)
+        return len(self.subscribers)
+
+
+class _FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        return [getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in self._calls]
+
+
+# ---------------- INSTALL ----------------
+@dataclass
+class Fakes:
+    llm_primary: FakeLLM
+    llm_secondary: FakeLLM
+    vectors: InMemoryVectorStore
+    graph: FakeGraphStore
+    db: InMemoryDatabase
+    redis: FakeRedis
+
+
+def install(latencies: FakeLatencies) -> Fakes:
+    """
+    Replace every external dependency with an in-process fake. Call before importing app.main.
+    """
+    if "app.main" in sys.modules:
+        raise RuntimeError("install() must run before app.main is imported")
+
+    fakes = Fakes(
+        llm_primary=FakeLLM("gemini", latencies.llm),
+        llm_secondary=FakeLLM("cohere", latencies.llm),
+        vectors=InMemoryVectorStore(latencies.vector),
+        graph=FakeGraphStore(latencies.graph),
+        db=InMemoryDatabase(latencies.db),
+        redis=FakeRedis(latencies.redis),
+    )
+
+    # Embeddings load a model at import time, so swap the whole module in
+    sys.modules["app.services.embeddings"] = make_embeddings_module(latencies.embedding)
+
+    from app.db import redis_utils
+    redis_utils.client = fakes.redis
+    redis_utils.state_client = None  # provider health / key pool use process-local state
+
+    from app.db import pinecone_utils
+    for name in ("init_pinecone", "get_index", "upsert_vectors", "query_vectors", "fetch_vectors", "update_metadata"):
+        setattr(pinecone_utils, name, getattr(fakes.vectors, name))
+
+    from app.db import neo4j_utils
+    for name in ("save_fact_neo4j", "get_fact_neo4j", "save_user_fact_neo4j", "get_all_facts_for_user", "get_facts_neo4j",
+                 "save_facts_bulk", "save_knowledge"):
+        setattr(neo4j_utils, name, getattr(fakes.graph, name))
+
+    from app.db import utils as db_utils
+    for name in ("create_tables", "save_task", "save_tasks_bulk", "get_tasks", "get_task_version",
+                 "get_task_changes", "delete_task", "save_chat",
+                 "get_chat_history", "search_chat_history", "get_conversations", "get_messages_by_chat",
+                 "iter_user_rows", "prepare_import", "bulk_import"):
+        setattr(db_utils, name, getattr(fakes.db, name))
+
+    # Async twins for the handlers (app.db.async_*), backed by the same fakes
+    from app.db import async_utils, async_neo4j_utils, async_redis_utils
+    from app.singleflight import singleflight
+    for name in ("save_task", "save_tasks_bulk", "get_tasks", "get_task_version", "get_task_changes",
+                 "delete_task", "save_chat", "get_conversations"):
+        setattr(async_utils, name, _async_twin(getattr(fakes.db, name), latencies.db))
+    # Reads the app coalesces stay coalesced
+    for name in ("get_chat_history", "get_messages_by_chat"):
+        setattr(async_utils, name, singleflight(_async_twin(getattr(fakes.db, name), latencies.db)))
+    async_utils.get_pool = _async_twin(lambda: None, 0)
+    for name in ("save_fact_neo4j", "save_user_fact_neo4j", "save_facts_bulk"):
+        setattr(async_neo4j_utils, name, _async_twin(getattr(fakes.graph, name), latencies.graph))
+    facts = singleflight(_async_twin(fakes.graph.get_all_facts_for_user, latencies.graph))
+    async_neo4j_utils.get_all_facts_for_user = async_neo4j_utils.get_facts_neo4j = facts
+    for name in ("save_chat_redis", "get_last_chats"):
+        setattr(async_redis_utils, name, _async_twin(getattr(redis_utils, name), latencies.redis))
+
+    from app import worker
+    worker.celery.conf.task_always_eager = True
+
+    # Events published through the fake Redis reach this process's /ws hub directly
+    from app import events
+
+    async def listen_in_process():
+        loop = asyncio.get_running_loop()
+        fakes.redis.subscribers.append(lambda ch, msg: loop.call_soon_threadsafe(
+            events.event_hub.dispatch, int(ch[len(events.CHANNEL_PREFIX):]), msg))
+        await asyncio.Event().wait()
+
+    events._publisher = fakes.redis
+    events.publish_many_async = _async_twin(events.publish_many, latencies.redis)
+    events.event_hub._listen = listen_in_process
+
+    from app.services import ai_services
+    ai_services._PROVIDER_CALLS["gemini"] = fakes.llm_primary
+    ai_services._PROVIDER_CALLS["cohere"] = fakes.llm_secondary
+    return fakes
@@ -0,0 +1,96 @@
+# backend/app/tools/neo4j_facts_benchmark.py
+"""
+Neo4j Bulk Fact Write Benchmark
+-------------------------------
+Writes the same set of user facts twice, once with save_user_fact_neo4j per
+fact (one driver, session and auto-commit query each) and once with
+save_facts_bulk (one UNWIND transaction per chunk), and reports facts/s for
+each chunk size.
+
+Keys are prefixed with a per-run "bench:<id>:" and every node the run
+created is deleted at the end, so it is safe against a live database.
+--fake-rtt-ms runs it offline against the in-memory graph fake instead,
+charging that round-trip time per query.
+
+Usage:
+    docker exec -it <backend_container> python -m app.tools.neo4j_facts_benchmark --facts 1000 --users 10 --chunk-sizes 100,500,1000
+    python -m app.tools.neo4j_facts_benchmark --fake-rtt-ms 2
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+import uuid
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logging.getLogger("app.db.neo4j_utils").setLevel(logging.WARNING)  # one INFO line per single-row write
+
+
+def _facts(run_id: str, count: int, users: int):
+    return [
+        {"user_id": f"bench:{run_id}:user{i % users}", "key": f"bench:{run_id}:fact{i}", "value": f"value {i}"}
+        for i in range(count)
+    ]
+
+
+def _cleanup(neo4j_utils, run_id: str):
+    driver = neo4j_utils.get_driver()
+    try:
+        with driver.session() as session:
+            for label, prop in (("Fact", "key"), ("User", "id")):
+                session.run(
+                    f"MATCH (n:{label}) WHERE n.{prop} STARTS WITH $prefix DETACH DELETE n",
+                    prefix=f"bench:{run_id}:",
+                ).consume()
+    finally:
+        driver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-row vs UNWIND bulk fact writes to Neo4j")
+    parser.add_argument("--facts", type=int, default=500)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--chunk-sizes", default="100,500,1000")
+    parser.add_argument("--fake-rtt-ms", type=float, default=None, help="use the in-memory fake with this round-trip time")
+    args = parser.parse_args()
+
+    if args.fake_rtt_ms is not None:
+        os.environ.setdefault("NEO4J_PASSWORD", "benchmark")
+        from app.tools.loadtest_fakes import FakeLatencies, install
+        install(FakeLatencies(graph=args.fake_rtt_ms / 1000))
+    from app.db import neo4j_utils
+
+    chunk_sizes = [int(s) for s in args.chunk_sizes.split(",")]
+    logger.info(f"🧪 {args.facts} facts over {args.users} users, "
+                f"{'fake graph, %.1f ms RTT' % args.fake_rtt_ms if args.fake_rtt_ms is not None else 'live Neo4j'}")
+
+    run_ids = []
+    try:
+        run_id = uuid.uuid4().hex[:8]
+        run_ids.append(run_id)
+        started = time.perf_counter()
+        for fact in _facts(run_id, args.facts, args.users):
+            neo4j_utils.save_user_fact_neo4j(fact["user_id"], fact["key"], fact["value"])
+        baseline = args.facts / (time.perf_counter() - started)
+        logger.info(f" - single-row      : {baseline:9.1f} facts/s")
+
+        for size in chunk_sizes:
+            run_id = uuid.uuid4().hex[:8]
+            run_ids.append(run_id)
+            started = time.perf_counter()
+            results = neo4j_utils.save_facts_bulk(_facts(run_id, args.facts, args.users), chunk_size=size)
+            rate = args.facts / (time.perf_counter() - started)
+            failed = sum(1 for r in results if r["status"] != "saved")
+            logger.info(f" - bulk, chunk {size:>5}: {rate:9.1f} facts/s ({rate / baseline:5.1f}x)"
+                        + (f", {failed} not saved" if failed else ""))
+    finally:
+        if args.fake_rtt_ms is None:
+            for run_id in run_ids:
+                _cleanup(neo4j_utils, run_id)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,15 +5,20 @@ Semantic Memory Cleanup Utility
 Removes Pinecone vectors older than 90 days (configurable).
 Can be run as a scheduled task (cron or Celery) or manually.
 
+Memories live in one namespace per user, so every namespace is walked page by
+page; a vector is stale when it has not been seen (last_seen, else stored_at)
+within the retention period.
+
 Usage:
-    docker exec -it <backend_container> python app/tools/semantic_cleanup.py
+    docker exec -it <backend_container> python -m app.tools.semantic_cleanup [retention_days] [--dry-run]
 """
 
 import logging
+import sys
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 
-from app.db.pinecone_utils import get_index
+from app.db.pinecone_utils import delete_vectors, fetch_vectors, list_ids, list_namespaces
 from app.config_pinecone import pinecone_settings
 
 # 🕒 Retention period (seconds) — 90 days
@@ -22,33 +27,32 @@ RETENTION_SECONDS = 90 * 24 * 3600
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def cleanup_old_vectors():
-    index = get_index()
+
+def cleanup_old_vectors(retention_seconds: int = RETENTION_SECONDS, dry_run: bool = False):
     logger.info(f"🧹 Starting semantic cleanup for index '{pinecone_settings.PINECONE_INDEX_NAME}'")
-    now = int(time.time())
-    cutoff = now - RETENTION_SECONDS
+    cutoff = int(time.time()) - retention_seconds
+    logger.info(f"🧾 Retention cutoff timestamp: {datetime.fromtimestamp(cutoff)}")
 
+    deleted = scanned = 0
     try:
-        # Pinecone does not support direct server-side filtering deletion by timestamp yet.
-        # We'll fetch all vector metadata via `list` or `fetch` API in batches.
-        # (This approach depends on your Pinecone plan and client version.)
-        stats = index.describe_index_stats()
-        total_vectors = stats.get("total_vector_count", "unknown")
-        logger.info(f"ℹ️ Index has approximately {total_vectors} vectors.")
-
-        # NOTE: Most Pinecone environments don't support listing all items.
-        # In practice, you'd maintain metadata in Postgres for fast lookups.
-        # Here, we'll just log a warning for manual cleanup.
-        logger.warning("⚠️ Pinecone currently does not provide full vector enumeration via API.")
-        logger.warning("Consider tracking metadata in PostgreSQL for scalable cleanup.")
-        logger.info(f"🧾 Retention cutoff timestamp: {datetime.fromtimestamp(cutoff)}")
-
+        for namespace in list_namespaces():
+            ns = namespace or None
+            for page in list_ids(namespace=ns):
+                scanned += len(page)
+                stale = [
+                    vid for vid, v in fetch_vectors(page, namespace=ns).items()
+                    if int(v["metadata"].get("last_seen") or v["metadata"].get("stored_at") or cutoff) < cutoff
+                ]
+                if stale and (dry_run or delete_vectors(stale, namespace=ns)):
+                    deleted += len(stale)
     except Exception as e:
         logger.exception("Cleanup failed: %s", e)
         return False
 
-    logger.info("✅ Cleanup completed (or simulated). For production, use metadata tracking to delete stale IDs.")
+    logger.info(f"✅ Cleanup completed{' (dry run)' if dry_run else ''}: {deleted} of {scanned} vectors stale.")
     return True
 
+
 if __name__ == "__main__":
-    cleanup_old_vectors()
+    days = next((int(a) for a in sys.argv[1:] if a.isdigit()), None)
+    cleanup_old_vectors(days * 24 * 3600 if days else RETENTION_SECONDS, dry_run="--dry-run" in sys.argv)
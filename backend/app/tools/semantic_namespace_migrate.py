@@ -0,0 +1,86 @@
+# backend/app/tools/semantic_namespace_migrate.py
+"""
+Semantic Memory Namespace Migration
+-----------------------------------
+Moves vectors stored in the shared default namespace into their owner's
+per-user namespace (user-<id>), in batches: list a page of ids, fetch them
+with values, upsert into each owner's namespace, then delete the originals.
+
+Safe to re-run: ids are unchanged, so a batch interrupted after the upsert is
+simply copied again. Vectors whose owner cannot be determined stay where they are.
+
+Run it before setting PINECONE_USER_NAMESPACES=true: with the flag on, reads
+only look in the user's namespace, so memories still in the default one are
+not recalled. Vectors written between the migration and the switch are moved
+by running it once more afterwards.
+
+Usage:
+    docker exec -it <backend_container> python -m app.tools.semantic_namespace_migrate [--dry-run] [--keep-source]
+"""
+
+import argparse
+import logging
+from collections import defaultdict
+from typing import Optional
+
+from app.db.pinecone_utils import delete_vectors, fetch_vectors, list_ids, list_namespaces, upsert_vectors, user_namespace
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _owner(vector: dict) -> Optional[str]:
+    user_id = vector.get("metadata", {}).get("user_id")
+    if user_id is not None:
+        return str(user_id)
+    # ids were written as "<user_id>-<uuid>" (semantic memory) or "<user_id>_<uuid>" (pinecone_chat)
+    for sep in ("-", "_"):
+        if sep in vector["id"]:
+            return vector["id"].split(sep, 1)[0]
+    return None
+
+
+def migrate(dry_run: bool = False, keep_source: bool = False) -> dict:
+    before = list_namespaces()
+    logger.info(f"🚚 Default namespace holds {before.get('', 0)} vectors; {len(before) - ('' in before)} other namespaces")
+    totals = {"moved": 0, "skipped": 0, "failed": 0, "users": set()}
+
+    for page in list_ids(namespace=None):
+        vectors = fetch_vectors(page, include_values=True)
+        by_user = defaultdict(list)
+        for vec in vectors.values():
+            owner = _owner(vec)
+            if owner is None:
+                totals["skipped"] += 1
+                continue
+            by_user[owner].append(vec)
+
+        for owner, items in by_user.items():
+            if dry_run:
+                totals["moved"] += len(items)
+                totals["users"].add(owner)
+                continue
+            if not upsert_vectors(items, namespace=user_namespace(owner)):
+                totals["failed"] += len(items)
+                continue
+            if not keep_source and not delete_vectors([i["id"] for i in items]):
+                logger.warning(f"⚠️ Copied {len(items)} vectors for user {owner} but could not delete the originals")
+            totals["moved"] += len(items)
+            totals["users"].add(owner)
+        logger.info(f" - {totals['moved']} moved so far ({len(totals['users'])} users)")
+
+    totals["users"] = len(totals["users"])
+    logger.info(f"✅ Migration {'(dry run) ' if dry_run else ''}done: {totals}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move semantic memories into per-user namespaces")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would move")
+    parser.add_argument("--keep-source", action="store_true", help="Copy without deleting from the default namespace")
+    args = parser.parse_args()
+    migrate(dry_run=args.dry_run, keep_source=args.keep_source)
+
+
+if __name__ == "__main__":
+    main()
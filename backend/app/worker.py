@@ -2,6 +2,7 @@
 
 import os
 from celery import Celery
+from celery.schedules import crontab
 from datetime import datetime
 import psycopg2
 import smtplib
@@ -36,6 +37,13 @@ EMAIL_PASS = os.getenv("EMAIL_PASS")
 # ======================
 INDIA_TZ = pytz.timezone("Asia/Kolkata")
 
+# ======================
+# 🔹 Knowledge Graph Extraction
+# ======================
+KG_EXTRACTION_ENABLED = os.getenv("KG_EXTRACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+KG_SCAN_SECONDS = float(os.getenv("KG_SCAN_SECONDS", "300"))
+KG_EXTRACT_RATE_LIMIT = os.getenv("KG_EXTRACT_RATE_LIMIT", "6/m")  # extraction LLM calls per worker process
+
 # ======================
 # 🔹 Celery Initialization
 # ======================
@@ -51,7 +59,20 @@ celery.conf.beat_schedule = {
         "task": "worker.check_and_trigger_tasks",
         "schedule": 60.0,  # every 60 seconds
     },
+    "maintain-chat-partitions-daily": {
+        "task": "worker.maintain_chat_partitions",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "purge-task-tombstones-daily": {
+        "task": "worker.purge_task_tombstones",
+        "schedule": crontab(hour=4, minute=0),
+    },
 }
+if KG_EXTRACTION_ENABLED:
+    celery.conf.beat_schedule["schedule-knowledge-extraction"] = {
+        "task": "worker.schedule_knowledge_extraction",
+        "schedule": KG_SCAN_SECONDS,
+    }
 celery.conf.timezone = "Asia/Kolkata"
 
 
@@ -64,6 +85,9 @@ def check_and_trigger_tasks():
     Periodically checks PostgreSQL 'tasks' table for due reminders.
     Sends an email if a task is due (in IST timezone) and not yet notified.
     """
+    # App code is imported lazily in this module (see run_job below)
+    from app.events import publish as publish_event
+
     try:
         conn = psycopg2.connect(
             dbname=POSTGRES_DB,
@@ -79,16 +103,17 @@ def check_and_trigger_tasks():
 
         # Get all tasks that are due and not yet notified
         cur.execute("""
-            SELECT id, title, notes, datetime
+            SELECT id, user_id, title, notes, datetime
             FROM tasks
             WHERE datetime <= NOW()
-            AND (notified IS NULL OR notified = FALSE);
+            AND (notified IS NULL OR notified = FALSE)
+            AND deleted_at IS NULL;
         """)
         tasks = cur.fetchall()
 
         triggered_count = 0
 
-        for task_id, title, desc, trigger_time in tasks:
+        for task_id, user_id, title, desc, trigger_time in tasks:
             send_email_notification(EMAIL_USER, title, desc)
             triggered_count += 1
 
@@ -96,6 +121,12 @@ def check_and_trigger_tasks():
             cur.execute("UPDATE tasks SET notified = TRUE WHERE id = %s", (task_id,))
             conn.commit()
 
+            # Push to the user's open apps (/ws) as well
+            publish_event(user_id, "reminder.fired", {
+                "id": task_id, "title": title, "notes": desc,
+                "datetime": trigger_time.isoformat() if trigger_time else None,
+            })
+
         cur.close()
         conn.close()
 
@@ -106,6 +137,74 @@ def check_and_trigger_tasks():
         print("❌ Error checking tasks:", e)
 
 
+# ======================
+# 🔹 Background Jobs (submitted via POST /jobs)
+# ======================
+@celery.task(name="worker.run_job", acks_late=True)
+def run_job(job_id: str):
+    """
+    Runs a long chat turn or document ingestion; status/progress/result go to Redis.
+    """
+    # Imported here so the beat scheduler and reminder tasks never load the AI stack
+    from app.services.jobs import execute_job
+    execute_job(job_id)
+
+
+# ======================
+# 🔹 Chat History Partitions
+# ======================
+@celery.task(name="worker.maintain_chat_partitions")
+def maintain_chat_partitions():
+    """
+    Creates upcoming monthly partitions of chat_history and archives the old ones to disk.
+    """
+    from app.db.chat_archive import run_maintenance
+    archived = run_maintenance()
+    print(f"🗂️ Chat partitions maintained, archived: {archived or 'none'}")
+
+
+@celery.task(name="worker.purge_task_tombstones")
+def purge_task_tombstones():
+    """
+    Drops deleted tasks older than TASK_TOMBSTONE_DAYS; delta-sync cursors from before them get 410.
+    """
+    from app.db.utils import purge_task_tombstones as purge
+    print(f"🧹 Purged {purge()} task tombstone(s)")
+
+
+# ======================
+# 🔹 Knowledge Graph Extraction
+# ======================
+@celery.task(name="worker.schedule_knowledge_extraction")
+def schedule_knowledge_extraction():
+    """
+    Queues one extraction per user with enough new chat turns (see app.services.knowledge_graph).
+    """
+    from app.services import knowledge_graph
+    queued = 0
+    for row in knowledge_graph.users_due():
+        if knowledge_graph.claim(row["user_id"]):
+            extract_user_knowledge.delay(row["user_id"])
+            queued += 1
+    print(f"🧠 Knowledge extraction queued for {queued} user(s)")
+
+
+@celery.task(name="worker.extract_user_knowledge", rate_limit=KG_EXTRACT_RATE_LIMIT, acks_late=True)
+def extract_user_knowledge(user_id: int):
+    """
+    Extracts one batch of a user's chat turns into Neo4j; queues the next batch if there is a backlog.
+    """
+    from app.services import knowledge_graph
+    try:
+        more = knowledge_graph.extract_for_user(user_id)
+    except Exception as e:
+        # Left for the next scan: the watermark did not move
+        print(f"❌ Knowledge extraction failed for user {user_id}:", e)
+        return
+    if more and knowledge_graph.claim(user_id):
+        extract_user_knowledge.delay(user_id)
+
+
 # ======================
 # 🔹 Email Notification
 # ======================
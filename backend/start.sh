@@ -1,2 +1,9 @@
 cd backend
+# Per-worker metric files must not survive a restart
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"; fi
+# One shared embedding model for all workers on this host (optional)
+if [ -n "$EMBEDDING_SOCKET_PATH" ]; then
+  python -m app.embedding_server &
+  for _ in $(seq 1 120); do [ -S "$EMBEDDING_SOCKET_PATH" ] && break; sleep 1; done
+fi
 uvicorn app.main:app --host 0.0.0.0 --port $PORT